@@ -0,0 +1,141 @@
+import unicodedata
+from collections import deque
+
+# Häufige Leetspeak-Ersetzungen (nur aktiv, wenn `normalize=True`)
+LEET_MAP = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s",
+})
+
+
+def normalize_text(text: str, normalize: bool = False) -> str:
+    """Bringt Text in die Form, in der die Blacklist geprüft wird.
+
+    Kleinbuchstaben, jedes Sonderzeichen wird zu einem Leerzeichen, mehrere Leerzeichen
+    werden zusammengefasst. Mit `normalize=True` werden zusätzlich Akzente entfernt
+    (é -> e) und Leetspeak aufgelöst (h4ck3r -> hacker).
+    """
+    text = text.lower()
+    if normalize:
+        text = text.translate(LEET_MAP)
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(text.split())
+
+
+class BlacklistMatcher:
+    """Aho-Corasick-Automat über alle Blacklist-Wörter eines Servers.
+
+    Wird einmal gebaut, wenn sich die Blacklist ändert, und prüft danach jede Nachricht
+    in einem einzigen Durchlauf – unabhängig davon, wie viele Wörter gesperrt sind.
+    Wie bisher zählen nur ganze Wörter: "ass" trifft nicht auf "class".
+    """
+
+    def __init__(self, words=(), normalize: bool = False):
+        self.normalize = normalize
+        self._goto = [{}]  # Zustand -> {Zeichen: Folgezustand}
+        self._fail = [0]
+        self._output = [None]  # Länge des längsten Worts, das in diesem Zustand endet
+        self._outputs = [()]  # Alle Wortlängen, die in diesem Zustand enden (inkl. Fail-Kette)
+
+        for word in words:
+            self._add(normalize_text(word, normalize))
+        self._build()
+
+    def _add(self, word: str):
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._outputs.append(())
+            state = next_state
+        self._output[state] = len(word)
+
+    def _build(self):
+        """Berechnet die Fail-Links per Breitensuche."""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._outputs[state] = (self._output[state],) if self._output[state] else ()
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+
+                own = (self._output[next_state],) if self._output[next_state] else ()
+                self._outputs[next_state] = own + self._outputs[fail]
+                queue.append(next_state)
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+    def find(self, text: str):
+        """Gibt das erste gesperrte Wort in `text` zurück (oder `None`)."""
+        if not self:
+            return None
+
+        text = normalize_text(text, self.normalize)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            # Treffer nur an Wortgrenzen (Anfang/Ende der Nachricht oder Leerzeichen)
+            if outputs[state] and (index + 1 == len(text) or text[index + 1] == " "):
+                for length in outputs[state]:
+                    start = index - length + 1
+                    if start == 0 or text[start - 1] == " ":
+                        return text[start:index + 1]
+        return None
+
+
+if __name__ == "__main__":
+    # Benchmark: python blacklist_matcher.py
+    import random
+    import string
+    import time
+
+    random.seed(42)
+
+    def random_word(min_len=4, max_len=10):
+        return "".join(random.choices(string.ascii_lowercase, k=random.randint(min_len, max_len)))
+
+    for word_count in (100, 1000, 5000):
+        words = {random_word() for _ in range(word_count)}
+        messages = [" ".join(random_word(2, 9) for _ in range(random.randint(5, 40))) for _ in range(2000)]
+
+        start = time.perf_counter()
+        matcher = BlacklistMatcher(words)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(1 for message in messages if matcher.find(message))
+        matcher_time = time.perf_counter() - start
+
+        # Bisheriges Verfahren aus ServerSettings zum Vergleich
+        blacklist = list(words)
+        start = time.perf_counter()
+        old_hits = 0
+        for message in messages:
+            filtered = "".join(c if c.isalnum() or c.isspace() else " " for c in message).lower()
+            if any(word in filtered.split() for word in blacklist):
+                old_hits += 1
+        old_time = time.perf_counter() - start
+
+        assert hits == old_hits
+        print(f"{len(words):>5} Wörter | Aufbau {build_time * 1000:7.1f} ms | "
+              f"Automat {len(messages) / matcher_time:>9.0f} Nachrichten/s | "
+              f"bisher {len(messages) / old_time:>9.0f} Nachrichten/s | Treffer {hits}")
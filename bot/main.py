@@ -3,6 +3,13 @@ import os
 import discord
 from dotenv import load_dotenv
 
+from cooldown_handler import CooldownEngine
+from db_handler import Database
+from http_client import HttpClient
+from member_sync import MemberSync
+from wiki_api import WikiApi
+from message_pipeline import MessagePipeline
+
 
 intents = discord.Intents.default()
 intents.members = True
@@ -16,12 +23,27 @@ intents.reactions = True  # Ermöglicht das Tracking von Reaktionen
 status = discord.Status.dnd
 activity = discord.Activity(type=discord.ActivityType.playing, name="In Entwicklung")
 
-bot = discord.Bot(
+class Bot(discord.Bot):
+    async def close(self):
+        """Schließt nach dem Gateway auch die geteilten Datenbank- und HTTP-Verbindungen."""
+        await super().close()
+        await self.web_client.close()
+        await self.db.close()
+
+
+bot = Bot(
     intents=intents,
     status=status,
     activity=activity
 )
 bot.synced = False  # Initialisiere die Variable global
+bot.db = Database()  # ✅ Geteilte Datenbankverbindungen für alle Cogs
+bot.member_sync = MemberSync(bot.db)  # ✅ Mitglieder beim Start gesammelt abgleichen
+bot.web_client = HttpClient()  # ✅ Geteilte HTTP-Verbindungen (Keep-Alive) für Wiki & Feeds
+bot.wiki_api = WikiApi(bot.web_client)  # ✅ MediaWiki-API statt HTML-Scraping
+bot.message_pipeline = MessagePipeline(bot)  # ✅ Ein on_message-Durchlauf für alle Cogs
+bot.add_listener(bot.message_pipeline.on_message, "on_message")
+bot.cooldowns = CooldownEngine(bot)  # ✅ Cooldowns im Speicher statt pro Befehl in der DB
 
 @bot.event
 async def on_ready():
@@ -1,11 +1,12 @@
 import discord
 from discord.ext import commands, tasks
 from discord.commands import slash_command, Option
-import aiosqlite
 
+DATABASE = "achievement.db"
 GUILD_ID = 824029270384312341
 MEME_CHANNEL_ID = 1018300492448792646
 TSUKOYUMI_CHANNEL_ID = 1245360929361625110
+SCHEMA_VERSION = 2  # PRAGMA user_version der Achievement-Datenbank
 
 # Rollen-IDs
 BUMP_TIERS = {
@@ -31,11 +32,15 @@ class AchievementSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.init_db.start()
+        self.bot.message_pipeline.add_stage("achievements", 40, self.track_message)
+
+    def cog_unload(self):
+        self.bot.message_pipeline.remove_stage("achievements")
 
     @tasks.loop(count=1)
     async def init_db(self):
         await self.bot.wait_until_ready()
-        async with aiosqlite.connect("achievement.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS server (
                     guild_id INTEGER,
@@ -43,47 +48,52 @@ class AchievementSystem(commands.Cog):
                     username TEXT
                 )
             """)
+            # Zeilen entstehen erst beim ersten Erfolg eines Users (siehe `increment_achievement`)
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS achievements (
                     user_id INTEGER PRIMARY KEY,
                     username TEXT,
                     bumps INTEGER DEFAULT 0,
-                    memes INTEGER DEFAULT 0
+                    memes INTEGER DEFAULT 0,
+                    tsukoyumi INTEGER DEFAULT 0
                 )
             """)
-            await db.commit()
 
-            guild = self.bot.get_guild(GUILD_ID)
-            for member in guild.members:
-                if not member.bot:
-                    await self.add_user(member)
+            async with db.execute("PRAGMA user_version") as cursor:
+                version = (await cursor.fetchone())[0]
+            if version < 1:
+                await self.drop_placeholder_rows(db)
+            if version < 2:
+                # Migration 2: Der Mitglieder-Abgleich beim Start (Tabelle `member_sync`) wird hier nicht mehr genutzt
+                await db.execute("DROP TABLE IF EXISTS member_sync")
+            await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
-    async def add_user(self, member):
-        async with aiosqlite.connect("achievement.db") as db:
-            await db.execute("INSERT OR IGNORE INTO server (guild_id, user_id, username) VALUES (?, ?, ?)",
-                             (GUILD_ID, member.id, member.name))
-            await db.execute("INSERT OR IGNORE INTO achievements (user_id, username) VALUES (?, ?)",
-                             (member.id, member.name))
-            await db.commit()
+    async def drop_placeholder_rows(self, db):
+        """Migration 1: Entfernt die früher für jedes Mitglied angelegten Zeilen ohne Erfolge.
+
+        Ältere Datenbanken haben noch keine Spalte `tsukoyumi`; sie wird hier ergänzt.
+        """
+        async with db.execute("PRAGMA table_info(achievements)") as cursor:
+            columns = [row[1] for row in await cursor.fetchall()]
+        if "tsukoyumi" not in columns:
+            await db.execute("ALTER TABLE achievements ADD COLUMN tsukoyumi INTEGER DEFAULT 0")
+
+        await db.execute("DELETE FROM achievements WHERE bumps = 0 AND memes = 0 AND tsukoyumi = 0")
+        await db.execute("DELETE FROM server WHERE user_id NOT IN (SELECT user_id FROM achievements)")
 
     async def remove_user(self, user_id):
-        async with aiosqlite.connect("achievement.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("DELETE FROM server WHERE user_id = ?", (user_id,))
             await db.execute("DELETE FROM achievements WHERE user_id = ?", (user_id,))
-            await db.commit()
-
-    @commands.Cog.listener()
-    async def on_member_join(self, member):
-        if member.guild.id == GUILD_ID and not member.bot:
-            await self.add_user(member)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member):
         if member.guild.id == GUILD_ID:
             await self.remove_user(member.id)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
+    async def track_message(self, ctx):
+        """Nachrichten-Stufe: Zählt Bumps, Memes und Tsukoyumi-Beiträge."""
+        message = ctx.message
         if not message.guild or message.guild.id != 824029270384312341:
             return
 
@@ -103,6 +113,7 @@ class AchievementSystem(commands.Cog):
                     await message.add_reaction("❤️")
                 else:
                     await message.delete()
+                    ctx.deleted = True
                     try:
                         await message.author.send("❌ Im Meme-Channel sind nur Memes erlaubt!")
                     except discord.Forbidden:
@@ -121,9 +132,14 @@ class AchievementSystem(commands.Cog):
                     print("⚠️ Emoji mit dieser ID nicht gefunden.")
 
     async def increment_achievement(self, member, column, tier_dict, amount=1):
-        async with aiosqlite.connect("achievement.db") as db:
-            await db.execute(f"UPDATE achievements SET {column} = {column} + ? WHERE user_id = ?", (amount, member.id))
-            await db.commit()
+        async with self.bot.db.transaction(DATABASE) as db:
+            # Beim ersten Erfolg wird der User angelegt
+            await db.execute("INSERT OR IGNORE INTO server (guild_id, user_id, username) VALUES (?, ?, ?)",
+                             (GUILD_ID, member.id, member.name))
+            await db.execute(f"""
+                INSERT INTO achievements (user_id, username, {column}) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET {column} = {column} + excluded.{column}, username = excluded.username
+            """, (member.id, member.name, amount))
 
             cursor = await db.execute(f"SELECT {column} FROM achievements WHERE user_id = ?", (member.id,))
             row = await cursor.fetchone()
@@ -144,10 +160,8 @@ class AchievementSystem(commands.Cog):
         if ctx.guild.id != GUILD_ID:
             return await ctx.respond("Dieser Befehl ist nur auf dem Zielserver verfügbar.", ephemeral=True)
 
-        async with aiosqlite.connect("achievement.db") as db:
-            row = await db.execute("SELECT bumps, memes, tsukoyumi FROM achievements WHERE user_id = ?",
-                                   (ctx.author.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT bumps, memes, tsukoyumi FROM achievements WHERE user_id = ?",
+                                            (ctx.author.id,))
 
         if not result:
             return await ctx.respond("Du hast noch keine Erfolge erzielt.", ephemeral=True)
@@ -1,7 +1,8 @@
-import aiosqlite
 import discord
 from discord.ext import commands
 
+DATABASE = "server_settings.db"
+
 
 class ServerChangelog(commands.Cog):
     def __init__(self, bot):
@@ -14,9 +15,8 @@ class ServerChangelog(commands.Cog):
         return None  # Falls nichts gefunden wurde
 
     async def log_action(self, guild, action, details, audit_action=None):
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT log_channel_id FROM settings WHERE guild_id = ?", (guild.id,)) as cursor:
-                log_channel_id = (await cursor.fetchone() or [None])[0]
+        row = await self.bot.db.fetchone(DATABASE, "SELECT log_channel_id FROM settings WHERE guild_id = ?", (guild.id,))
+        log_channel_id = (row or [None])[0]
 
         if log_channel_id:
             log_channel = guild.get_channel(log_channel_id)
@@ -1,159 +1,148 @@
+import asyncio
+
 import discord
-import sqlite3
 import random
 import datetime
 
 from discord import slash_command
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from cooldown_handler import check_cooldown
+from leaderboard_cache import LeaderboardCache
 
 DATABASE = "economy.db"
+SCHEMA_VERSION = 2  # PRAGMA user_version der Economy-Datenbank
+START_BALANCE = 100  # Startguthaben – gilt, solange ein User noch keine Zeile hat
+FLUSH_INTERVAL = 5  # Sekunden zwischen zwei Schreibvorgängen des Nachrichten-Puffers
 
 
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_init()
+        self.leaderboard = LeaderboardCache(self.load_top, ttl=60, dirty_threshold=20)
+        self.pending_messages = []  # (user_id, timestamp) – noch nicht gespeicherte Nachrichten
+        self.flush_lock = asyncio.Lock()
+        self.bot.loop.create_task(self.db_init())
+        self.bot.message_pipeline.add_stage("economy", 30, self.count_message)
+        self.bot.db.add_close_hook(self.flush_messages)  # ✅ Puffer beim Herunterfahren noch speichern
+        self.message_flush_loop.start()
 
+    def cog_unload(self):
+        self.bot.message_pipeline.remove_stage("economy")
+        self.message_flush_loop.cancel()
+        self.bot.db.remove_close_hook(self.flush_messages)
+        self.bot.loop.create_task(self.flush_messages())
 
 
-    def db_init(self):
-        """Erstellt die Economy-Tabelle, falls sie nicht existiert"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    balance INTEGER DEFAULT 100,
-                    bank INTEGER DEFAULT 0,
-                    last_daily TEXT,
-                    last_quest TEXT,
-                    quest_status TEXT DEFAULT 'offen',
-                    quest_reward INTEGER DEFAULT 0,
-                    quest_description TEXT
-                )
-            """)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS inventory (
-                user_id INTEGER,
-                item TEXT,
-                quantity INTEGER DEFAULT 1,
-                PRIMARY KEY (user_id, item)
-            )
-        """)
-        # Nachrichtentracking für Quests
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
 
-        # Glücksspiel-Tracking für Quests
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS gambles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    async def db_init(self):
+        """Erstellt die Economy-Tabelle, falls sie nicht existiert"""
+        async with self.bot.db.transaction(DATABASE) as db:
+            await db.execute("""
+                    CREATE TABLE IF NOT EXISTS users (
+                        user_id INTEGER PRIMARY KEY,
+                        balance INTEGER DEFAULT 100,
+                        bank INTEGER DEFAULT 0,
+                        last_daily TEXT,
+                        last_quest TEXT,
+                        quest_status TEXT DEFAULT 'offen',
+                        quest_reward INTEGER DEFAULT 0,
+                        quest_description TEXT
+                    )
+                """)
+            # Zeilen entstehen erst bei der ersten Interaktion (Startwerte siehe START_BALANCE)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS inventory (
                     user_id INTEGER,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                    result TEXT CHECK(result IN ('win', 'lose'))
-                )
-            """)
-
-        # Transaktions-Tracking für Quests
-        cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender_id INTEGER,
-                    receiver_id INTEGER,
-                    amount INTEGER,
-                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+                    item TEXT,
+                    quantity INTEGER DEFAULT 1,
+                    PRIMARY KEY (user_id, item)
                 )
             """)
-        conn.commit()
-        conn.close()
-    def get_balance(self, user_id):
+            # Nachrichtentracking für Quests
+            await db.execute("""
+                    CREATE TABLE IF NOT EXISTS messages (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+
+            # Glücksspiel-Tracking für Quests
+            await db.execute("""
+                    CREATE TABLE IF NOT EXISTS gambles (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                        result TEXT CHECK(result IN ('win', 'lose'))
+                    )
+                """)
+
+            # Transaktions-Tracking für Quests
+            await db.execute("""
+                    CREATE TABLE IF NOT EXISTS transactions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        sender_id INTEGER,
+                        receiver_id INTEGER,
+                        amount INTEGER,
+                        timestamp TEXT DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+
+            async with db.execute("PRAGMA user_version") as cursor:
+                version = (await cursor.fetchone())[0]
+            if version < 1:
+                await self.drop_placeholder_rows(db)
+            if version < 2:
+                # Migration 2: Der Mitglieder-Abgleich beim Start (Tabelle `member_sync`) wird hier nicht mehr genutzt
+                await db.execute("DROP TABLE IF EXISTS member_sync")
+            await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    async def drop_placeholder_rows(self, db):
+        """Migration 1: Entfernt die Platzhalter, die früher bei jedem Start für jedes Mitglied angelegt wurden.
+
+        Gelöscht wird nur, was eindeutig ein Platzhalter ist: die Dummy-Überweisungen
+        (Empfänger 0, Betrag 0), das 'start-item' und User-Zeilen, die noch exakt den
+        Startwerten entsprechen. Die Dummy-Einträge in `messages` und `gambles` lassen
+        sich nicht sicher von echten unterscheiden und bleiben stehen; Quests zählen
+        ohnehin nur Einträge seit dem Quest-Start.
+        """
+        await db.execute("DELETE FROM transactions WHERE receiver_id = 0 AND amount = 0")
+        await db.execute("DELETE FROM inventory WHERE item = 'start-item'")
+        await db.execute("""
+            DELETE FROM users
+            WHERE balance = ? AND bank = 0 AND last_daily IS NULL AND last_quest IS NULL
+              AND quest_reward = 0 AND quest_description IS NULL
+        """, (START_BALANCE,))
+
+    async def get_balance(self, user_id):
         """Holt den aktuellen Kontostand (Wallet & Bank)"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT balance, bank FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result if result else (0, 0)
-    def update_balance(self, user_id, wallet_change=0, bank_change=0):
-        """Fügt Coins zur Wallet oder Bank hinzu/zieht sie ab"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute(
+        result = await self.bot.db.fetchone(DATABASE, "SELECT balance, bank FROM users WHERE user_id = ?", (user_id,))
+        return result if result else (START_BALANCE, 0)
+    async def update_balance(self, user_id, wallet_change=0, bank_change=0):
+        """Fügt Coins zur Wallet oder Bank hinzu/zieht sie ab (legt den User beim ersten Mal an)"""
+        await self.bot.db.execute(
+            DATABASE,
             "INSERT INTO users (user_id, balance, bank) VALUES (?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET balance = balance + ?, bank = bank + ?",
-            (user_id, wallet_change, bank_change, wallet_change, bank_change))
-        conn.commit()
-        conn.close()
-    def add_item(self, user_id, item):
+            (user_id, START_BALANCE + wallet_change, bank_change, wallet_change, bank_change))
+        self.leaderboard.mark_dirty("global")
+    async def add_item(self, user_id, item):
         """Fügt ein Item ins Inventar hinzu"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute(
+        await self.bot.db.execute(
+            DATABASE,
             "INSERT INTO inventory (user_id, item, quantity) VALUES (?, ?, 1) ON CONFLICT(user_id, item) DO UPDATE SET quantity = quantity + 1",
             (user_id, item))
-        conn.commit()
-        conn.close()
-    def has_item(self, user_id, item):
+    async def has_item(self, user_id, item):
         """Prüft, ob der User ein bestimmtes Item besitzt"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT quantity FROM inventory WHERE user_id = ? AND item = ?", (user_id, item))
-        result = cursor.fetchone()
-        conn.close()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT quantity FROM inventory WHERE user_id = ? AND item = ?",
+                                            (user_id, item))
         return result[0] if result else 0
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Fügt alle Mitglieder zur Datenbank hinzu, sobald der Bot bereit ist"""
-        await self.bot.wait_until_ready()
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        for guild in self.bot.guilds:
-            for member in guild.members:
-                if not member.bot:  # Nur echte User hinzufügen
-                    cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (member.id,))
-                    cursor.execute("INSERT OR IGNORE INTO inventory (user_id, item, quantity) VALUES (?, ?, ?)",
-                                   (member.id, 'start-item', 1))
-                    cursor.execute("INSERT OR IGNORE INTO messages (user_id) VALUES (?)", (member.id,))
-                    cursor.execute("INSERT OR IGNORE INTO gambles (user_id, result) VALUES (?, ?)", (member.id, 'lose'))
-                    cursor.execute(
-                        "INSERT OR IGNORE INTO transactions (sender_id, receiver_id, amount) VALUES (?, ?, ?)",
-                        (member.id, 0, 0))
-
-        conn.commit()
-        conn.close()
-        print("✅  Alle Mitglieder wurden zur Datenbank hinzugefügt.")
-    @commands.Cog.listener()
-    async def on_member_join(self, member):
-        """Fügt neue Mitglieder automatisch in alle Tabellen ein."""
-        if member.bot:  # Bots ignorieren
-            return
-
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
 
-        cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (member.id,))
-        cursor.execute("INSERT OR IGNORE INTO inventory (user_id, item, quantity) VALUES (?, ?, ?)",
-                       (member.id, 'start-item', 1))
-        cursor.execute("INSERT OR IGNORE INTO messages (user_id) VALUES (?)", (member.id,))
-        cursor.execute("INSERT OR IGNORE INTO gambles (user_id, result) VALUES (?, ?)", (member.id, 'lose'))
-        cursor.execute("INSERT OR IGNORE INTO transactions (sender_id, receiver_id, amount) VALUES (?, ?, ?)",
-                       (member.id, 0, 0))
-
-        conn.commit()
-        conn.close()
-        print(f"✅ {member.name} wurde in die Datenbank eingefügt.")
     @slash_command(name="balance", description="Zeigt deinen Kontostand")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def balance(self, ctx):
         """Zeigt den Wallet- und Bank-Kontostand"""
-        balance, bank = self.get_balance(ctx.author.id)
+        balance, bank = await self.get_balance(ctx.author.id)
         await ctx.respond(f"💰 Wallet: **{balance} Coins**\n🏦 Bank: **{bank} Coins**")
 
     @commands.slash_command(name="addcoins", description="Fügt einem User Coins hinzu (Admin)")
@@ -164,7 +153,7 @@ class Economy(commands.Cog):
             await ctx.respond("❌ Betrag muss größer als 0 sein.")
             return
 
-        self.update_balance(member.id, amount)
+        await self.update_balance(member.id, amount)
         await ctx.respond(f"✅ {amount} Coins wurden zu {member.mention} hinzugefügt.")
 
     @slash_command(name="daily", description="Erhalte einmal pro Tag Coins")
@@ -172,50 +161,44 @@ class Economy(commands.Cog):
     async def daily(self, ctx):
         """User können einmal pro Tag Coins abholen"""
         user_id = ctx.author.id
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT last_daily FROM users WHERE user_id = ?", (user_id,))
-        result = cursor.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT last_daily FROM users WHERE user_id = ?", (user_id,))
         today = datetime.date.today().isoformat()
 
         if result and result[0] == today:
             await ctx.respond("❌ Du hast deine täglichen Coins heute schon abgeholt.")
         else:
             reward = random.randint(100, 300)  # Zufälliger Daily-Bonus
-            self.update_balance(user_id, reward)
-            cursor.execute(
+            await self.update_balance(user_id, reward)
+            await self.bot.db.execute(
+                DATABASE,
                 "INSERT INTO users (user_id, last_daily) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET last_daily = ?",
                 (user_id, today, today))
-            conn.commit()
             await ctx.respond(f"✅ Du hast **{reward} Coins** erhalten!")
 
-        conn.close()
-
     @slash_command(name="deposit", description="Lege Geld auf die Bank")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def deposit(self, ctx, amount: int):
         """User können Geld auf die Bank legen"""
-        balance, bank = self.get_balance(ctx.author.id)
+        balance, bank = await self.get_balance(ctx.author.id)
 
         if amount <= 0 or amount > balance:
             await ctx.respond("❌ Ungültige Menge oder nicht genug Coins.")
             return
 
-        self.update_balance(ctx.author.id, -amount, amount)
+        await self.update_balance(ctx.author.id, -amount, amount)
         await ctx.respond(f"✅ Du hast **{amount} Coins** auf die Bank eingezahlt!")
 
     @slash_command(name="withdraw", description="Hebe Geld von der Bank ab")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def withdraw(self, ctx, amount: int):
         """User können Geld von der Bank abheben"""
-        balance, bank = self.get_balance(ctx.author.id)
+        balance, bank = await self.get_balance(ctx.author.id)
 
         if amount <= 0 or amount > bank:
             await ctx.respond("❌ Ungültige Menge oder nicht genug Coins auf der Bank.")
             return
 
-        self.update_balance(ctx.author.id, amount, -amount)
+        await self.update_balance(ctx.author.id, amount, -amount)
         await ctx.respond(f"✅ Du hast **{amount} Coins** von der Bank abgehoben!")
 
     @slash_command(name="shop", description="Zeigt den virtuellen Shop")
@@ -227,19 +210,34 @@ class Economy(commands.Cog):
         embed.add_field(name="🕶️ Diebesmaske", value="3000 Coins - Erhöht die Raub-Erfolgsrate", inline=False)
         await ctx.respond(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Speichert jede gesendete Nachricht in der Datenbank"""
-        if message.author.bot:
+    async def count_message(self, ctx):
+        """Nachrichten-Stufe: Merkt sich jede gesendete Nachricht; gespeichert wird gebündelt."""
+        if ctx.message.author.bot:
             return  # Bots ignorieren
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO messages (user_id, timestamp) VALUES (?, CURRENT_TIMESTAMP)
-        """, (message.author.id,))
+        # Gleiches Format wie CURRENT_TIMESTAMP (UTC), damit die Quest-Abfrage unverändert bleibt
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self.pending_messages.append((ctx.message.author.id, timestamp))
+
+    async def flush_messages(self):
+        """Schreibt alle gepufferten Nachrichten in einer einzigen Transaktion."""
+        async with self.flush_lock:
+            if not self.pending_messages:
+                return
 
-        conn.commit()
-        conn.close()
+            rows, self.pending_messages = self.pending_messages, []
+            try:
+                await self.bot.db.executemany(DATABASE, "INSERT INTO messages (user_id, timestamp) VALUES (?, ?)",
+                                              rows)
+            except Exception:
+                self.pending_messages[:0] = rows  # Beim nächsten Durchlauf erneut versuchen
+                raise
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def message_flush_loop(self):
+        try:
+            await self.flush_messages()
+        except Exception as e:
+            print(f"❌ Fehler beim Speichern der Nachrichten: {e}")
 
     @commands.slash_command(name="buy", description="Kaufe ein Item aus dem Shop")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
@@ -253,21 +251,21 @@ class Economy(commands.Cog):
             return
 
         price = prices[item]
-        balance, _ = self.get_balance(ctx.author.id)
+        balance, _ = await self.get_balance(ctx.author.id)
 
         if balance < price:
             await ctx.respond("❌ Du hast nicht genug Coins für dieses Item.")
             return
 
-        self.update_balance(ctx.author.id, -price)
-        self.add_item(ctx.author.id, item)
+        await self.update_balance(ctx.author.id, -price)
+        await self.add_item(ctx.author.id, item)
         await ctx.respond(f"✅ Du hast **{item.capitalize()}** für **{price} Coins** gekauft!")
 
     @commands.slash_command(name="gamble", description="Spiele und verdopple dein Geld oder verliere es")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def gamble(self, ctx, amount: int):
         """User können Coins setzen – mit Bonus, falls sie einen Glückshut haben"""
-        balance, _ = self.get_balance(ctx.author.id)
+        balance, _ = await self.get_balance(ctx.author.id)
 
         if amount <= 0 or amount > balance:
             await ctx.respond("❌ Ungültige Menge oder nicht genug Coins.")
@@ -276,29 +274,25 @@ class Economy(commands.Cog):
         win_chance = 50  # Standard Gewinnchance
 
         # 🎩 Prüfen, ob der User einen Glückshut besitzt
-        if self.has_item(ctx.author.id, "glückshut"):
+        if await self.has_item(ctx.author.id, "glückshut"):
             win_chance += 20  # Erhöht die Chance um 20% (50% → 70%)
 
         gamble_result = "lose"
 
         if random.randint(1, 100) <= win_chance:
             bonus = random.randint(100, 1000)  # Zufälliger Bonus
-            self.update_balance(ctx.author.id, amount + bonus)
+            await self.update_balance(ctx.author.id, amount + bonus)
             gamble_result = "win"
             await ctx.respond(
                 f"🎰 **Glückwunsch!** Du hast **{amount} Coins** gewonnen und einen Bonus von **{bonus} Coins** erhalten! 🎉")
         else:
-            self.update_balance(ctx.author.id, -amount)
+            await self.update_balance(ctx.author.id, -amount)
             await ctx.respond(f"💀 **Pech gehabt!** Du hast **{amount} Coins** verloren. 😢")
 
         # Glücksspiel-Ergebnis speichern
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("""
+        await self.bot.db.execute(DATABASE, """
             INSERT INTO gambles (user_id, result) VALUES (?, ?)
         """, (ctx.author.id, gamble_result))
-        conn.commit()
-        conn.close()
 
         print(f"✅ Glücksspiel gespeichert: {ctx.author} - {gamble_result}")
 
@@ -319,13 +313,11 @@ class Economy(commands.Cog):
 
         }
 
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
         # 🔍 Aktuelle Quest abrufen
-        cursor.execute("SELECT last_quest, quest_status, quest_reward, quest_description FROM users WHERE user_id = ?",
-                       (ctx.author.id,))
-        result = cursor.fetchone()
+        result = await self.bot.db.fetchone(
+            DATABASE,
+            "SELECT last_quest, quest_status, quest_reward, quest_description FROM users WHERE user_id = ?",
+            (ctx.author.id,))
 
         now = datetime.datetime.now()
         last_quest_time = datetime.datetime.strptime(result[0], "%Y-%m-%d %H:%M:%S") if result and result[0] else None
@@ -336,18 +328,16 @@ class Economy(commands.Cog):
             new_quest = random.choice(quests)
             quest_reward = quest_rewards[new_quest]
 
-            cursor.execute("""
-                UPDATE users 
-                SET last_quest = ?, quest_status = 'offen', quest_reward = ?, quest_description = ? 
-                WHERE user_id = ?
-            """, (now.strftime("%Y-%m-%d %H:%M:%S"), quest_reward, new_quest, ctx.author.id))
+            await self.bot.db.execute(DATABASE, """
+                INSERT INTO users (user_id, last_quest, quest_status, quest_reward, quest_description)
+                VALUES (?, ?, 'offen', ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET last_quest = excluded.last_quest, quest_status = 'offen',
+                    quest_reward = excluded.quest_reward, quest_description = excluded.quest_description
+            """, (ctx.author.id, now.strftime("%Y-%m-%d %H:%M:%S"), quest_reward, new_quest))
 
-            conn.commit()
             current_quest = new_quest  # Aktualisierte Quest setzen
             quest_status = "offen"
 
-        conn.close()
-
         # 📝 Embed zur Anzeige der aktuellen Quest
         embed = discord.Embed(title="📜 Deine Tagesquest", color=discord.Color.blue())
         embed.add_field(name="🔹 Aufgabe:", value=f"**{current_quest}**", inline=False)
@@ -370,13 +360,11 @@ class Economy(commands.Cog):
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def completequest(self, ctx):
         """Prüft, ob der User seine Tagesquest erfüllt hat und gibt die Belohnung."""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
         # 🛠 Richtige Spalten aus der Datenbank abrufen!
-        cursor.execute("SELECT last_quest, quest_status, quest_reward, quest_description FROM users WHERE user_id = ?",
-                       (ctx.author.id,))
-        result = cursor.fetchone()
+        result = await self.bot.db.fetchone(
+            DATABASE,
+            "SELECT last_quest, quest_status, quest_reward, quest_description FROM users WHERE user_id = ?",
+            (ctx.author.id,))
 
         if not result:
             await ctx.respond("❌ Du hast keine aktive Tagesquest.", ephemeral=True)
@@ -393,8 +381,7 @@ class Economy(commands.Cog):
         import datetime
 
         # 🛠 `quest_date` aus der DB abrufen
-        cursor.execute("SELECT last_quest FROM users WHERE user_id = ?", (ctx.author.id,))
-        result = cursor.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT last_quest FROM users WHERE user_id = ?", (ctx.author.id,))
         quest_date = result[0] if result else None  # `None`, falls kein Wert vorhanden ist
 
         if quest_date:
@@ -410,20 +397,22 @@ class Economy(commands.Cog):
             quest_date = quest_date.strftime("%Y-%m-%d %H:%M:%S")
 
         # 🛠 SQL-Abfrage mit richtigem `quest_date`
-        cursor.execute("""
-            SELECT COUNT(*) FROM messages 
-            WHERE user_id = ? 
-            AND datetime(timestamp) >= datetime(?)
-        """, (ctx.author.id, quest_date))
-        messages_sent = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM gambles WHERE user_id = ? AND timestamp >= ? AND result = 'win'",
-                       (ctx.author.id, quest_date))
-        gambles_won = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM transactions WHERE sender_id = ? AND timestamp >= ? AND amount >= 50",
-                       (ctx.author.id, quest_date))
-        coins_sent = cursor.fetchone()[0]
+        await self.flush_messages()  # Gepufferte Nachrichten zuerst speichern
+        async with self.bot.db.transaction(DATABASE) as db:
+            async with db.execute("""
+                SELECT COUNT(*) FROM messages 
+                WHERE user_id = ? 
+                AND datetime(timestamp) >= datetime(?)
+            """, (ctx.author.id, quest_date)) as cursor:
+                messages_sent = (await cursor.fetchone())[0]
+
+            async with db.execute("SELECT COUNT(*) FROM gambles WHERE user_id = ? AND timestamp >= ? AND result = 'win'",
+                                  (ctx.author.id, quest_date)) as cursor:
+                gambles_won = (await cursor.fetchone())[0]
+
+            async with db.execute("SELECT COUNT(*) FROM transactions WHERE sender_id = ? AND timestamp >= ? AND amount >= 50",
+                                  (ctx.author.id, quest_date)) as cursor:
+                coins_sent = (await cursor.fetchone())[0]
 
         quest_completed = False
 
@@ -443,10 +432,9 @@ class Economy(commands.Cog):
             return
 
         # 🏆 Quest abschließen & Belohnung geben
-        self.update_balance(ctx.author.id, quest_reward)
-        cursor.execute("UPDATE users SET quest_status = 'abgeschlossen' WHERE user_id = ?", (ctx.author.id,))
-        conn.commit()
-        conn.close()
+        await self.update_balance(ctx.author.id, quest_reward)
+        await self.bot.db.execute(DATABASE, "UPDATE users SET quest_status = 'abgeschlossen' WHERE user_id = ?",
+                                  (ctx.author.id,))
 
         # Erfolgreiches Abschluss-Embed
         embed = discord.Embed(title="🎉 Quest abgeschlossen!", color=discord.Color.gold())
@@ -469,7 +457,7 @@ class Economy(commands.Cog):
             await ctx.respond("❌ Du kannst dich nicht selbst ausrauben!")
             return
 
-        victim_balance, _ = self.get_balance(member.id)
+        victim_balance, _ = await self.get_balance(member.id)
 
         if victim_balance < 100:
             await ctx.respond(f"❌ {member.mention} hat nicht genug Coins in der Wallet zum Ausrauben.")
@@ -479,19 +467,19 @@ class Economy(commands.Cog):
         success_chance = 60
 
         # Prüfen, ob der User eine Diebesmaske hat → Erfolgsrate auf 85% erhöhen
-        if self.has_item(ctx.author.id, "diebesmaske"):
+        if await self.has_item(ctx.author.id, "diebesmaske"):
             success_chance = 85
 
         # Erfolgswurf (Zahl zwischen 1-100, muss unterhalb der Erfolgsrate liegen)
         if random.randint(1, 100) <= success_chance:
             stolen_amount = random.randint(50, min(victim_balance, 300))  # Max. 300 Coins klauen
-            self.update_balance(ctx.author.id, stolen_amount)  # Dieb bekommt Coins
-            self.update_balance(member.id, -stolen_amount)  # Opfer verliert Coins
+            await self.update_balance(ctx.author.id, stolen_amount)  # Dieb bekommt Coins
+            await self.update_balance(member.id, -stolen_amount)  # Opfer verliert Coins
 
             await ctx.respond(f"🕵️‍♂️ Du hast **{stolen_amount} Coins** von {member.mention} gestohlen! 🏴‍☠️")
         else:
             # Wenn der Diebstahl fehlschlägt, verliert der Dieb 100 Coins als Strafe
-            self.update_balance(ctx.author.id, -100)
+            await self.update_balance(ctx.author.id, -100)
             await ctx.respond(
                 f"🚔 Pech gehabt! {member.mention} hat dich erwischt! Du verlierst **100 Coins** als Strafe! 😡")
 
@@ -512,7 +500,7 @@ class Economy(commands.Cog):
             return
 
         # 💰 Kontostand des Senders abrufen
-        sender_balance, _ = self.get_balance(sender_id)
+        sender_balance, _ = await self.get_balance(sender_id)
 
         # ❌ Überprüfung, ob der User genug Geld hat
         if sender_balance < amount:
@@ -520,18 +508,17 @@ class Economy(commands.Cog):
             return
 
         # ✅ Geld übertragen
-        self.update_balance(sender_id, -amount)
-        self.update_balance(receiver_id, amount)
-
-        # ✅ Transaktion speichern
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO transactions (sender_id, receiver_id, amount, timestamp) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        """, (sender_id, receiver_id, amount))
-        conn.commit()
-        conn.close()
+        # ✅ Überweisung und Transaktion atomar speichern
+        async with self.bot.db.transaction(DATABASE) as db:
+            for user_id, change in ((sender_id, -amount), (receiver_id, amount)):
+                await db.execute(
+                    "INSERT INTO users (user_id, balance, bank) VALUES (?, ?, 0) ON CONFLICT(user_id) DO UPDATE SET balance = balance + ?",
+                    (user_id, START_BALANCE + change, change))
+            await db.execute("""
+                INSERT INTO transactions (sender_id, receiver_id, amount, timestamp) 
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, (sender_id, receiver_id, amount))
+        self.leaderboard.mark_dirty("global", amount=2)
 
         # ✅ Debugging-Bestätigung in der Konsole
         print(f"✅ DEBUG: {ctx.author} ({sender_id}) → {member} ({receiver_id}): {amount} Coins überwiesen.")
@@ -539,17 +526,18 @@ class Economy(commands.Cog):
         # ✅ Erfolgreiche Überweisung
         await ctx.respond(f"✅ {ctx.author.mention} hat **{amount} Coins** an {member.mention} gesendet!")
 
+    async def load_top(self, scope):
+        """Holen aller Nutzer nach Balance + Bank, absteigend sortiert"""
+        rows = await self.bot.db.fetchall(
+            DATABASE, "SELECT user_id, balance, bank FROM users ORDER BY (balance + bank) DESC LIMIT 10")
+        return rows
+
     @commands.slash_command(name="top", description="Zeigt das reichste Ranking auf dem Server")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def top(self, ctx):
         """Zeigt ein Leaderboard mit den reichsten Spielern (Wallet + Bank kombiniert)"""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-
-        # Holen aller Nutzer nach Balance + Bank, absteigend sortiert
-        cursor.execute("SELECT user_id, balance, bank FROM users ORDER BY (balance + bank) DESC LIMIT 10")
-        top_users = cursor.fetchall()
-        conn.close()
+        # Vorberechnete Top 10 (wird nur bei Bedarf neu aus der Datenbank geladen)
+        top_users, updated_at = await self.leaderboard.get("global")
 
         # Falls keine Daten vorhanden sind
         if not top_users:
@@ -557,7 +545,8 @@ class Economy(commands.Cog):
             return
 
         # Leaderboard erstellen
-        embed = discord.Embed(title="🏆 Leaderboard - Reichste Spieler", color=discord.Color.gold())
+        embed = discord.Embed(title="🏆 Leaderboard - Reichste Spieler", color=discord.Color.gold(),
+                              timestamp=updated_at)
 
         for rank, (user_id, balance, bank) in enumerate(top_users, start=1):
             user = self.bot.get_user(user_id)  # Holt den Discord-Benutzer
@@ -577,9 +566,9 @@ class Economy(commands.Cog):
                 break
 
         if user_rank:
-            embed.set_footer(text=f"Du bist aktuell auf Platz #{user_rank}!")
+            embed.set_footer(text=f"Du bist aktuell auf Platz #{user_rank}! • Zuletzt aktualisiert")
         else:
-            embed.set_footer(text="Spiele mehr, um in die Top 10 zu kommen!")
+            embed.set_footer(text="Spiele mehr, um in die Top 10 zu kommen! • Zuletzt aktualisiert")
 
         await ctx.respond(embed=embed)
 
@@ -1,20 +1,49 @@
-from discord.ext import commands
+import asyncio
+
+from discord.ext import commands, tasks
 from discord.commands import slash_command, Option
 import discord
-import aiosqlite
 import random
 
 from cooldown_handler import check_cooldown
+from rank_index import RankIndex
+from leaderboard_cache import LeaderboardCache
+
+DATABASE = "levels.db"
+FLUSH_INTERVAL = 5  # Sekunden zwischen zwei Schreibvorgängen des XP-Puffers
+
+
+def rank_score(key):
+    """(level, xp) -> Ganzzahl mit derselben Reihenfolge (für den Fenwick-Baum im RankIndex)."""
+    level, xp = key
+    return max(level, 0) << 32 | min(max(xp, 0), 0xFFFFFFFF)
 
 
 class LevelSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bot.loop.create_task(self.create_db())
+        self.xp_cache = {}  # user_id -> (xp, level), maßgeblicher Stand für alle geladenen Benutzer
+        self.dirty_users = set()  # Benutzer mit noch nicht gespeicherten Änderungen
+        self.flush_lock = asyncio.Lock()
+        self.global_ranks = RankIndex(score=rank_score)  # Alle Benutzer, Schlüssel (level, xp)
+        self.guild_ranks = {}  # guild_id -> RankIndex der Mitglieder
+        self.user_guilds = {}  # user_id -> {guild_id, ...}
+        self.rankings_ready = asyncio.Event()
+        self.leaderboards = LeaderboardCache(self.load_leaderboard, ttl=60, dirty_threshold=200)
+        self.bot.loop.create_task(self.load_levels())
+        self.bot.message_pipeline.add_stage("xp", 20, self.message_xp)
+        self.bot.db.add_close_hook(self.flush_xp)  # ✅ Puffer beim Herunterfahren noch speichern
+        self.xp_flush_loop.start()
+
+    def cog_unload(self):
+        self.bot.message_pipeline.remove_stage("xp")
+        self.xp_flush_loop.cancel()
+        self.bot.db.remove_close_hook(self.flush_xp)
+        self.bot.loop.create_task(self.flush_xp())
 
     async def create_db(self):
         """Erstellt die Datenbank und Tabelle, falls sie nicht existiert."""
-        async with aiosqlite.connect("levels.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute(
                 """CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -22,31 +51,135 @@ class LevelSystem(commands.Cog):
                     level INTEGER DEFAULT 1
                 )"""
             )
-            await db.commit()
+            # Backup-Tabelle für reset-level / restore-level
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS backup_users (
+                    user_id INTEGER PRIMARY KEY,
+                    xp INTEGER,
+                    level INTEGER
+                )
+            """)
+            # Sortierte Abfragen (Leaderboard) laufen über den Index statt über die ganze Tabelle
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_level_xp ON users (level, xp)")
+            # Server-Mitgliedschaften für Server-Leaderboards (statt riesiger IN-Listen)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS guild_members (
+                    guild_id INTEGER,
+                    user_id INTEGER,
+                    PRIMARY KEY (guild_id, user_id)
+                )
+            """)
+
+    async def load_levels(self):
+        """Erstellt die Tabellen, lädt alle Benutzer und baut die Ranglisten auf."""
+        await self.create_db()
+        await self.bot.wait_until_ready()
+
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT user_id, xp, level FROM users")
+        for user_id, xp, level in rows:
+            self.xp_cache.setdefault(user_id, (xp, level))  # Neuere Werte im Puffer haben Vorrang
+
+        self.global_ranks = RankIndex(((user_id, (level, xp)) for user_id, (xp, level) in self.xp_cache.items()),
+                                      score=rank_score)
+        self.user_guilds = {}
+        for guild in self.bot.guilds:
+            self.build_guild_ranks(guild)
+        await self.sync_guild_members(self.bot.guilds)
+
+        self.rankings_ready.set()
+        print(f"✅ Ranglisten für {len(self.global_ranks)} Benutzer aufgebaut.")
+
+    def build_guild_ranks(self, guild):
+        """Baut die Server-Rangliste aus den zwischengespeicherten Mitgliedern auf."""
+        entries = []
+        for member in guild.members:
+            if member.bot:
+                continue
+            self.user_guilds.setdefault(member.id, set()).add(guild.id)
+            key = self.global_ranks.get(member.id)
+            if key is not None:
+                entries.append((member.id, key))
+        self.guild_ranks[guild.id] = RankIndex(entries, score=rank_score)
+
+    async def sync_guild_members(self, guilds):
+        """Gleicht die gespeicherten Mitglieder ab; unveränderte Server werden übersprungen."""
+        await self.bot.member_sync.sync(DATABASE, "guild_members", guilds, [
+            ("DELETE FROM guild_members WHERE guild_id = ?", lambda guild: [(guild.id,)]),
+            ("INSERT INTO guild_members (guild_id, user_id) VALUES (?, ?)",
+             lambda guild: [(guild.id, member.id) for member in guild.members if not member.bot]),
+        ])
+
+    def update_ranks(self, user_id: int, xp: int, level: int):
+        """Trägt einen neuen Stand in die globale und alle Server-Ranglisten ein."""
+        key = (level, xp)
+        self.global_ranks.update(user_id, key)
+        for guild_id in self.user_guilds.get(user_id, ()):
+            if guild_id in self.guild_ranks:
+                self.guild_ranks[guild_id].update(user_id, key)
+
+    def remove_ranks(self, user_id: int):
+        self.global_ranks.remove(user_id)
+        for guild_id in self.user_guilds.get(user_id, ()):
+            if guild_id in self.guild_ranks:
+                self.guild_ranks[guild_id].remove(user_id)
 
     async def get_user(self, user_id: int):
-        """Holt die XP und das Level eines Benutzers aus der Datenbank."""
-        async with aiosqlite.connect("levels.db") as db:
-            async with db.execute("SELECT xp, level FROM users WHERE user_id = ?", (user_id,)) as cursor:
-                return await cursor.fetchone()
+        """Holt die XP und das Level eines Benutzers aus dem Puffer (`None` für neue Benutzer)."""
+        if user_id in self.xp_cache or self.rankings_ready.is_set():
+            return self.xp_cache.get(user_id)  # Nach dem Start sind alle Benutzer im Puffer
+
+        # Nur solange `load_levels` noch läuft
+        row = await self.bot.db.fetchone(DATABASE, "SELECT xp, level FROM users WHERE user_id = ?", (user_id,))
+        if row is None:
+            return None
+        # Während des Wartens kann eine andere Nachricht den Benutzer schon geladen haben
+        return self.xp_cache.setdefault(user_id, (row[0], row[1]))
+
+    def set_user(self, user_id: int, xp: int, level: int):
+        """Setzt den Stand im Puffer; gespeichert wird beim nächsten `flush_xp`."""
+        self.xp_cache[user_id] = (xp, level)
+        self.dirty_users.add(user_id)
+        self.update_ranks(user_id, xp, level)
+        self.leaderboards.mark_dirty("global", *self.user_guilds.get(user_id, ()))
+
+    async def flush_xp(self):
+        """Schreibt alle gepufferten XP-Änderungen in einer einzigen Transaktion."""
+        async with self.flush_lock:
+            if not self.dirty_users:
+                return
+
+            dirty, self.dirty_users = self.dirty_users, set()
+            rows = [(user_id, *self.xp_cache[user_id]) for user_id in dirty if user_id in self.xp_cache]
+            try:
+                await self.bot.db.executemany(DATABASE,
+                                              "INSERT OR REPLACE INTO users (user_id, xp, level) VALUES (?, ?, ?)",
+                                              rows)
+            except Exception:
+                self.dirty_users |= dirty  # Beim nächsten Durchlauf erneut versuchen
+                raise
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def xp_flush_loop(self):
+        try:
+            await self.flush_xp()
+        except Exception as e:
+            print(f"❌ Fehler beim Speichern der XP: {e}")
 
     async def add_xp(self, user_id: int, xp_to_add: int, message: discord.Message = None):
-        """Fügt XP hinzu und prüft auf Level-Up."""
-        async with aiosqlite.connect("levels.db") as db:
-            user = await self.get_user(user_id)
-            xp, level = user if user else (0, 1)
-            xp += xp_to_add
-            new_level = level
-
-            leveled_up = False
-            while xp >= 100 * new_level:
-                xp -= 100 * new_level
-                new_level += 1
-                leveled_up = True  # ✅ Level-Up erkannt!
+        """Fügt XP hinzu und prüft sofort auf Level-Up; gespeichert wird gebündelt."""
+        await self.get_user(user_id)  # Lädt den Benutzer beim ersten Mal in den Puffer
+        # Erst nach dem Laden lesen: zwischen Lesen und Schreiben liegt kein `await` mehr
+        xp, level = self.xp_cache.get(user_id, (0, 1))
+        xp += xp_to_add
+        new_level = level
 
-            await db.execute("INSERT OR REPLACE INTO users (user_id, xp, level) VALUES (?, ?, ?)",
-                             (user_id, xp, new_level))
-            await db.commit()
+        leveled_up = False
+        while xp >= 100 * new_level:
+            xp -= 100 * new_level
+            new_level += 1
+            leveled_up = True  # ✅ Level-Up erkannt!
+
+        self.set_user(user_id, xp, new_level)
 
         if leveled_up and message:  # ✅ Level-Up Nachricht nur senden, wenn `message` vorhanden ist
             embed = discord.Embed(
@@ -57,14 +190,48 @@ class LevelSystem(commands.Cog):
             )
             await message.channel.send(embed=embed)  # ✅ Level-Up Nachricht senden
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        """Wird bei jeder gesendeten Nachricht ausgelöst (ohne Bots)."""
-        if message.author.bot:
+    async def message_xp(self, ctx):
+        """Nachrichten-Stufe: Vergibt XP für jede gesendete Nachricht (ohne Bots)."""
+        if ctx.message.author.bot:
             return
 
         xp_to_add = random.randint(5, 15)  # Zufällige XP zwischen 5 und 15
-        await self.add_xp(message.author.id, xp_to_add)
+        await self.add_xp(ctx.message.author.id, xp_to_add)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        if member.bot:
+            return
+        self.user_guilds.setdefault(member.id, set()).add(member.guild.id)
+        key = self.global_ranks.get(member.id)
+        if key is not None:
+            self.guild_ranks.setdefault(member.guild.id, RankIndex(score=rank_score)).update(member.id, key)
+        await self.bot.db.execute(DATABASE, "INSERT OR IGNORE INTO guild_members (guild_id, user_id) VALUES (?, ?)",
+                                  (member.guild.id, member.id))
+        self.leaderboards.mark_dirty(member.guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.user_guilds.get(member.id, set()).discard(member.guild.id)
+        if member.guild.id in self.guild_ranks:
+            self.guild_ranks[member.guild.id].remove(member.id)
+        await self.bot.db.execute(DATABASE, "DELETE FROM guild_members WHERE guild_id = ? AND user_id = ?",
+                                  (member.guild.id, member.id))
+        self.leaderboards.mark_dirty(member.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild):
+        self.build_guild_ranks(guild)
+        await self.sync_guild_members([guild])
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.guild_ranks.pop(guild.id, None)
+        for guild_ids in self.user_guilds.values():
+            guild_ids.discard(guild.id)
+        await self.bot.db.execute(DATABASE, "DELETE FROM guild_members WHERE guild_id = ?", (guild.id,))
+        await self.bot.member_sync.forget(DATABASE, "guild_members", guild.id)
+        self.leaderboards.invalidate(guild.id)
 
     @slash_command(name="level", description="Zeigt dein detailliertes Level-Profil an.")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
@@ -83,19 +250,14 @@ class LevelSystem(commands.Cog):
         progress = int((xp / next_level_xp) * 10)  # Fortschrittsbalken (10 Blöcke)
         progress_bar = "█" * progress + "░" * (10 - progress)  # Optische Darstellung
 
-        # Rangberechnung (Global)
-        async with aiosqlite.connect("levels.db") as db:
-            async with db.execute("SELECT COUNT(*) FROM users WHERE level > ? OR (level = ? AND xp > ?)",
-                                  (level, level, xp)) as cursor:
-                global_rank = (await cursor.fetchone())[0] + 1  # Aktuelle Position
+        await self.rankings_ready.wait()
+
+        # Rangberechnung (Global) – Zählabfrage im Fenwick-Baum (RankIndex) im Speicher
+        global_rank = self.global_ranks.rank((level, xp))
 
         # Rangberechnung (Server)
-        member_ids = [member.id for member in ctx.guild.members if not member.bot]
-        async with aiosqlite.connect("levels.db") as db:
-            async with db.execute(
-                    f"SELECT COUNT(*) FROM users WHERE (level > ? OR (level = ? AND xp > ?)) AND user_id IN ({','.join(['?'] * len(member_ids))})",
-                    (level, level, xp, *member_ids)) as cursor:
-                server_rank = (await cursor.fetchone())[0] + 1
+        guild_ranks = self.guild_ranks.get(ctx.guild.id) or RankIndex(score=rank_score)
+        server_rank = guild_ranks.rank((level, xp))
 
         # Embed-Erstellung
         embed = discord.Embed(title=f"🎖 Level-Profil von {user.display_name}", color=discord.Color.blue())
@@ -109,23 +271,30 @@ class LevelSystem(commands.Cog):
 
         await ctx.respond(embed=embed)
 
+    async def load_leaderboard(self, scope):
+        """Berechnet die Top 10 für einen Bereich ("global" oder eine guild_id) aus der Datenbank."""
+        if scope == "global":
+            query = "SELECT user_id, level, xp FROM users ORDER BY level DESC, xp DESC LIMIT 10"
+            params = ()
+        else:
+            # Nur Mitglieder dieses Servers (über die gepflegte Mitgliedertabelle)
+            query = """
+                SELECT u.user_id, u.level, u.xp FROM guild_members g
+                JOIN users u ON u.user_id = g.user_id
+                WHERE g.guild_id = ?
+                ORDER BY u.level DESC, u.xp DESC LIMIT 10
+            """
+            params = (scope,)
+
+        await self.flush_xp()  # Gepufferte XP zuerst speichern
+        return await self.bot.db.fetchall(DATABASE, query, params)
+
     @slash_command(name="leaderboard", description="Zeigt die besten Spieler global oder nur für diesen Server.")
     @commands.check(check_cooldown)  # ✅ Cooldown für diesen Befehl aktivieren
     async def leaderboard(self, ctx, server_only: Option(bool, "Nur Mitglieder dieses Servers anzeigen?", required=False,default=False)):
         """Zeigt die Top 10 Benutzer mit dem höchsten Level an. Optional nur für den aktuellen Server."""
-        async with aiosqlite.connect("levels.db") as db:
-            if server_only:
-                # Holen aller Benutzer aus dem Server
-                member_ids = [member.id for member in ctx.guild.members if not member.bot]
-                query = f"SELECT user_id, level, xp FROM users WHERE user_id IN ({','.join(['?'] * len(member_ids))}) ORDER BY level DESC, xp DESC LIMIT 10"
-                params = member_ids
-            else:
-                # Globales Leaderboard
-                query = "SELECT user_id, level, xp FROM users ORDER BY level DESC, xp DESC LIMIT 10"
-                params = []
-
-            async with db.execute(query, params) as cursor:
-                top_users = await cursor.fetchall()
+        # Vorberechneter Schnappschuss (global oder pro Server)
+        top_users, updated_at = await self.leaderboards.get(ctx.guild.id if server_only else "global")
 
         if not top_users:
             await ctx.respond("Es gibt noch keine Einträge im Leaderboard!", ephemeral=True)
@@ -137,7 +306,9 @@ class LevelSystem(commands.Cog):
             leaderboard_text += f"**{rank}.** {user} - Level {level} ({xp} XP)\n"
 
         title = "🏆 Server Leaderboard" if server_only else "🌍 Globales Leaderboard"
-        embed = discord.Embed(title=title, description=leaderboard_text, color=discord.Color.gold())
+        embed = discord.Embed(title=title, description=leaderboard_text, color=discord.Color.gold(),
+                              timestamp=updated_at)
+        embed.set_footer(text="Zuletzt aktualisiert")
 
         await ctx.respond(embed=embed)
 
@@ -145,33 +316,31 @@ class LevelSystem(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def modifylevel(self, ctx, user: discord.Member, xp_amount: int):
         """Ermöglicht Administratoren, XP hinzuzufügen oder zu entfernen."""
-        async with aiosqlite.connect("levels.db") as db:
-            user_data = await self.get_user(user.id)
+        user_data = await self.get_user(user.id)
 
-            if user_data is None:
-                await ctx.respond(f"❌ {user.mention} ist noch nicht im Level-System registriert.", ephemeral=True)
-                return
+        if user_data is None:
+            await ctx.respond(f"❌ {user.mention} ist noch nicht im Level-System registriert.", ephemeral=True)
+            return
 
-            current_xp, level = user_data
-            new_xp = max(0, current_xp + xp_amount)  # Verhindert negative XP
+        current_xp, level = user_data
+        new_xp = max(0, current_xp + xp_amount)  # Verhindert negative XP
 
-            # Level-Update prüfen
-            new_level = level
-            leveled_up = False
+        # Level-Update prüfen
+        new_level = level
+        leveled_up = False
 
-            if xp_amount > 0:  # XP hinzufügen
-                while new_xp >= 100 * new_level:
-                    new_xp -= 100 * new_level
-                    new_level += 1
-                    leveled_up = True
-            else:  # XP entfernen (kein Downgrade unter Level 1)
-                while new_xp < 0 and new_level > 1:
-                    new_level -= 1
-                    new_xp += 100 * new_level
+        if xp_amount > 0:  # XP hinzufügen
+            while new_xp >= 100 * new_level:
+                new_xp -= 100 * new_level
+                new_level += 1
+                leveled_up = True
+        else:  # XP entfernen (kein Downgrade unter Level 1)
+            while new_xp < 0 and new_level > 1:
+                new_level -= 1
+                new_xp += 100 * new_level
 
-            # Datenbank aktualisieren
-            await db.execute("UPDATE users SET xp = ?, level = ? WHERE user_id = ?", (new_xp, new_level, user.id))
-            await db.commit()
+        # Puffer aktualisieren (wird mit dem nächsten Flush gespeichert)
+        self.set_user(user.id, new_xp, new_level)
 
         # Antwort senden
         xp_action = "erhalten" if xp_amount > 0 else "verloren"
@@ -198,78 +367,84 @@ class LevelSystem(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def reset_level(self, ctx,user: Option(discord.Member, "Wähle einen Benutzer (oder leer lassen für globalen Reset)",required=False),global_reset: Option(bool, "Alle Benutzer zurücksetzen? (Achtung: nicht rückgängig!)",required=False, default=False)):
         """Setzt das Level eines Benutzers oder aller Spieler zurück, mit Backup & Bestätigung für globalen Reset."""
-        async with aiosqlite.connect("levels.db") as db:
-            # Backup-Tabelle erstellen, falls nicht vorhanden
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS backup_users (
-                    user_id INTEGER PRIMARY KEY,
-                    xp INTEGER,
-                    level INTEGER
-                )
-            """)
-
-            if global_reset:
-                # Schritt 1: Backup speichern
+        if global_reset:
+            # Schritt 1: Backup speichern (inkl. noch gepufferter XP)
+            await self.flush_xp()
+            async with self.bot.db.transaction(DATABASE) as db:
                 await db.execute("DELETE FROM backup_users")  # Altes Backup löschen
                 await db.execute("INSERT INTO backup_users SELECT * FROM users")  # Backup erstellen
-                await db.commit()
-                # Schritt 2: Bestätigung einholen
-                confirm_embed = discord.Embed(
-                    title="⚠ Bestätigung erforderlich!",
-                    description="❗ Bist du sicher, dass du **alle Level-Daten** zurücksetzen möchtest?\n"
-                                "Diese Aktion kann nicht rückgängig gemacht werden!\n\n"
-                                "✅ **Zum Bestätigen:** Klicke auf ✅\n"
-                                "❌ **Zum Abbrechen:** Klicke auf ❌",
-                    color=discord.Color.red()
-                )
-                confirmation_message = await ctx.respond(embed=confirm_embed)
-                await confirmation_message.add_reaction("✅")
-                await confirmation_message.add_reaction("❌")
-                def check(reaction, user):
-                    return user == ctx.author and str(reaction.emoji) in ["✅", "❌"]
-
-                try:
-                    reaction, _ = await self.bot.wait_for("reaction_add", timeout=30.0, check=check)
-                    if str(reaction.emoji) == "✅":
-                        await db.execute("DELETE FROM users")  # Alle Daten löschen
-                        await db.commit()
-                        await ctx.send("🚨 **Alle Spieler wurden zurückgesetzt!** Backup wurde gespeichert.",
-                                       delete_after=5)
-                    else:
-                        await ctx.send("❌ Reset abgebrochen.", delete_after=5)
-                except TimeoutError:
-                    await ctx.send("⏳ Zeit abgelaufen, Reset abgebrochen.", delete_after=5)
-
-            elif user:
-                # Backup für einen bestimmten Benutzer erstellen
-                await db.execute("INSERT OR REPLACE INTO backup_users SELECT * FROM users WHERE user_id = ?",
-                                 (user.id,))
-                await db.execute("DELETE FROM users WHERE user_id = ?", (user.id,))
-                await db.commit()
-                await ctx.respond(f"✅ {user.mention} wurde zurückgesetzt! Backup wurde gespeichert.", ephemeral=True)
-
-            else:
-                await ctx.respond("❌ Bitte gib entweder einen Benutzer an oder setze `global_reset` auf `True`.",
-                                  ephemeral=True)
+            # Schritt 2: Bestätigung einholen
+            confirm_embed = discord.Embed(
+                title="⚠ Bestätigung erforderlich!",
+                description="❗ Bist du sicher, dass du **alle Level-Daten** zurücksetzen möchtest?\n"
+                            "Diese Aktion kann nicht rückgängig gemacht werden!\n\n"
+                            "✅ **Zum Bestätigen:** Klicke auf ✅\n"
+                            "❌ **Zum Abbrechen:** Klicke auf ❌",
+                color=discord.Color.red()
+            )
+            confirmation_message = await ctx.respond(embed=confirm_embed)
+            await confirmation_message.add_reaction("✅")
+            await confirmation_message.add_reaction("❌")
+            def check(reaction, user):
+                return user == ctx.author and str(reaction.emoji) in ["✅", "❌"]
+
+            try:
+                reaction, _ = await self.bot.wait_for("reaction_add", timeout=30.0, check=check)
+                if str(reaction.emoji) == "✅":
+                    async with self.flush_lock:
+                        await self.bot.db.execute(DATABASE, "DELETE FROM users")  # Alle Daten löschen
+                        self.xp_cache.clear()
+                        self.dirty_users.clear()
+                        self.global_ranks.clear()
+                        for guild_ranks in self.guild_ranks.values():
+                            guild_ranks.clear()
+                        self.leaderboards.invalidate()
+                    await ctx.send("🚨 **Alle Spieler wurden zurückgesetzt!** Backup wurde gespeichert.",
+                                   delete_after=5)
+                else:
+                    await ctx.send("❌ Reset abgebrochen.", delete_after=5)
+            except TimeoutError:
+                await ctx.send("⏳ Zeit abgelaufen, Reset abgebrochen.", delete_after=5)
+
+        elif user:
+            # Backup für einen bestimmten Benutzer erstellen
+            await self.flush_xp()
+            async with self.flush_lock:
+                async with self.bot.db.transaction(DATABASE) as db:
+                    await db.execute("INSERT OR REPLACE INTO backup_users SELECT * FROM users WHERE user_id = ?",
+                                     (user.id,))
+                    await db.execute("DELETE FROM users WHERE user_id = ?", (user.id,))
+                self.xp_cache.pop(user.id, None)
+                self.dirty_users.discard(user.id)
+                self.remove_ranks(user.id)
+                self.leaderboards.invalidate()
+            await ctx.respond(f"✅ {user.mention} wurde zurückgesetzt! Backup wurde gespeichert.", ephemeral=True)
+
+        else:
+            await ctx.respond("❌ Bitte gib entweder einen Benutzer an oder setze `global_reset` auf `True`.",
+                              ephemeral=True)
 
 
     @slash_command(name="restore-level",description="Stellt das Level eines Benutzers aus dem Backup wieder her (Admin only).")
     @commands.has_permissions(administrator=True)
     async def restore_level(self, ctx, user: Option(discord.Member, "Wähle einen Benutzer für die Wiederherstellung")):
         """Stellt die XP und das Level eines Benutzers aus dem Backup wieder her (nur Admins)."""
-        async with aiosqlite.connect("levels.db") as db:
-            async with db.execute("SELECT xp, level FROM backup_users WHERE user_id = ?", (user.id,)) as cursor:
-                backup_data = await cursor.fetchone()
-                if backup_data is None:
-                    await ctx.respond(f"❌ Kein Backup für {user.mention} gefunden!", ephemeral=True)
-                    return
-                xp, level = backup_data
-                # Wiederherstellen der Daten
-                await db.execute("INSERT OR REPLACE INTO users (user_id, xp, level) VALUES (?, ?, ?)",
-                                 (user.id, xp, level))
-                await db.commit()
-                await ctx.respond(f"✅ {user.mention} wurde auf Level {level} mit {xp} XP wiederhergestellt!",
-                                  ephemeral=True)
+        backup_data = await self.bot.db.fetchone(DATABASE, "SELECT xp, level FROM backup_users WHERE user_id = ?",
+                                                 (user.id,))
+        if backup_data is None:
+            await ctx.respond(f"❌ Kein Backup für {user.mention} gefunden!", ephemeral=True)
+            return
+        xp, level = backup_data
+        # Wiederherstellen der Daten
+        async with self.flush_lock:
+            await self.bot.db.execute(DATABASE, "INSERT OR REPLACE INTO users (user_id, xp, level) VALUES (?, ?, ?)",
+                                      (user.id, xp, level))
+            self.xp_cache[user.id] = (xp, level)
+            self.dirty_users.discard(user.id)
+            self.update_ranks(user.id, xp, level)
+            self.leaderboards.invalidate()
+        await ctx.respond(f"✅ {user.mention} wurde auf Level {level} mit {xp} XP wiederhergestellt!",
+                          ephemeral=True)
 
 
 def setup(bot):
@@ -1,12 +1,14 @@
-import aiosqlite
 import discord
 from discord.commands import slash_command, Option
 from discord.ext import commands
 
+DATABASE = "server_settings.db"
+
 
 class CommandLock(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.locked = {}  # guild_id -> {(channel_id, command_name), ...}
         self.bot.loop.create_task(self.create_db())
         self.bot.before_invoke(self.before_invoke_check)  # ✅ Überprüft jeden Command vor der Ausführung!
 
@@ -18,34 +20,36 @@ class CommandLock(commands.Cog):
 
     async def create_db(self):
         """Erstellt die Datenbank für gesperrte Commands, falls sie nicht existiert."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS locked_commands (
-                    guild_id INTEGER,
-                    channel_id INTEGER,
-                    command_name TEXT,
-                    PRIMARY KEY (guild_id, channel_id, command_name)
-                )
-            """)
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            CREATE TABLE IF NOT EXISTS locked_commands (
+                guild_id INTEGER,
+                channel_id INTEGER,
+                command_name TEXT,
+                PRIMARY KEY (guild_id, channel_id, command_name)
+            )
+        """)
+        await self.load_locks()
+
+    async def load_locks(self):
+        """Lädt alle Sperren einmal in den Speicher."""
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT guild_id, channel_id, command_name FROM locked_commands")
+        self.locked = {}
+        for guild_id, channel_id, command_name in rows:
+            self.locked.setdefault(guild_id, set()).add((channel_id, command_name))
 
     async def before_invoke_check(self, ctx):
         """Blockiert gesperrte Commands vor der Ausführung."""
-        if await self.is_command_locked(ctx.guild.id, ctx.channel.id, ctx.command.name):
+        if ctx.guild and self.is_command_locked(ctx.guild.id, ctx.channel.id, ctx.command.name):
             await ctx.respond(f"❌ Der Command `{ctx.command.name}` ist in diesem Channel gesperrt.", ephemeral=True)
             raise commands.CheckFailure  # Verhindert die Ausführung des Commands
 
-    async def is_command_locked(self, guild_id: int, channel_id: int, command_name: str) -> bool:
-        """Prüft, ob ein Command in einem Channel gesperrt ist."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("""
-                SELECT 1 FROM locked_commands WHERE guild_id = ? AND channel_id = ? AND command_name = ?
-            """, (guild_id, channel_id, command_name)) as cursor:
-                return await cursor.fetchone() is not None
+    def is_command_locked(self, guild_id: int, channel_id: int, command_name: str) -> bool:
+        """Prüft, ob ein Command in einem Channel gesperrt ist (ohne Datenbankzugriff)."""
+        return (channel_id, command_name) in self.locked.get(guild_id, ())
 
     async def check_command_block(self, ctx):
         """Checkt vor der Ausführung, ob der Command gesperrt ist."""
-        if await self.is_command_locked(ctx.guild.id, ctx.channel.id, ctx.command.name):
+        if self.is_command_locked(ctx.guild.id, ctx.channel.id, ctx.command.name):
             await ctx.respond(f"❌ Der Command `{ctx.command.name}` ist in diesem Channel gesperrt.", ephemeral=True)
             return False
         return True
@@ -61,13 +65,11 @@ class CommandLock(commands.Cog):
         """Sperrt alle Commands außer die blockierten in einem Channel."""
         all_commands = [cmd.name for cmd in self.bot.application_commands if cmd.name not in self.BLOCKED_COMMANDS]
 
-        async with aiosqlite.connect("server_settings.db") as db:
-            for command in all_commands:
-                await db.execute("""
-                        INSERT OR IGNORE INTO locked_commands (guild_id, channel_id, command_name)
-                        VALUES (?, ?, ?)
-                    """, (ctx.guild.id, channel.id, command))
-            await db.commit()
+        await self.bot.db.executemany(DATABASE, """
+                INSERT OR IGNORE INTO locked_commands (guild_id, channel_id, command_name)
+                VALUES (?, ?, ?)
+            """, [(ctx.guild.id, channel.id, command) for command in all_commands])
+        self.locked.setdefault(ctx.guild.id, set()).update((channel.id, command) for command in all_commands)
 
         await ctx.respond(f"✅ Alle Commands außer System-Befehle wurden in {channel.mention} gesperrt.", ephemeral=True)
 
@@ -75,10 +77,9 @@ class CommandLock(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def reset_locks(self, ctx):
         """Entsperrt alle gesperrten Commands auf dem Server."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("DELETE FROM locked_commands WHERE guild_id = ?", (ctx.guild.id,))
-            await db.commit()
-            await ctx.respond(f"Der Channel wurde wieder freigegeben")
+        await self.bot.db.execute(DATABASE, "DELETE FROM locked_commands WHERE guild_id = ?", (ctx.guild.id,))
+        self.locked.pop(ctx.guild.id, None)
+        await ctx.respond(f"Der Channel wurde wieder freigegeben")
 
     @slash_command(name="lockcommand", description="Sperrt einen Befehl in einem bestimmten Channel (Admin only).")
     @discord.default_permissions(administrator=True)
@@ -97,12 +98,11 @@ class CommandLock(commands.Cog):
             await ctx.respond("❌ Dieser Command existiert nicht!", ephemeral=True)
             return
 
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                INSERT OR IGNORE INTO locked_commands (guild_id, channel_id, command_name)
-                VALUES (?, ?, ?)
-            """, (ctx.guild.id, channel.id, command_name))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            INSERT OR IGNORE INTO locked_commands (guild_id, channel_id, command_name)
+            VALUES (?, ?, ?)
+        """, (ctx.guild.id, channel.id, command_name))
+        self.locked.setdefault(ctx.guild.id, set()).add((channel.id, command_name))
 
         await ctx.respond(f"✅ Der Command `{command_name}` wurde in {channel.mention} gesperrt.", ephemeral=True)
 
@@ -115,11 +115,10 @@ class CommandLock(commands.Cog):
         channel: Option(discord.TextChannel, "In welchem Channel soll er entsperrt werden?")
     ):
         """Entsperrt einen Command in einem bestimmten Channel."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                DELETE FROM locked_commands WHERE guild_id = ? AND channel_id = ? AND command_name = ?
-            """, (ctx.guild.id, channel.id, command_name))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            DELETE FROM locked_commands WHERE guild_id = ? AND channel_id = ? AND command_name = ?
+        """, (ctx.guild.id, channel.id, command_name))
+        self.locked.get(ctx.guild.id, set()).discard((channel.id, command_name))
 
         await ctx.respond(f"✅ Der Command `{command_name}` ist in {channel.mention} wieder erlaubt.", ephemeral=True)
 
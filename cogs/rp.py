@@ -1,20 +1,25 @@
 import discord
 from discord.ext import commands, tasks
 from discord.commands import slash_command, Option
-import aiosqlite
 import re
 from datetime import datetime
 
+DATABASE = "charaktere.db"
 GUILD_ID = 824029270384312341
 
 
 class Geburtstage(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.birthday_channel_id = None  # Geburtstags-Channel des Zielservers, geladen in `on_ready`
         self.geburtstag_auto_update.start()
+        self.bot.message_pipeline.add_stage("geburtstage", 50, self.collect_birthday)
+
+    def cog_unload(self):
+        self.bot.message_pipeline.remove_stage("geburtstage")
 
     async def init_db(self):
-        async with aiosqlite.connect("charaktere.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS geburtstage (
                     name TEXT PRIMARY KEY,
@@ -29,25 +34,21 @@ class Geburtstage(commands.Cog):
                     channel_id INTEGER
                 )
             """)
-            await db.commit()
 
     @commands.Cog.listener()
     async def on_ready(self):
         await self.init_db()
+        row = await self.bot.db.fetchone(DATABASE, "SELECT channel_id FROM settings WHERE guild_id = ?", (GUILD_ID,))
+        self.birthday_channel_id = row[0] if row else None
         print("✅ Geburtstags-System bereit")
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+    async def collect_birthday(self, ctx):
+        """Nachrichten-Stufe: Speichert Geburtstage aus dem festgelegten Channel."""
+        message: discord.Message = ctx.message
         if message.guild is None or message.author.bot:
             return
-        if message.guild.id != GUILD_ID:
-            return
-
-        async with aiosqlite.connect("charaktere.db") as db:
-            async with db.execute("SELECT channel_id FROM settings WHERE guild_id = ?", (message.guild.id,)) as cursor:
-                row = await cursor.fetchone()
-                if not row or row[0] != message.channel.id:
-                    return  # Nur im festgelegten Channel
+        if message.guild.id != GUILD_ID or message.channel.id != self.birthday_channel_id:
+            return  # Nur im festgelegten Channel
 
         match = re.match(r"^(.+):\s*(\d{1,2})\.(\d{1,2})$", message.content.strip())
         if not match:
@@ -57,12 +58,11 @@ class Geburtstage(commands.Cog):
         tag = int(tag)
         monat = int(monat)
 
-        async with aiosqlite.connect("charaktere.db") as db:
-            await db.execute("INSERT OR IGNORE INTO geburtstage (name, tag, monat) VALUES (?, ?, ?)",
-                             (name.strip(), tag, monat))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "INSERT OR IGNORE INTO geburtstage (name, tag, monat) VALUES (?, ?, ?)",
+                                  (name.strip(), tag, monat))
 
         await message.delete()
+        ctx.deleted = True
         print(f"🎉 Geburtstag gespeichert: {name} am {tag}.{monat}")
 
     @slash_command(name="setgebchannel", description="Setzt den Kanal für Geburtstags-Einträge")
@@ -71,10 +71,9 @@ class Geburtstage(commands.Cog):
         if ctx.guild.id != GUILD_ID:
             return await ctx.respond("Dieser Command ist auf diesem Server nicht erlaubt.", ephemeral=True)
 
-        async with aiosqlite.connect("charaktere.db") as db:
-            await db.execute("INSERT OR REPLACE INTO settings (guild_id, channel_id) VALUES (?, ?)",
-                             (ctx.guild.id, channel.id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "INSERT OR REPLACE INTO settings (guild_id, channel_id) VALUES (?, ?)",
+                                  (ctx.guild.id, channel.id))
+        self.birthday_channel_id = channel.id
         await ctx.respond(f"✅ Geburtstags-Channel wurde auf {channel.mention} gesetzt.", ephemeral=True)
 
     from discord.commands import Option
@@ -89,15 +88,10 @@ class Geburtstage(commands.Cog):
         if ctx.guild.id != 824029270384312341:
             return await ctx.respond("Dieser Befehl ist hier nicht verfügbar.", ephemeral=True)
 
-        async with aiosqlite.connect("charaktere.db") as db:
-            cursor = await db.execute("SELECT * FROM geburtstage WHERE name = ?", (name,))
-            eintrag = await cursor.fetchone()
+        cursor = await self.bot.db.execute(DATABASE, "DELETE FROM geburtstage WHERE name = ?", (name,))
 
-            if not eintrag:
-                return await ctx.respond(f"❌ Kein Eintrag mit dem Namen **{name}** gefunden.", ephemeral=True)
-
-            await db.execute("DELETE FROM geburtstage WHERE name = ?", (name,))
-            await db.commit()
+        if not cursor.rowcount:
+            return await ctx.respond(f"❌ Kein Eintrag mit dem Namen **{name}** gefunden.", ephemeral=True)
 
         await ctx.respond(f"✅ Charakter **{name}** wurde aus der Liste gelöscht.", ephemeral=True)
 
@@ -109,9 +103,7 @@ class Geburtstage(commands.Cog):
         if ctx.guild.id != 824029270384312341:
             return await ctx.respond("Dieser Befehl ist nur auf dem offiziellen Server verfügbar.", ephemeral=True)
 
-        async with aiosqlite.connect("charaktere.db") as db:
-            cursor = await db.execute("SELECT name, tag, monat FROM geburtstage ORDER BY monat, tag")
-            eintraege = await cursor.fetchall()
+        eintraege = await self.bot.db.fetchall(DATABASE, "SELECT name, tag, monat FROM geburtstage ORDER BY monat, tag")
 
         if not eintraege:
             return await ctx.respond("Keine Geburtstage gefunden.", ephemeral=True)
@@ -140,36 +132,32 @@ class Geburtstage(commands.Cog):
             )
 
         # Nachricht editieren oder neu senden
-        async with aiosqlite.connect("charaktere.db") as db:
-            await db.execute("CREATE TABLE IF NOT EXISTS settings (channel_id INTEGER, message_id INTEGER)")
-            await db.commit()
-
-            row = await db.execute("SELECT channel_id, message_id FROM settings")
-            settings = await row.fetchone()
-
-            if settings:
-                channel = ctx.guild.get_channel(settings[0])
-                try:
-                    old_msg = await channel.fetch_message(settings[1])
-                    await old_msg.edit(embed=embed)
-                    return await ctx.respond("✅ Geburtstagsliste aktualisiert!", ephemeral=True)
-                except discord.NotFound:
-                    pass  # Falls Nachricht gelöscht wurde
-
-            # Neue Nachricht posten
-            msg = await ctx.channel.send(embed=embed)
+        await self.bot.db.execute(DATABASE, "CREATE TABLE IF NOT EXISTS settings (channel_id INTEGER, message_id INTEGER)")
+
+        settings = await self.bot.db.fetchone(DATABASE, "SELECT channel_id, message_id FROM settings")
+
+        if settings:
+            channel = ctx.guild.get_channel(settings[0])
+            try:
+                old_msg = await channel.fetch_message(settings[1])
+                await old_msg.edit(embed=embed)
+                return await ctx.respond("✅ Geburtstagsliste aktualisiert!", ephemeral=True)
+            except discord.NotFound:
+                pass  # Falls Nachricht gelöscht wurde
+
+        # Neue Nachricht posten
+        msg = await ctx.channel.send(embed=embed)
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("DELETE FROM settings")
             await db.execute("INSERT INTO settings (channel_id, message_id) VALUES (?, ?)", (ctx.channel.id, msg.id))
-            await db.commit()
 
         await ctx.respond("✅ Geburtstagsliste gepostet!", ephemeral=True)
 
     @tasks.loop(minutes=2)
     async def geburtstag_auto_update(self):
-        async with aiosqlite.connect("charaktere.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("""CREATE TABLE IF NOT EXISTS geburtstage (name TEXT, tag INTEGER, monat INTEGER)""")
             await db.execute("""CREATE TABLE IF NOT EXISTS settings (channel_id INTEGER, message_id INTEGER)""")
-            await db.commit()
 
             cursor = await db.execute("SELECT name, tag, monat FROM geburtstage ORDER BY monat, tag")
             eintraege = await cursor.fetchall()
@@ -8,22 +8,57 @@ import discord
 from discord.ext import commands
 from discord.commands import slash_command, Option
 
-import sqlite3
-
+from blacklist_matcher import BlacklistMatcher
 
 DATABASE = "server_settings.db"  # Name der SQLite-Datenbank
 DEFAULT_WARN_DECAY_HOURS = 24
 
 
+class GuildSettings:
+    """Automod-relevante Einstellungen eines Servers, im Speicher gehalten."""
+
+    def __init__(self, blacklist=(), mention_filter=False, link_filter=False, capslock_filter=False,
+                 allowed_domains=(), log_channel_id=None, blacklist_normalize=False):
+        self.blacklist = set(blacklist)
+        self.mention_filter = bool(mention_filter)
+        self.link_filter = bool(link_filter)
+        self.capslock_filter = bool(capslock_filter)
+        self.allowed_domains = {domain.lower() for domain in allowed_domains}
+        self.log_channel_id = log_channel_id
+        self.blacklist_normalize = bool(blacklist_normalize)
+        self.rebuild_matcher()
+
+    def rebuild_matcher(self):
+        """Baut den Blacklist-Automaten neu – nur nötig, wenn sich die Blacklist ändert."""
+        self.matcher = BlacklistMatcher(self.blacklist, normalize=self.blacklist_normalize)
+
+
+DEFAULT_SETTINGS = GuildSettings()  # Für Server ohne geladene Einstellungen; wird nie verändert
+
+
 class ServerSettings(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.guild_settings = {}  # guild_id -> GuildSettings, wird beim Schreiben mitgepflegt
         self.bot.loop.create_task(self.create_db()) # Erstellt die DB beim Start
         self.bot.loop.create_task(self._warn_decay_loop())  # ✅ Startet das Reduzieren der Warnungen
+        self.bot.message_pipeline.set_settings_loader(self.get_guild_settings)
+        self.bot.message_pipeline.add_stage("automod", 10, self.automod)  # Automod läuft immer zuerst
+
+    def cog_unload(self):
+        self.bot.message_pipeline.remove_stage("automod")
+        self.bot.message_pipeline.set_settings_loader(None)
+
+    async def add_column(self, db, table, column, definition):
+        """Fügt einer bestehenden Tabelle eine Spalte hinzu, falls sie noch fehlt."""
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            columns = [row[1] for row in await cursor.fetchall()]
+        if column not in columns:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
     async def create_db(self):
         """Erstellt die Datenbank und Tabellen, falls sie nicht existieren."""
-        async with aiosqlite.connect("server_settings.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS settings (
                 guild_id INTEGER PRIMARY KEY,
@@ -34,9 +69,12 @@ class ServerSettings(commands.Cog):
                 capslock_filter BOOLEAN DEFAULT FALSE,
                 link_filter BOOLEAN DEFAULT FALSE,
                 mention_filter BOOLEAN DEFAULT FALSE,
-                updatechannel INTEGER
+                updatechannel INTEGER,
+                blacklist_normalize BOOLEAN DEFAULT FALSE
                 )
             """)
+            # Spalte für bestehende Datenbanken nachrüsten
+            await self.add_column(db, "settings", "blacklist_normalize", "BOOLEAN DEFAULT FALSE")
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS blacklisted_words (
                     guild_id INTEGER,
@@ -49,9 +87,11 @@ class ServerSettings(commands.Cog):
                     guild_id INTEGER,
                     command TEXT,
                     seconds INTEGER,
+                    rate INTEGER DEFAULT 1,
                     PRIMARY KEY (guild_id, command)
                 )
             """)
+            await self.add_column(db, "cooldowns", "rate", "INTEGER DEFAULT 1")  # Erlaubte Nutzungen pro Zeitraum
 
             await db.execute("""
                         CREATE TABLE IF NOT EXISTS allowed_domains (
@@ -65,9 +105,11 @@ class ServerSettings(commands.Cog):
                             user_id INTEGER,
                             command TEXT,
                             last_used REAL,
+                            tokens REAL,
                             PRIMARY KEY (user_id, command)
                         )
                     """)
+            await self.add_column(db, "cooldown_tracker", "tokens", "REAL")
             await db.execute("""
                         CREATE TABLE IF NOT EXISTS warns (
                             guild_id INTEGER,
@@ -87,43 +129,28 @@ class ServerSettings(commands.Cog):
                         )
                     """)
 
-            await db.commit()
-            print("✅ Datenbank wurde erfolgreich erstellt!")
-
-    async def update_warn_decay(self, guild_id: int, hours: int):
-        """Speichert die `warn_decay_hours`-Einstellung für einen Server in `server_settings.db`."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                INSERT INTO settings (guild_id, warn_decay_hours)
-                VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET warn_decay_hours = ?
-            """, (guild_id, hours, hours))
-            await db.commit()
+        print("✅ Datenbank wurde erfolgreich erstellt!")
 
     async def update_warn_decay(self, guild_id: int, hours: int):
         """Speichert die `warn_decay_hours`-Einstellung für einen Server in `server_settings.db`."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                INSERT INTO settings (guild_id, warn_decay_hours)
-                VALUES (?, ?)
-                ON CONFLICT(guild_id) DO UPDATE SET warn_decay_hours = ?
-            """, (guild_id, hours, hours))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            INSERT INTO settings (guild_id, warn_decay_hours)
+            VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET warn_decay_hours = ?
+        """, (guild_id, hours, hours))
 
     async def get_warn_decay_hours(self, guild_id: int) -> int:
         """Holt die gesetzte `warn_decay_hours`-Einstellung oder nutzt den Standardwert."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("""
-                SELECT warn_decay_hours FROM settings WHERE guild_id = ?
-            """, (guild_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result and result[0] else DEFAULT_WARN_DECAY_HOURS  # ✅ Falls None → Standardwert
+        result = await self.bot.db.fetchone(DATABASE, """
+            SELECT warn_decay_hours FROM settings WHERE guild_id = ?
+        """, (guild_id,))
+        return result[0] if result and result[0] else DEFAULT_WARN_DECAY_HOURS  # ✅ Falls None → Standardwert
 
     async def _warn_decay_loop(self):
         """Entfernt Warnungen basierend auf der Server-Einstellung (`warn_decay_hours`)."""
         await self.bot.wait_until_ready()
         while True:
-            async with aiosqlite.connect("server_settings.db") as db:
+            async with self.bot.db.transaction(DATABASE) as db:
                 async with db.execute("SELECT guild_id, warn_decay_hours FROM settings") as cursor:
                     guild_settings = await cursor.fetchall()  # Alle Server-Einstellungen abrufen
 
@@ -139,79 +166,60 @@ class ServerSettings(commands.Cog):
                         AND (last_warned IS NOT NULL AND last_warned > 0)  -- ✅ Fehler vermeiden!
                         AND last_warned <= strftime('%s', 'now', '-' || ? || ' hours')
                     """, (guild_id, decay_hours))
-                    await db.commit()
 
             await asyncio.sleep(3600)  # 🔄 Alle 60 Minuten prüfen
 
-    async def log_action(self, guild, action, details):
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT log_channel_id FROM settings WHERE guild_id = ?", (guild.id,)) as cursor:
-                log_channel_id = (await cursor.fetchone() or [None])[0]
-
-        print(f"Log-Channel-ID für {guild.name}: {log_channel_id}")  # Debug-Log
-
-        if log_channel_id:
-            log_channel = guild.get_channel(log_channel_id)
-            if log_channel:
-                embed = discord.Embed(title=action, description=details, color=discord.Color.red())
-                embed.set_footer(text="Automatische Moderation")
-                await log_channel.send(embed=embed)
-            else:
-                print(f"❌ Kein gültiger Log-Channel gefunden (ID: {log_channel_id})")
-        else:
-            print("❌ Keine Log-Channel-ID in der Datenbank gefunden!")
-
     async def is_capslock_enabled(self, guild_id):
         """Überprüft, ob der Capslock-Filter für diesen Server aktiviert ist."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT capslock_filter FROM settings WHERE guild_id = ?", (guild_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else False
+        result = await self.bot.db.fetchone(DATABASE, "SELECT capslock_filter FROM settings WHERE guild_id = ?",
+                                            (guild_id,))
+        return result[0] if result else False
 
     async def store_servers(self):
         """Speichert alle Server und deren Mitglieder in der Datenbank."""
         await self.bot.wait_until_ready()  # Wartet, bis der Bot vollständig gestartet ist
-        async with aiosqlite.connect("server_settings.db") as db:
-            for guild in self.bot.guilds:
-                await db.execute("""
-                    INSERT INTO settings (guild_id, guild_name)
-                    VALUES (?, ?)
-                    ON CONFLICT(guild_id) DO UPDATE SET guild_name = excluded.guild_name
-                """, (guild.id, guild.name))
-
-                # 🔹 Jetzt über Mitglieder iterieren!
-                for member in guild.members:
-                    if not member.bot:  # Bots ignorieren
-                        await db.execute("""
-                            INSERT INTO warns (guild_id, guild_name, user_id, username) 
-                            VALUES (?, ?, ?, ?) 
-                            ON CONFLICT(guild_id, user_id) 
-                            DO UPDATE SET username = excluded.username
-                        """, (guild.id, guild.name, member.id, member.name))
-
-            await db.commit()
+        await self.bot.db.executemany(DATABASE, """
+            INSERT INTO settings (guild_id, guild_name)
+            VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET guild_name = excluded.guild_name
+        """, [(guild.id, guild.name) for guild in self.bot.guilds])
+
+        # 🔹 Mitglieder nur für Server schreiben, deren Mitglieder sich geändert haben
+        await self.bot.member_sync.sync(DATABASE, "warns", self.bot.guilds, [(
+            """
+            INSERT INTO warns (guild_id, guild_name, user_id, username) 
+            VALUES (?, ?, ?, ?) 
+            ON CONFLICT(guild_id, user_id) 
+            DO UPDATE SET username = excluded.username
+            """,
+            lambda guild: [(guild.id, guild.name, member.id, member.name) for member in guild.members if not member.bot]
+        )], names=True)  # `warns` speichert den Benutzernamen mit
+
         print("✅ Alle Server & Mitglieder wurden erfolgreich gespeichert!")
 
     async def get_setting(self, guild_id, setting):
         """Holt eine bestimmte Einstellung aus der Datenbank."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute(f"SELECT {setting} FROM settings WHERE guild_id = ?", (guild_id,)) as cursor:
-                result = await cursor.fetchone()
-                return result[0] if result else None
+        result = await self.bot.db.fetchone(DATABASE, f"SELECT {setting} FROM settings WHERE guild_id = ?", (guild_id,))
+        return result[0] if result else None
 
     async def update_setting(self, guild_id, setting, value):
         """Aktualisiert oder setzt eine Einstellung für einen Server."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute(f"""
-                INSERT INTO settings (guild_id, {setting}) 
-                VALUES (?, ?) ON CONFLICT(guild_id) 
-                DO UPDATE SET {setting} = excluded.{setting}
-            """, (guild_id, value))
-            await db.commit()
+        await self.update_settings(guild_id, {setting: value})
+
+    async def update_settings(self, guild_id, values):
+        """Aktualisiert oder setzt mehrere Einstellungen eines Servers in einer einzigen Anweisung."""
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        updates = ", ".join(f"{setting} = excluded.{setting}" for setting in values)
+        await self.bot.db.execute(DATABASE, f"""
+            INSERT INTO settings (guild_id, {columns}) 
+            VALUES (?, {placeholders}) ON CONFLICT(guild_id) 
+            DO UPDATE SET {updates}
+        """, (guild_id, *values.values()))
 
     async def add_warn(self, guild_id, guild_name, user_id, user_name, reason):
         """Fügt eine Verwarnung zur Datenbank hinzu oder erhöht den Zähler."""
-        async with aiosqlite.connect("server_settings.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             # Prüfe, ob der User bereits Verwarnungen hat
             async with db.execute("SELECT warn_count FROM warns WHERE guild_id = ? AND user_id = ?",
                                   (guild_id, user_id)) as cursor:
@@ -228,17 +236,14 @@ class ServerSettings(commands.Cog):
                     "INSERT INTO warns (guild_id, guild_name, user_id, username, warn_count, last_warned) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)",
                     (guild_id, guild_name, user_id, user_name, warn_count))
 
-            await db.commit()
-            print(
-                f"⚠️ ({guild_name}) Verwarnung vergeben: {user_name} ({user_id}) hat jetzt {warn_count} Verwarnung(en) für {reason}.")
+        print(
+            f"⚠️ ({guild_name}) Verwarnung vergeben: {user_name} ({user_id}) hat jetzt {warn_count} Verwarnung(en) für {reason}.")
 
         return warn_count  # ✅ WICHTIG: `warn_count` zurückgeben!
 
     async def log_action(self, guild, action, details):
         """Protokolliert eine Moderationsaktion in den Log-Channel (sofern eingestellt)."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT log_channel_id FROM settings WHERE guild_id = ?", (guild.id,)) as cursor:
-                log_channel_id = (await cursor.fetchone() or [None])[0]
+        log_channel_id = (await self.get_guild_settings(guild.id)).log_channel_id
 
         if log_channel_id:
             log_channel = guild.get_channel(log_channel_id)
@@ -277,11 +282,13 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def allow_domain(self, ctx, domain: Option(str, "Gib die erlaubte Domain ein (z. B. example.com)")):
         """Fügt eine Domain zur Link-Whitelist hinzu"""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute(
-                "INSERT INTO allowed_domains (guild_id, domain) VALUES (?, ?) ON CONFLICT(guild_id, domain) DO NOTHING",
-                (ctx.guild.id, domain.lower()))
-            await db.commit()
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT INTO allowed_domains (guild_id, domain) VALUES (?, ?) ON CONFLICT(guild_id, domain) DO NOTHING",
+            (ctx.guild.id, domain.lower()))
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            settings.allowed_domains.add(domain.lower())
 
         await ctx.respond(f"✅ Die Domain `{domain}` wurde zur Whitelist hinzugefügt!")
 
@@ -289,10 +296,11 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def remove_domain(self, ctx, domain: Option(str, "Gib die zu entfernende Domain ein (z. B. example.com)")):
         """Entfernt eine Domain von der Whitelist"""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("DELETE FROM allowed_domains WHERE guild_id = ? AND domain = ?",
-                             (ctx.guild.id, domain.lower()))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM allowed_domains WHERE guild_id = ? AND domain = ?",
+                                  (ctx.guild.id, domain.lower()))
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            settings.allowed_domains.discard(domain.lower())
 
         await ctx.respond(f"❌ Die Domain `{domain}` wurde von der Whitelist entfernt!")
 
@@ -302,6 +310,9 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def set_log_channel(self, ctx, channel: Option(discord.TextChannel, "Wähle den Log-Kanal")):
         await self.update_setting(ctx.guild.id, "log_channel_id", channel.id)
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            settings.log_channel_id = channel.id
         await ctx.respond(f"✅ Log-Kanal wurde auf {channel.mention} gesetzt!")
 
     ### --- BLACKLIST WÖRTER --- ###
@@ -309,17 +320,23 @@ class ServerSettings(commands.Cog):
     @slash_command(name="add_blacklist", description="Fügt ein Wort zur Blacklist hinzu (Admin only).")
     @discord.default_permissions(administrator=True)
     async def add_blacklist(self, ctx, word: Option(str, "Gib das Wort ein")):
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("INSERT INTO blacklisted_words (guild_id, word) VALUES (?, ?)", (ctx.guild.id, word.lower()))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "INSERT INTO blacklisted_words (guild_id, word) VALUES (?, ?)",
+                                  (ctx.guild.id, word.lower()))
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            settings.blacklist.add(word.lower())
+            settings.rebuild_matcher()
         await ctx.respond(f"✅ Das Wort `{word}` wurde zur Blacklist hinzugefügt!")
 
     @slash_command(name="remove_blacklist", description="Entfernt ein Wort von der Blacklist (Admin only).")
     @discord.default_permissions(administrator=True)
     async def remove_blacklist(self, ctx, word: Option(str, "Gib das Wort ein")):
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("DELETE FROM blacklisted_words WHERE guild_id = ? AND word = ?", (ctx.guild.id, word.lower()))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM blacklisted_words WHERE guild_id = ? AND word = ?",
+                                  (ctx.guild.id, word.lower()))
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            settings.blacklist.discard(word.lower())
+            settings.rebuild_matcher()
         await ctx.respond(f"✅ Das Wort `{word}` wurde von der Blacklist entfernt!")
 
     ### --- AUTO-MODERATION --- ###
@@ -333,12 +350,29 @@ class ServerSettings(commands.Cog):
 
     @slash_command(name="set_automod", description="Aktiviert oder deaktiviert automatische Moderation (Admin only).")
     @discord.default_permissions(administrator=True)
-    async def set_automod(self, ctx, capslock: Option(bool, "Capslock-Spam blockieren?", default=False),
-                          links: Option(bool, "Links blockieren?", default=False),
-                          mentions: Option(bool, "Massen-Pings blockieren?", default=False)):
-        await self.update_setting(ctx.guild.id, "capslock_filter", capslock)
-        await self.update_setting(ctx.guild.id, "link_filter", links)
-        await self.update_setting(ctx.guild.id, "mention_filter", mentions)
+    async def set_automod(self, ctx, capslock: Option(bool, "Capslock-Spam blockieren?", required=False, default=None),
+                          links: Option(bool, "Links blockieren?", required=False, default=None),
+                          mentions: Option(bool, "Massen-Pings blockieren?", required=False, default=None),
+                          normalize: Option(bool, "Blacklist auch bei Leetspeak/Akzenten erkennen (h4ck3r, café)?",
+                                            required=False, default=None)):
+        # Nur die angegebenen Optionen ändern, alle anderen behalten ihren Wert
+        values = {
+            setting: value
+            for setting, value in (("capslock_filter", capslock), ("link_filter", links),
+                                   ("mention_filter", mentions), ("blacklist_normalize", normalize))
+            if value is not None
+        }
+        if not values:
+            return await ctx.respond("❌ Gib mindestens eine Einstellung an.", ephemeral=True)
+
+        await self.update_settings(ctx.guild.id, values)
+        settings = self.guild_settings.get(ctx.guild.id)
+        if settings:
+            rebuild = "blacklist_normalize" in values and settings.blacklist_normalize != values["blacklist_normalize"]
+            for setting, value in values.items():
+                setattr(settings, setting, value)
+            if rebuild:
+                settings.rebuild_matcher()
         await ctx.respond("✅ Auto-Moderationseinstellungen wurden aktualisiert!")
 
    ### --- Warns --- ###
@@ -375,13 +409,11 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def clear_warns(self, ctx, member: Option(discord.Member, "Wähle den Nutzer")):
         """Löscht alle Verwarnungen eines Nutzers und setzt den Timestamp zurück."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                UPDATE warns 
-                SET warn_count = 0, last_warned = NULL
-                WHERE guild_id = ? AND user_id = ?
-            """, (ctx.guild.id, member.id))
-            await db.commit()  # ✅ Änderungen speichern
+        await self.bot.db.execute(DATABASE, """
+            UPDATE warns 
+            SET warn_count = 0, last_warned = NULL
+            WHERE guild_id = ? AND user_id = ?
+        """, (ctx.guild.id, member.id))  # ✅ Änderungen speichern
 
         # 📢 Bestätigung senden
         embed = discord.Embed(title="✅ Verwarnungen gelöscht",
@@ -397,7 +429,7 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def set_global_cooldown(self, ctx, seconds: Option(int, "Cooldown in Sekunden für alle Befehle")):
         """Setzt einen Cooldown für alle Befehle des Servers"""
-        async with aiosqlite.connect("server_settings.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             # Alle existierenden Commands aus der Datenbank holen
             async with db.execute("SELECT DISTINCT command FROM cooldowns WHERE guild_id = ?",
                                   (ctx.guild.id,)) as cursor:
@@ -415,8 +447,7 @@ class ServerSettings(commands.Cog):
                     ON CONFLICT(guild_id, command) 
                     DO UPDATE SET seconds = excluded.seconds
                 """, (ctx.guild.id, command, seconds))
-
-            await db.commit()
+        self.bot.cooldowns.invalidate(ctx.guild.id)
 
         await ctx.respond(f"✅ Cooldown von **{seconds} Sekunden** für **alle Befehle** gesetzt!", ephemeral=True)
 
@@ -424,9 +455,8 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def clear_all_cooldowns(self, ctx):
         """Löscht alle Cooldowns für den Server"""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("DELETE FROM cooldowns WHERE guild_id = ?", (ctx.guild.id,))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM cooldowns WHERE guild_id = ?", (ctx.guild.id,))
+        self.bot.cooldowns.invalidate(ctx.guild.id)
 
         await ctx.respond("✅ Alle Cooldowns für diesen Server wurden entfernt!", ephemeral=True)
 
@@ -434,31 +464,34 @@ class ServerSettings(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def remove_cooldown(self, ctx, command: Option(str, "Name des Befehls")):
         """Entfernt einen gesetzten Cooldown aus der Datenbank"""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT * FROM cooldowns WHERE guild_id = ? AND command = ?",
-                                  (ctx.guild.id, command)) as cursor:
-                result = await cursor.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT * FROM cooldowns WHERE guild_id = ? AND command = ?",
+                                            (ctx.guild.id, command))
 
-            if not result:
-                await ctx.respond(f"❌ Es gibt keinen Cooldown für `{command}`.", ephemeral=True)
-                return
+        if not result:
+            await ctx.respond(f"❌ Es gibt keinen Cooldown für `{command}`.", ephemeral=True)
+            return
 
-            await db.execute("DELETE FROM cooldowns WHERE guild_id = ? AND command = ?", (ctx.guild.id, command))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM cooldowns WHERE guild_id = ? AND command = ?",
+                                  (ctx.guild.id, command))
+        self.bot.cooldowns.invalidate(ctx.guild.id)
 
         await ctx.respond(f"✅ Der Cooldown für `{command}` wurde erfolgreich entfernt!", ephemeral=True)
 
     @slash_command(name="set_cooldown", description="Setzt ein Cooldown für einen Befehl (Admin only).")
     @discord.default_permissions(administrator=True)
-    async def set_cooldown(self, ctx, command: Option(str, "Befehl eingeben"), seconds: Option(int, "Cooldown in Sekunden")):
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                INSERT INTO cooldowns (guild_id, command, seconds) 
-                VALUES (?, ?, ?) ON CONFLICT(guild_id, command) 
-                DO UPDATE SET seconds = excluded.seconds
-            """, (ctx.guild.id, command, seconds))
-            await db.commit()
-        await ctx.respond(f"✅ Cooldown für `{command}` wurde auf `{seconds}` Sekunden gesetzt!")
+    async def set_cooldown(self, ctx, command: Option(str, "Befehl eingeben"), seconds: Option(int, "Cooldown in Sekunden"),
+                           uses: Option(int, "Erlaubte Nutzungen innerhalb des Zeitraums (Burst)", default=1,
+                                        min_value=1)):
+        await self.bot.db.execute(DATABASE, """
+            INSERT INTO cooldowns (guild_id, command, seconds, rate) 
+            VALUES (?, ?, ?, ?) ON CONFLICT(guild_id, command) 
+            DO UPDATE SET seconds = excluded.seconds, rate = excluded.rate
+        """, (ctx.guild.id, command, seconds, uses))
+        self.bot.cooldowns.invalidate(ctx.guild.id)
+        if uses > 1:
+            await ctx.respond(f"✅ `{command}` kann jetzt **{uses}x** pro `{seconds}` Sekunden genutzt werden!")
+        else:
+            await ctx.respond(f"✅ Cooldown für `{command}` wurde auf `{seconds}` Sekunden gesetzt!")
 
     ### --- EVENT LISTENERS --- ###
 
@@ -467,29 +500,24 @@ class ServerSettings(commands.Cog):
         """Erstellt die Datenbank und speichert die Server-Einstellungen."""
         print("🔄 Bot ist bereit! Initialisiere Datenbank...")
         await self.store_servers()  # ✅ Speichert Server in `settings`
+        await self.load_all_guild_settings()  # ✅ Automod-Einstellungen in den Speicher laden
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
         """Speichert einen neuen Server in der Datenbank, wenn der Bot beitritt."""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("""
+        await self.bot.db.execute(DATABASE, """
                 INSERT INTO settings (guild_id, guild_name)
                 VALUES (?, ?)
                 ON CONFLICT(guild_id) DO UPDATE SET guild_name = excluded.guild_name
             """, (guild.id, guild.name))
-        conn.commit()
-        conn.close()
+        self.guild_settings[guild.id] = await self.load_guild_settings(guild.id)
         print(f"✅ Der Server {guild.name} wurde in der Datenbank gespeichert.")
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         """Löscht den Server aus der Datenbank, wenn der Bot den Server verlässt."""
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM settings WHERE guild_id = ?", (guild.id,))
-        conn.commit()
-        conn.close()
+        await self.bot.db.execute(DATABASE, "DELETE FROM settings WHERE guild_id = ?", (guild.id,))
+        self.guild_settings.pop(guild.id, None)
         print(f"❌ Der Server {guild.name} wurde aus der Datenbank entfernt.")
 
     @commands.Cog.listener()
@@ -499,11 +527,8 @@ class ServerSettings(commands.Cog):
             return
 
         # Hole Log-Channel-ID aus der DB
-        async with aiosqlite.connect("server_settings.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT log_channel_id FROM settings WHERE guild_id = ?",
-                                  (before.guild.id,)) as cursor:
-                result = await cursor.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT log_channel_id FROM settings WHERE guild_id = ?",
+                                            (before.guild.id,), row_factory=aiosqlite.Row)
 
         if not result or not result["log_channel_id"]:
             return
@@ -525,42 +550,80 @@ class ServerSettings(commands.Cog):
 
         await log_channel.send(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.author.bot:
-            return
+    async def load_guild_settings(self, guild_id):
+        """Lädt alle Automod-Einstellungen eines Servers in einem Durchgang."""
+        async with self.bot.db.transaction(DATABASE) as db:
+            async with db.execute("SELECT word FROM blacklisted_words WHERE guild_id = ?", (guild_id,)) as cursor:
+                blacklist = [row[0] for row in await cursor.fetchall()]
 
-        if not message.content.strip():  # Falls die Nachricht nur ein Bild/Anhang ist
-            return
+            async with db.execute("""
+                SELECT mention_filter, link_filter, capslock_filter, log_channel_id, blacklist_normalize
+                FROM settings WHERE guild_id = ?
+            """, (guild_id,)) as cursor:
+                row = await cursor.fetchone()
 
-        async with aiosqlite.connect("server_settings.db") as db:
-            # 📌 Einstellungen abrufen
-            async with db.execute("SELECT word FROM blacklisted_words WHERE guild_id = ?",
-                                  (message.guild.id,)) as cursor:
-                blacklist = [row[0] for row in await cursor.fetchall()]
+            async with db.execute("SELECT domain FROM allowed_domains WHERE guild_id = ?", (guild_id,)) as cursor:
+                allowed_domains = [row[0] for row in await cursor.fetchall()]
 
-            async with db.execute("SELECT mention_filter FROM settings WHERE guild_id = ?",
-                                  (message.guild.id,)) as cursor:
-                mention_filter = (await cursor.fetchone() or [False])[0]
+        mention_filter, link_filter, capslock_filter, log_channel_id, normalize = row or (False, False, False, None, False)
+        return GuildSettings(blacklist, mention_filter, link_filter, capslock_filter, allowed_domains, log_channel_id,
+                             normalize)
+
+    async def get_guild_settings(self, guild_id):
+        """Gibt die Einstellungen aus dem Speicher zurück; lädt sie nur beim ersten Zugriff."""
+        settings = self.guild_settings.get(guild_id)
+        if settings is None:
+            settings = await self.load_guild_settings(guild_id)
+            self.guild_settings[guild_id] = settings
+        return settings
+
+    async def load_all_guild_settings(self):
+        """Lädt die Einstellungen aller Server mit drei Abfragen statt drei pro Server."""
+        blacklists, domains = {}, {}
+        async with self.bot.db.transaction(DATABASE) as db:
+            async with db.execute("SELECT guild_id, word FROM blacklisted_words") as cursor:
+                for guild_id, word in await cursor.fetchall():
+                    blacklists.setdefault(guild_id, []).append(word)
+
+            async with db.execute("SELECT guild_id, domain FROM allowed_domains") as cursor:
+                for guild_id, domain in await cursor.fetchall():
+                    domains.setdefault(guild_id, []).append(domain)
 
-            async with db.execute("SELECT link_filter FROM settings WHERE guild_id = ?", (message.guild.id,)) as cursor:
-                link_filter = (await cursor.fetchone() or [False])[0]
+            async with db.execute("""
+                SELECT guild_id, mention_filter, link_filter, capslock_filter, log_channel_id, blacklist_normalize
+                FROM settings
+            """) as cursor:
+                rows = await cursor.fetchall()
+
+        self.guild_settings = {
+            guild_id: GuildSettings(blacklists.get(guild_id, ()), mention_filter, link_filter, capslock_filter,
+                                    domains.get(guild_id, ()), log_channel_id, normalize)
+            for guild_id, mention_filter, link_filter, capslock_filter, log_channel_id, normalize in rows
+        }
+        print(f"✅ Einstellungen für {len(self.guild_settings)} Server geladen.")
+
+    async def automod(self, ctx):
+        """Erste Stufe der Nachrichten-Pipeline: Blacklist, Mass-Pings, Links und Capslock."""
+        message = ctx.message
+        if message.guild is None or message.author.bot:
+            return
 
-            async with db.execute("SELECT capslock_filter FROM settings WHERE guild_id = ?",
-                                  (message.guild.id,)) as cursor:
-                capslock_enabled = (await cursor.fetchone() or [False])[0]
+        if not message.content.strip():  # Falls die Nachricht nur ein Bild/Anhang ist
+            return
 
-            async with db.execute("SELECT domain FROM allowed_domains WHERE guild_id = ?",
-                                  (message.guild.id,)) as cursor:
-                allowed_domains = [row[0] for row in await cursor.fetchall()]
+        settings = ctx.settings or DEFAULT_SETTINGS
+        mention_filter = settings.mention_filter
+        link_filter = settings.link_filter
+        capslock_enabled = settings.capslock_filter
+        allowed_domains = settings.allowed_domains
 
         # **🔹 Blacklist-Filter**
-        filtered_message = "".join(c if c.isalnum() or c.isspace() else " " for c in message.content).lower()
-        if any(word in filtered_message.split() for word in blacklist):
+        if settings.matcher.find(message.content):
             await self.add_warn(message.guild.id, message.guild.name, message.author.id, message.author.name,
                                 reason="Blacklist-Wort")
             await self.log_action(message.guild, "🔴 Blacklist-Wort erkannt", f"{message.author}: `{message.content}`")
             await message.delete()
+            ctx.deleted = True
             await message.channel.send(
                 f"{message.author.mention}, dieses Wort ist auf der Blacklist! ⚠️ Verwarnung erhalten.", delete_after=5)
             return
@@ -572,6 +635,7 @@ class ServerSettings(commands.Cog):
             await self.log_action(message.guild, "🚨 Mass-Ping erkannt",
                                   f"{message.author} hat {len(message.mentions)} Leute erwähnt!")
             await message.delete()
+            ctx.deleted = True
             await message.channel.send(f"{message.author.mention}, bitte keine Mass-Pings! 🚨 ⚠️ Verwarnung erhalten.",
                                        delete_after=5)
             return
@@ -589,6 +653,7 @@ class ServerSettings(commands.Cog):
                     await self.log_action(message.guild, "🔗 Unerlaubter Link erkannt",
                                           f"{message.author}: `{message.content}` (Domain: {domain})")
                     await message.delete()
+                    ctx.deleted = True
                     await message.channel.send(
                         f"{message.author.mention}, Links von `{domain}` sind nicht erlaubt! 🚫 ⚠️ Verwarnung erhalten.",
                         delete_after=5)
@@ -613,48 +678,36 @@ class ServerSettings(commands.Cog):
                                 reason="Capslock-Spam")
             await self.log_action(message.guild, "🔊 Capslock erkannt", f"{message.author}: `{message.content}`")
             await message.delete()
+            ctx.deleted = True
             await message.channel.send(f"{message.author.mention}, bitte nicht schreien! 🔇 ⚠️ Verwarnung erhalten.",
                                        delete_after=5)
 
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
-        async with aiosqlite.connect("server_settings.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM settings WHERE guild_id = ?", (member.guild.id,)) as cursor:
-                settings = await cursor.fetchone()
-
-       
-
         """Weist neuen Mitgliedern automatisch die Standardrollen zu."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            async with db.execute("SELECT default_roles FROM settings WHERE guild_id = ?",
-                                  (member.guild.id,)) as cursor:
-                result = await cursor.fetchone()
-                if not result or not result[0]:
-                    return  # Keine Rollen gesetzt
+        result = await self.bot.db.fetchone(DATABASE, "SELECT default_roles FROM settings WHERE guild_id = ?",
+                                            (member.guild.id,))
+        if not result or not result[0]:
+            return  # Keine Rollen gesetzt
 
-                role_ids = [int(r) for r in result[0].split(",") if r.isdigit()]
-                roles_to_add = [member.guild.get_role(rid) for rid in role_ids if member.guild.get_role(rid)]
+        role_ids = [int(r) for r in result[0].split(",") if r.isdigit()]
+        roles_to_add = [member.guild.get_role(rid) for rid in role_ids if member.guild.get_role(rid)]
 
-                if roles_to_add:
-                    await member.add_roles(*roles_to_add, reason="Automatische Rollenzuweisung")
-                    print(f"✅ {member.name} hat {len(roles_to_add)} Standardrollen erhalten!")
+        if roles_to_add:
+            await member.add_roles(*roles_to_add, reason="Automatische Rollenzuweisung")
+            print(f"✅ {member.name} hat {len(roles_to_add)} Standardrollen erhalten!")
         """Fügt neue Mitglieder automatisch zur Warn-Datenbank hinzu."""
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                    INSERT INTO warns (guild_id, guild_name, user_id, username) 
-                    VALUES (?, ?, ?, ?) 
-                    ON CONFLICT(guild_id, user_id) DO UPDATE SET username = excluded.username
-                """, (member.guild.id, member.guild.name, member.id, member.name))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+                INSERT INTO warns (guild_id, guild_name, user_id, username) 
+                VALUES (?, ?, ?, ?) 
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET username = excluded.username
+            """, (member.guild.id, member.guild.name, member.id, member.name))
 
     @commands.Cog.listener()
     async def on_member_remove(self, member):
-        async with aiosqlite.connect("server_settings.db") as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM settings WHERE guild_id = ?", (member.guild.id,)) as cursor:
-                settings = await cursor.fetchone()
+        settings = await self.bot.db.fetchone(DATABASE, "SELECT * FROM settings WHERE guild_id = ?", (member.guild.id,),
+                                              row_factory=aiosqlite.Row)
 
         if not settings or not settings["leave_channel_id"]:
             return
@@ -680,9 +733,8 @@ class ServerSettings(commands.Cog):
         if message.author.bot:
             return  # Ignoriere Nachrichten vom Bot
 
-        async with aiosqlite.connect("server_settings.db") as db:
-            row = await db.execute("SELECT log_channel_id FROM settings WHERE guild_id = ?", (message.guild.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT log_channel_id FROM settings WHERE guild_id = ?",
+                                            (message.guild.id,))
 
         if not result:
             return
@@ -1,11 +1,14 @@
 import re
 
 import discord
-import aiosqlite
 import asyncio
 from discord.ext import commands, tasks
 from discord.ui import View, Button
 
+from reconcile import run_bounded, delete_missing_channels
+
+DATABASE = "channels.db"
+
 class TicketSystem(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -14,27 +17,23 @@ class TicketSystem(commands.Cog):
 
     async def create_tables(self):
         """Erstellt die notwendigen Tabellen in der Datenbank."""
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tickets (
-                    ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel_id INTEGER,
-                    user_id INTEGER,
-                    user_name TEXT,
-                    guild_id INTEGER,
-                    message_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'open',
-                    FOREIGN KEY (guild_id) REFERENCES servers (guild_id)
-                )
-            """)
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            CREATE TABLE IF NOT EXISTS tickets (
+                ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id INTEGER,
+                user_id INTEGER,
+                user_name TEXT,
+                guild_id INTEGER,
+                message_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status TEXT DEFAULT 'open',
+                FOREIGN KEY (guild_id) REFERENCES servers (guild_id)
+            )
+        """)
 
     async def update_ticket_embed(self, channel, new_status):
         """Aktualisiert das Embed eines Tickets mit einem neuen Status."""
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT message_id FROM tickets WHERE channel_id = ?", (channel.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT message_id FROM tickets WHERE channel_id = ?", (channel.id,))
 
         if not result:
             return  # Falls die Nachricht nicht in der DB gespeichert ist
@@ -64,11 +63,10 @@ class TicketSystem(commands.Cog):
 
     async def get_ticket_embed(self, guild, user):
         """Lädt das Ticket-Setup-Embed aus der Datenbank & ersetzt Platzhalter."""
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute(
-                "SELECT ticket_embed_title, ticket_embed_description, ticket_embed_color FROM servers WHERE guild_id = ?",
-                (guild.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(
+            DATABASE,
+            "SELECT ticket_embed_title, ticket_embed_description, ticket_embed_color FROM servers WHERE guild_id = ?",
+            (guild.id,))
 
         if not result:
             return None
@@ -124,72 +122,69 @@ class TicketSystem(commands.Cog):
         self.bot.add_view(TicketActions(self.bot))
         print("✅ Ticket-Buttons wurden nach Neustart wiederhergestellt.")
 
-        async with aiosqlite.connect("channels.db") as db:
-            # **Prüfen, ob die Ticket-Setup-Nachricht noch existiert**
-            rows = await db.execute("SELECT guild_id, text_setup, message_id FROM servers")
-            rows = await rows.fetchall()
-
-            for row in rows:
-                guild_id, text_setup, message_id = row
-                guild = self.bot.get_guild(guild_id)
-
-                if guild:
-                    setup_channel = guild.get_channel(text_setup)
-                    if setup_channel:
-                        try:
-                            await setup_channel.fetch_message(message_id)  # Prüft, ob die Nachricht existiert
-                            print(f"✅ Ticket-Setup-Nachricht in {guild.name} ist vorhanden.")
-                        except discord.NotFound:
-                            print(f"⚠ Ticket-Setup-Nachricht in {guild.name} nicht gefunden. Erstelle sie neu.")
-                            await self.send_ticket_message(setup_channel, guild_id)
-
-            # **Prüfen, ob Tickets noch existieren (Falls Kanal gelöscht wurde, Ticket aus DB entfernen)**
-            ticket_rows = await db.execute("SELECT channel_id FROM tickets")
-            ticket_rows = await ticket_rows.fetchall()
-
-            for row in ticket_rows:
-                channel_id = row[0]
-                channel = self.bot.get_channel(channel_id)
-
-                if channel is None:  # Kanal existiert nicht mehr
-                    await db.execute("DELETE FROM tickets WHERE channel_id = ?", (channel_id,))
-                    await db.commit()
-                    print(
-                        f"🗑 Ticket mit Kanal-ID {channel_id} wurde aus der Datenbank entfernt, da es nicht mehr existiert.")
+        # **Prüfen, ob die Ticket-Setup-Nachricht noch existiert** (parallel, aber begrenzt)
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT guild_id, text_setup, message_id FROM servers")
+
+        setups = []
+        for guild_id, text_setup, message_id in rows:
+            guild = self.bot.get_guild(guild_id)
+            setup_channel = guild.get_channel(text_setup) if guild and text_setup else None
+            if setup_channel:
+                setups.append((guild, setup_channel, message_id))
+
+        results = await run_bounded(setups, self.verify_setup_message)
+        for (guild, _, _), result in zip(setups, results):
+            if isinstance(result, Exception):
+                print(f"❌ Ticket-Setup-Nachricht in {guild.name} konnte nicht geprüft werden: {result}")
+
+        # **Prüfen, ob Tickets noch existieren (Falls Kanal gelöscht wurde, Ticket aus DB entfernen)**
+        ticket_rows = await self.bot.db.fetchall(DATABASE, "SELECT channel_id FROM tickets")
+        removed = await delete_missing_channels(self.bot, DATABASE, "tickets", [channel_id for channel_id, in ticket_rows])
+        if removed:
+            print(f"🗑 {len(removed)} Tickets wurden aus der Datenbank entfernt, da ihre Kanäle nicht mehr existieren.")
+
+    async def verify_setup_message(self, setup):
+        """Stellt die Ticket-Setup-Nachricht wieder her, falls sie gelöscht wurde."""
+        guild, setup_channel, message_id = setup
+        if not message_id:
+            return  # Noch keine Setup-Nachricht gespeichert – wie bisher nichts neu erstellen
+
+        try:
+            await setup_channel.fetch_message(message_id)  # Prüft, ob die Nachricht existiert
+            return
+        except discord.NotFound:
+            pass
+
+        print(f"⚠ Ticket-Setup-Nachricht in {guild.name} nicht gefunden. Erstelle sie neu.")
+        await self.send_ticket_message(setup_channel, guild.id)
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel):
         """Entfernt das Ticket aus der Datenbank, wenn der Kanal gelöscht wird."""
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT ticket_id FROM tickets WHERE channel_id = ?", (channel.id,))
-            result = await row.fetchone()
+        cursor = await self.bot.db.execute(DATABASE, "DELETE FROM tickets WHERE channel_id = ?", (channel.id,))
 
-            if result:
-                await db.execute("DELETE FROM tickets WHERE channel_id = ?", (channel.id,))
-                await db.commit()
-                print(f"🗑 Ticket {channel.name} wurde aus der Datenbank entfernt, da der Kanal gelöscht wurde.")
+        if cursor.rowcount:
+            print(f"🗑 Ticket {channel.name} wurde aus der Datenbank entfernt, da der Kanal gelöscht wurde.")
 
     @tasks.loop(hours=1)
     async def ticket_cleanup(self):
         """Löscht alte, unbeantwortete Tickets nach 24 Stunden."""
-        async with aiosqlite.connect("channels.db") as db:
-            rows = await db.execute(
-                "SELECT channel_id, user_id FROM tickets WHERE status = 'open' AND created_at <= datetime('now', '-1 day')")
-            rows = await rows.fetchall()
-
-            for row in rows:
-                channel_id, user_id = row
-                channel = self.bot.get_channel(channel_id)
-                user = self.bot.get_user(user_id)
-                if channel:
-                    await self.delete_ticket(channel, user)
-                    print(f"🗑 Ticket {channel.name} wurde wegen Inaktivität gelöscht.")
+        rows = await self.bot.db.fetchall(
+            DATABASE,
+            "SELECT channel_id, user_id FROM tickets WHERE status = 'open' AND created_at <= datetime('now', '-1 day')")
+
+        for row in rows:
+            channel_id, user_id = row
+            channel = self.bot.get_channel(channel_id)
+            user = self.bot.get_user(user_id)
+            if channel:
+                await self.delete_ticket(channel, user)
+                print(f"🗑 Ticket {channel.name} wurde wegen Inaktivität gelöscht.")
 
     async def get_ticket_open_embed(self, guild, user):
         """Erstellt das Ticket-Embed & ersetzt Platzhalter."""
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT ticket_embed_description FROM servers WHERE guild_id = ?", (guild.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT ticket_embed_description FROM servers WHERE guild_id = ?",
+                                            (guild.id,))
 
         beschreibung = result[0] if result else "Ein Teammitglied wird sich bald um dich kümmern."
 
@@ -211,9 +206,7 @@ class TicketSystem(commands.Cog):
 
         message = await channel.send(embed=embed, view=view)
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE servers SET message_id = ? WHERE guild_id = ?", (message.id, guild_id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE servers SET message_id = ? WHERE guild_id = ?", (message.id, guild_id))
 
     @commands.slash_command(name="ticket-setup", description="Legt den Ticket-Setup-Channel fest.")
     @discord.default_permissions(administrator=True)
@@ -228,18 +221,15 @@ class TicketSystem(commands.Cog):
         if not setup_channel:
             setup_channel = await guild.create_text_channel("🎫-ticket-erstellen", category=category)
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE servers SET text_setup = ? WHERE guild_id = ?", (setup_channel.id, guild.id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE servers SET text_setup = ? WHERE guild_id = ?",
+                                  (setup_channel.id, guild.id))
 
         embed = await self.get_ticket_embed(ctx.guild, ctx.author)  # ✅ FIXED: ctx.author als `user` übergeben
         view = TicketButton(self.bot)
 
         message = await setup_channel.send(embed=embed, view=view)
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE servers SET message_id = ? WHERE guild_id = ?", (message.id, guild.id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE servers SET message_id = ? WHERE guild_id = ?", (message.id, guild.id))
 
         await ctx.respond(f"✅ Das Ticketsystem wurde eingerichtet! Nachricht gesendet in {setup_channel.mention}.",
                           ephemeral=True)
@@ -248,18 +238,16 @@ class TicketSystem(commands.Cog):
     @discord.default_permissions(administrator=True)
     async def set_ticket_embed(self, ctx, titel: str, beschreibung: str, farbe: str):
         """Erlaubt Admins, die Ticket-Setup-Nachricht mit Variablen zu bearbeiten."""
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute(
-                "UPDATE servers SET ticket_embed_title = ?, ticket_embed_description = ?, ticket_embed_color = ? WHERE guild_id = ?",
-                (titel, beschreibung, farbe, ctx.guild.id))
-            await db.commit()
+        await self.bot.db.execute(
+            DATABASE,
+            "UPDATE servers SET ticket_embed_title = ?, ticket_embed_description = ?, ticket_embed_color = ? WHERE guild_id = ?",
+            (titel, beschreibung, farbe, ctx.guild.id))
 
         await ctx.respond("✅ Die Ticket-Setup-Nachricht wurde aktualisiert!", ephemeral=True)
 
         # Bestehende Nachricht updaten
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT text_setup, message_id FROM servers WHERE guild_id = ?", (ctx.guild.id,))
-            result = await row.fetchone()
+        result = await self.bot.db.fetchone(DATABASE, "SELECT text_setup, message_id FROM servers WHERE guild_id = ?",
+                                            (ctx.guild.id,))
 
         if result:
             setup_channel = ctx.guild.get_channel(result[0])
@@ -301,11 +289,10 @@ class TicketButton(View):
         if not ticket_cog:
             return await interaction.response.send_message("⚠ Fehler: Ticket-System ist nicht geladen.", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute(
-                "SELECT channel_id FROM tickets WHERE user_id = ? AND guild_id = ? AND status = 'open'",
-                (user.id, guild.id))
-            existing_ticket = await row.fetchone()
+        existing_ticket = await self.bot.db.fetchone(
+            DATABASE,
+            "SELECT channel_id FROM tickets WHERE user_id = ? AND guild_id = ? AND status = 'open'",
+            (user.id, guild.id))
 
         if existing_ticket:
             return await interaction.response.send_message("⚠ Du hast bereits ein offenes Ticket!", ephemeral=True)
@@ -330,12 +317,11 @@ class TicketButton(View):
 
         message = await ticket_channel.send(embed=embed, view=view)
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute(
-                "INSERT INTO tickets (channel_id, user_id, user_name, guild_id, message_id, status) VALUES (?, ?, ?, ?, ?, 'open')",
-                (ticket_channel.id, user.id, user.name, guild.id, message.id)
-            )
-            await db.commit()
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT INTO tickets (channel_id, user_id, user_name, guild_id, message_id, status) VALUES (?, ?, ?, ?, ?, 'open')",
+            (ticket_channel.id, user.id, user.name, guild.id, message.id)
+        )
 
         await interaction.response.send_message(f"✅ Ticket erstellt! {ticket_channel.mention}", ephemeral=True)
 
@@ -355,9 +341,8 @@ class TicketActions(View):
         if not ticket_cog:
             return await interaction.response.send_message("⚠ Fehler: Ticket-System nicht gefunden.", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT status FROM tickets WHERE channel_id = ?", (channel.id,))
-            ticket_status = await row.fetchone()
+        ticket_status = await self.bot.db.fetchone(DATABASE, "SELECT status FROM tickets WHERE channel_id = ?",
+                                                   (channel.id,))
 
         # **Falls Ticket bereits archiviert ist, abbrechen**
         if ticket_status and ticket_status[0] == "archived":
@@ -421,9 +406,7 @@ class TicketDeleteConfirm(View):
             print(f"⚠ Konnte {user} keine DM senden.")
 
         # **Ticket aus der Datenbank entfernen**
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("DELETE FROM tickets WHERE channel_id = ?", (self.channel.id,))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM tickets WHERE channel_id = ?", (self.channel.id,))
 
         print(f"🗑 Ticket {self.channel.name} wurde gelöscht.")
 
@@ -452,9 +435,8 @@ class TicketArchiveConfirm(View):
         if not archive_category:
             archive_category = await guild.create_category("📁 Archivierte Tickets")
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM tickets WHERE channel_id = ?", (self.channel.id,))
-            ticket_owner_id = await row.fetchone()
+        ticket_owner_id = await self.bot.db.fetchone(DATABASE, "SELECT user_id FROM tickets WHERE channel_id = ?",
+                                                     (self.channel.id,))
 
         if not ticket_owner_id:
             return await interaction.response.send_message("⚠ Fehler: Ticket-Daten nicht gefunden!", ephemeral=True)
@@ -462,9 +444,8 @@ class TicketArchiveConfirm(View):
         ticket_owner = guild.get_member(ticket_owner_id[0])  # ✅ Ticket-Ersteller abrufen
 
         # ✅ Falls Ticket bereits archiviert ist, abbrechen
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT status FROM tickets WHERE channel_id = ?", (self.channel.id,))
-            ticket_status = await row.fetchone()
+        ticket_status = await self.bot.db.fetchone(DATABASE, "SELECT status FROM tickets WHERE channel_id = ?",
+                                                   (self.channel.id,))
 
         if ticket_status and ticket_status[0] == "archived":
             return await interaction.response.send_message("⚠ Dieses Ticket wurde bereits archiviert!", ephemeral=True)
@@ -476,18 +457,17 @@ class TicketArchiveConfirm(View):
 
 
         # ✅ Datenbank aktualisieren
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE tickets SET status = 'archived' WHERE channel_id = ?", (self.channel.id,))
-            await db.commit()
-            print(f"📁 Ticket {self.channel.name} wurde in der Datenbank als 'archived' markiert.")
+        await self.bot.db.execute(DATABASE, "UPDATE tickets SET status = 'archived' WHERE channel_id = ?",
+                                  (self.channel.id,))
+        print(f"📁 Ticket {self.channel.name} wurde in der Datenbank als 'archived' markiert.")
 
-            try:
-                ticket_message = await self.channel.history().find(lambda m: m.author == self.bot.user and m.embeds)
-                if ticket_message:
-                    await self.bot.ticket_system.update_ticket_embed(ticket_message, "Archiviert")
-            except Exception as e:
-                print(f"⚠ Fehler beim Aktualisieren des Embeds: {e}")
-                await interaction.response.send_message("✅ Das Ticket wurde archiviert!", ephemeral=True)
+        try:
+            ticket_message = await self.channel.history().find(lambda m: m.author == self.bot.user and m.embeds)
+            if ticket_message:
+                await self.bot.ticket_system.update_ticket_embed(ticket_message, "Archiviert")
+        except Exception as e:
+            print(f"⚠ Fehler beim Aktualisieren des Embeds: {e}")
+            await interaction.response.send_message("✅ Das Ticket wurde archiviert!", ephemeral=True)
 
 
 
@@ -1,16 +1,29 @@
+from collections import Counter
+
 import discord
-import aiosqlite
-from discord.ext import commands, tasks
-import asyncio
+from discord.ext import commands
+
+from deadline_scheduler import DeadlineScheduler
+from reconcile import delete_missing_channels
+
+DATABASE = "channels.db"
+EMPTY_CHANNEL_TIMEOUT = 300  # Sekunden, die ein privater Kanal leer sein darf
 
 class PrivateVoice(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.check_empty_channels.start()  # Task für leere Channels starten
+        self.cleanup = DeadlineScheduler(self.delete_empty_channel)  # channel_id -> Löschzeitpunkt
+        self.channel_owners = {}  # channel_id -> user_id (private Kanäle)
+        self.owned_channels = {}  # user_id -> channel_id
+        self.setup_channels = {}  # guild_id -> voice_setup channel_id
+        self.voice_events = Counter()  # join/leave/move/state -> Anzahl seit dem Start
+
+    def cog_unload(self):
+        self.cleanup.stop()
 
     async def create_tables(self):
         """Erstellt die notwendigen Tabellen in der Datenbank."""
-        async with aiosqlite.connect("channels.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS servers (
                     guild_id INTEGER PRIMARY KEY,
@@ -59,61 +72,75 @@ class PrivateVoice(commands.Cog):
                                 FOREIGN KEY (guild_id) REFERENCES servers (guild_id)
                             )
                         """)
-            await db.commit()
+
+    async def load_channels(self):
+        """Baut die Zuordnungen Besitzer ↔ Kanal und Server → Setup-Channel aus der Datenbank auf."""
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT channel_id, user_id FROM voice_channels")
+        self.channel_owners = {channel_id: user_id for channel_id, user_id in rows}
+        self.owned_channels = {user_id: channel_id for channel_id, user_id in rows}
+
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT guild_id, voice_setup FROM servers WHERE voice_setup IS NOT NULL")
+        self.setup_channels = dict(rows)
+
+    def add_private_channel(self, channel_id, user_id):
+        self.channel_owners[channel_id] = user_id
+        self.owned_channels[user_id] = channel_id
+
+    def forget_private_channel(self, channel_id):
+        user_id = self.channel_owners.pop(channel_id, None)
+        if self.owned_channels.get(user_id) == channel_id:
+            del self.owned_channels[user_id]
+
+    def is_owner(self, channel_id, user_id):
+        return self.channel_owners.get(channel_id) == user_id
 
     @commands.Cog.listener()
     async def on_ready(self):
         """Fügt alle Server zur Datenbank hinzu & entfernt nicht mehr existierende Voice-Channels."""
         await self.create_tables()
+        await self.load_channels()
 
-        async with aiosqlite.connect("channels.db") as db:
-            for guild in self.bot.guilds:
-                await db.execute(
-                    "INSERT OR IGNORE INTO servers (guild_id, guild_name, voice_setup, text_setup) VALUES (?, ?, NULL, NULL)",
-                    (guild.id, guild.name)
-                )
-            await db.commit()
+        await self.bot.db.executemany(
+            DATABASE,
+            "INSERT OR IGNORE INTO servers (guild_id, guild_name, voice_setup, text_setup) VALUES (?, ?, NULL, NULL)",
+            [(guild.id, guild.name) for guild in self.bot.guilds]
+        )
 
         print("✅ Alle Server wurden zur Datenbank hinzugefügt.")
 
-        # **🔹 Entferne nicht existierende Voice-Channels**
-        async with aiosqlite.connect("channels.db") as db:
-            rows = await db.execute("SELECT channel_id FROM voice_channels")
-            voice_channels = await rows.fetchall()
+        # **🔹 Entferne nicht existierende Voice-Channels** (Abgleich mit dem Cache, eine Transaktion)
+        removed = await delete_missing_channels(self.bot, DATABASE, "voice_channels", list(self.channel_owners))
+        for channel_id in removed:
+            self.forget_private_channel(channel_id)
 
-        deleted_channels = 0  # Debugging-Zähler
+        print(f"🔍 Voice-Channel-Bereinigung abgeschlossen. {len(removed)} nicht existierende Kanäle entfernt.")
 
-        for channel_id, in voice_channels:
+        # Bereits leere Kanäle (z. B. nach einem Neustart) einplanen
+        for channel_id in self.channel_owners:
             channel = self.bot.get_channel(channel_id)
-
-            if channel is None:  # Kanal existiert nicht mehr
-                async with aiosqlite.connect("channels.db") as db:
-                    await db.execute("DELETE FROM voice_channels WHERE channel_id = ?", (channel_id,))
-                    await db.commit()
-                print(f"🗑 Gelöschter Eintrag: Channel-ID {channel_id} existiert nicht mehr.")
-                deleted_channels += 1
-
-        print(f"🔍 Voice-Channel-Bereinigung abgeschlossen. {deleted_channels} nicht existierende Kanäle entfernt.")
+            if channel and len(channel.members) == 0:
+                self.cleanup.schedule(channel_id, EMPTY_CHANNEL_TIMEOUT)
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
         """Fügt einen neuen Server zur Datenbank hinzu."""
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute(
-                "INSERT OR IGNORE INTO servers (guild_id, guild_name, voice_setup, text_setup) VALUES (?, ?, NULL, NULL)",
-                (guild.id, guild.name)
-            )
-            await db.commit()
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT OR IGNORE INTO servers (guild_id, guild_name, voice_setup, text_setup) VALUES (?, ?, NULL, NULL)",
+            (guild.id, guild.name)
+        )
         print(f"✅ Server {guild.name} wurde zur Datenbank hinzugefügt.")
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         """Entfernt einen Server aus der Datenbank, wenn der Bot ihn verlässt."""
-        async with aiosqlite.connect("channels.db") as db:
+        async with self.bot.db.transaction(DATABASE) as db:
             await db.execute("DELETE FROM servers WHERE guild_id = ?", (guild.id,))
             await db.execute("DELETE FROM voice_channels WHERE guild_id = ?", (guild.id,))
             await db.execute("DELETE FROM text_channels WHERE guild_id = ?", (guild.id,))  # NEU: Textkanäle löschen
-            await db.commit()
+        self.setup_channels.pop(guild.id, None)
+        for channel in guild.voice_channels:
+            self.forget_private_channel(channel.id)
         print(f"❌ Server {guild.name} wurde aus der Datenbank entfernt.")
 
     @commands.slash_command(name="voice-setup", description="Erstellt den Voice-Setup-Channel")
@@ -123,11 +150,7 @@ class PrivateVoice(commands.Cog):
         guild = ctx.guild
 
         # Prüfen, ob bereits ein Setup-Channel existiert
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT voice_setup FROM servers WHERE guild_id = ?", (guild.id,))
-            result = await row.fetchone()
-
-        if result and result[0]:
+        if guild.id in self.setup_channels:
             return await ctx.respond("⚠ Es gibt bereits einen Setup-Channel!", ephemeral=True)
 
         # Kategorie erstellen
@@ -135,9 +158,9 @@ class PrivateVoice(commands.Cog):
         setup_channel = await guild.create_voice_channel("➕ Join to Create", category=category)
 
         # Speichern in DB (Spalte heißt jetzt voice_setup)
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE servers SET voice_setup = ? WHERE guild_id = ?", (setup_channel.id, guild.id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE servers SET voice_setup = ? WHERE guild_id = ?",
+                                  (setup_channel.id, guild.id))
+        self.setup_channels[guild.id] = setup_channel.id
 
         await ctx.respond(
             f"✅ Setup abgeschlossen! Betritt {setup_channel.mention}, um einen eigenen Kanal zu erstellen.",
@@ -152,19 +175,13 @@ class PrivateVoice(commands.Cog):
         if not voice_channel:
             return await ctx.respond("⚠ Du bist in keinem Voice-Channel!", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM voice_channels WHERE channel_id = ?", (voice_channel.id,))
-            result = await row.fetchone()
-
-        if not result or result[0] != member.id:
+        if not self.is_owner(voice_channel.id, member.id):
             return await ctx.respond("❌ Du bist nicht der Besitzer dieses Kanals!", ephemeral=True)
 
         await voice_channel.edit(name=neuer_name)  # Kanal umbenennen
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE voice_channels SET channel_name = ? WHERE channel_id = ?",
-                             (neuer_name, voice_channel.id))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE voice_channels SET channel_name = ? WHERE channel_id = ?",
+                                  (neuer_name, voice_channel.id))
 
         await ctx.respond(f"✅ Dein Kanal wurde umbenannt zu **{neuer_name}**!")
 
@@ -176,11 +193,7 @@ class PrivateVoice(commands.Cog):
         if not voice_channel:
             return await ctx.respond("⚠ Du bist in keinem Voice-Channel!", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM voice_channels WHERE channel_id = ?", (voice_channel.id,))
-            result = await row.fetchone()
-
-        if not result or result[0] != ctx.author.id:
+        if not self.is_owner(voice_channel.id, ctx.author.id):
             return await ctx.respond("❌ Du bist nicht der Besitzer dieses Kanals!", ephemeral=True)
 
         if member not in voice_channel.members:
@@ -198,11 +211,7 @@ class PrivateVoice(commands.Cog):
         if not voice_channel:
             return await ctx.respond("⚠ Du bist in keinem Voice-Channel!", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM voice_channels WHERE channel_id = ?", (voice_channel.id,))
-            result = await row.fetchone()
-
-        if not result or result[0] != ctx.author.id:
+        if not self.is_owner(voice_channel.id, ctx.author.id):
             return await ctx.respond("❌ Du bist nicht der Besitzer dieses Kanals!", ephemeral=True)
 
         await voice_channel.set_permissions(ctx.guild.default_role, connect=False)  # Serverweite Verbindung sperren
@@ -216,11 +225,7 @@ class PrivateVoice(commands.Cog):
         if not voice_channel:
             return await ctx.respond("⚠ Du bist in keinem Voice-Channel!", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM voice_channels WHERE channel_id = ?", (voice_channel.id,))
-            result = await row.fetchone()
-
-        if not result or result[0] != ctx.author.id:
+        if not self.is_owner(voice_channel.id, ctx.author.id):
             return await ctx.respond("❌ Du bist nicht der Besitzer dieses Kanals!", ephemeral=True)
 
         await voice_channel.set_permissions(ctx.guild.default_role, connect=True)  # Serverweite Verbindung erlauben
@@ -234,11 +239,7 @@ class PrivateVoice(commands.Cog):
         if not voice_channel:
             return await ctx.respond("⚠ Du bist in keinem Voice-Channel!", ephemeral=True)
 
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT user_id FROM voice_channels WHERE channel_id = ?", (voice_channel.id,))
-            result = await row.fetchone()
-
-        if not result or result[0] != ctx.author.id:
+        if not self.is_owner(voice_channel.id, ctx.author.id):
             return await ctx.respond("❌ Du bist nicht der Besitzer dieses Kanals!", ephemeral=True)
 
         if limit < 1 or limit > 99:
@@ -252,14 +253,12 @@ class PrivateVoice(commands.Cog):
     @commands.has_permissions(administrator=True)
     async def remove_voice(self, ctx):
         """Löscht den Voice-Setup-Channel, die Kategorie (falls leer) und entfernt die ID aus der Datenbank."""
-        async with aiosqlite.connect("channels.db") as db:
-            row = await db.execute("SELECT voice_setup FROM servers WHERE guild_id = ?", (ctx.guild.id,))
-            result = await row.fetchone()
+        setup_channel_id = self.setup_channels.get(ctx.guild.id)
 
-        if not result or not result[0]:
+        if not setup_channel_id:
             return await ctx.respond("⚠ Kein Setup-Channel gefunden!", ephemeral=True)
 
-        setup_channel = ctx.guild.get_channel(result[0])  # Voice-Setup-Channel abrufen
+        setup_channel = ctx.guild.get_channel(setup_channel_id)  # Voice-Setup-Channel abrufen
         category = setup_channel.category if setup_channel else None  # Zugehörige Kategorie abrufen
 
         if setup_channel:
@@ -269,94 +268,97 @@ class PrivateVoice(commands.Cog):
         if category and len(category.channels) == 0:
             await category.delete()  # Nur löschen, wenn sie leer ist
 
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("UPDATE servers SET voice_setup = NULL WHERE guild_id = ?", (ctx.guild.id,))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "UPDATE servers SET voice_setup = NULL WHERE guild_id = ?", (ctx.guild.id,))
+        self.setup_channels.pop(ctx.guild.id, None)
 
         await ctx.respond("✅ Der Setup-Channel und die Kategorie wurden erfolgreich entfernt!", ephemeral=True)
 
+    @staticmethod
+    def classify_voice_event(before, after):
+        """Ordnet ein Voice-Update ein: join, leave, move oder state (nur Mute/Deafen/Stream/...)."""
+        if before.channel == after.channel:
+            return "state"
+        if before.channel is None:
+            return "join"
+        if after.channel is None:
+            return "leave"
+        return "move"
+
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
         """Erstellt einen privaten Kanal, wenn der User den Setup-Channel betritt, aber begrenzt auf 1 pro User."""
+        event = self.classify_voice_event(before, after)
+        self.voice_events[event] += 1
+        if event == "state":
+            return  # Kanal unverändert – nichts zu tun
 
-        if after.channel and before.channel != after.channel:
-            async with aiosqlite.connect("channels.db") as db:
-                # **Prüfen, ob der User bereits einen Kanal besitzt**
-                row = await db.execute("SELECT channel_id FROM voice_channels WHERE user_id = ?", (member.id,))
-                existing_channel = await row.fetchone()
+        if after.channel:
+            self.cleanup.cancel(after.channel.id)  # Jemand ist (wieder) drin – Löschung absagen
 
-                if existing_channel:
+            # **Nur wenn der Nutzer den Setup-Channel betritt**
+            if after.channel.id == self.setup_channels.get(member.guild.id):
+                # **Prüfen, ob der User bereits einen Kanal besitzt**
+                if member.id in self.owned_channels:
                     await member.send(
                         "⚠ Du hast bereits einen privaten Voice-Channel! Bitte verlasse ihn zuerst, bevor du einen neuen erstellst."
                     )
                     await member.move_to(None)  # User aus dem Voice-Channel kicken
                     return
 
-                # **Setup-Channel aus der Datenbank holen**
-                row = await db.execute("SELECT voice_setup FROM servers WHERE guild_id = ?", (member.guild.id,))
-                result = await row.fetchone()
+                new_channel = await after.channel.category.create_voice_channel(f"{member.name}'s Channel")
+                self.add_private_channel(new_channel.id, member.id)
+                self.cleanup.schedule(new_channel.id, EMPTY_CHANNEL_TIMEOUT)  # Falls das Verschieben scheitert
+                await member.move_to(new_channel)
 
-            if result:
-                setup_channel_id = result[0]
-
-                # **Nur wenn der Nutzer den Setup-Channel betritt**
-                if after.channel.id == setup_channel_id:
-                    new_channel = await after.channel.category.create_voice_channel(f"{member.name}'s Channel")
-                    await member.move_to(new_channel)
-
-                    # **Neuen Channel in der DB speichern**
-                    async with aiosqlite.connect("channels.db") as db:
-                        await db.execute(
-                            "INSERT INTO voice_channels (channel_id, channel_name, user_id, user_name, guild_id) VALUES (?, ?, ?, ?, ?)",
-                            (new_channel.id, new_channel.name, member.id, member.name, member.guild.id)
-                        )
-                        await db.commit()
+                # **Neuen Channel in der DB speichern**
+                await self.bot.db.execute(
+                    DATABASE,
+                    "INSERT INTO voice_channels (channel_id, channel_name, user_id, user_name, guild_id) VALUES (?, ?, ?, ?, ?)",
+                    (new_channel.id, new_channel.name, member.id, member.name, member.guild.id)
+                )
 
-                    print(f"🎤 {member.name} hat einen privaten Kanal erstellt: {new_channel.name}")
-                else:
-                    print(
-                        f"🚫 {member.name} ist einem anderen Voice-Channel beigetreten, kein neuer Channel wird erstellt.")
+                print(f"🎤 {member.name} hat einen privaten Kanal erstellt: {new_channel.name}")
 
         # **Leere Channels nach 5 Minuten automatisch löschen**
-        if before.channel and before.channel.category and before.channel.category.name == "🎤 Private Channels":
-            async with aiosqlite.connect("channels.db") as db:
-                row = await db.execute("SELECT channel_id FROM voice_channels WHERE channel_id = ?",
-                                       (before.channel.id,))
-                result = await row.fetchone()
-
-            if result and len(before.channel.members) == 0:  # Kanal ist leer
-                await asyncio.sleep(300)  # 5 Minuten warten
-                if len(before.channel.members) == 0:  # Noch immer leer?
-                    await before.channel.delete()
-                    async with aiosqlite.connect("channels.db") as db:
-                        await db.execute("DELETE FROM voice_channels WHERE channel_id = ?", (before.channel.id,))
-                        await db.commit()
-                    print(f"🗑 Gelöschter Kanal: {before.channel.name}")
-
-    @tasks.loop(minutes=1)
-    async def check_empty_channels(self):
-        """Regelmäßig leere Sprachkanäle aus der Datenbank entfernen."""
-        async with aiosqlite.connect("channels.db") as db:
-            rows = await db.execute("SELECT channel_id FROM voice_channels")  # Nur Sprachkanäle
-            channels = await rows.fetchall()
-
-        for channel_id, in channels:
-            channel = self.bot.get_channel(channel_id)
-            if channel and isinstance(channel, discord.VoiceChannel) and len(channel.members) == 0:
-                await asyncio.sleep(300)  # 5 Minuten warten
-                if len(channel.members) == 0:  # Noch immer leer?
-                    try:
-                        await channel.delete()
-                        async with aiosqlite.connect("channels.db") as db:
-                            await db.execute("DELETE FROM voice_channels WHERE channel_id = ?", (channel_id,))
-                            await db.commit()
-                        print(f"🗑 Gelöschter Sprachkanal: {channel.name}")
-                    except discord.NotFound:
-                        print(f"⚠ Fehler: Sprachkanal {channel_id} existiert nicht mehr (bereits gelöscht).")
-                    except discord.Forbidden:
-                        print(f"❌ Fehler: Keine Berechtigung zum Löschen von Sprachkanal {channel_id}.")
-                    except Exception as e:
-                        print(f"⚠ Unerwarteter Fehler beim Löschen von Sprachkanal {channel_id}: {e}")
+        if before.channel and before.channel.id in self.channel_owners:
+            if len(before.channel.members) == 0:  # Kanal ist leer
+                self.cleanup.schedule(before.channel.id, EMPTY_CHANNEL_TIMEOUT)
+
+    @commands.slash_command(name="voice-stats", description="Zeigt, wie viele Voice-Updates verarbeitet wurden (Admin Only)")
+    @commands.has_permissions(administrator=True)
+    async def voice_stats(self, ctx):
+        """Zählt die Voice-Updates seit dem Start, getrennt nach Art."""
+        total = sum(self.voice_events.values())
+        skipped = self.voice_events["state"]
+        embed = discord.Embed(title="🎧 Voice-Updates seit dem Start", color=discord.Color.blurple())
+        embed.add_field(name="➡ Beitritte", value=str(self.voice_events["join"]), inline=True)
+        embed.add_field(name="⬅ Verlassen", value=str(self.voice_events["leave"]), inline=True)
+        embed.add_field(name="🔀 Wechsel", value=str(self.voice_events["move"]), inline=True)
+        embed.add_field(
+            name="⏭ Übersprungen (Mute/Deafen/Stream)",
+            value=f"{skipped} von {total} ({skipped / total:.0%})" if total else "0",
+            inline=False
+        )
+        embed.add_field(name="🗑 Geplante Löschungen", value=str(len(self.cleanup)), inline=False)
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    async def delete_empty_channel(self, channel_id):
+        """Löscht einen privaten Kanal, der seit `EMPTY_CHANNEL_TIMEOUT` Sekunden leer ist."""
+        channel = self.bot.get_channel(channel_id)
+        if channel and len(channel.members) > 0:
+            return  # Wieder belegt; wird beim nächsten Verlassen neu eingeplant
+
+        try:
+            if channel:
+                await channel.delete()
+                print(f"🗑 Gelöschter Sprachkanal: {channel.name}")
+        except discord.NotFound:
+            print(f"⚠ Fehler: Sprachkanal {channel_id} existiert nicht mehr (bereits gelöscht).")
+        except discord.Forbidden:
+            print(f"❌ Fehler: Keine Berechtigung zum Löschen von Sprachkanal {channel_id}.")
+            return
+        await self.bot.db.execute(DATABASE, "DELETE FROM voice_channels WHERE channel_id = ?", (channel_id,))
+        self.forget_private_channel(channel_id)
 
 
 def setup(bot):
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
 from discord.commands import slash_command, Option
-import aiosqlite
+
+DATABASE = "server_settings.db"
 
 class WelcomeSystem(commands.Cog):
     def __init__(self, bot):
@@ -15,21 +16,18 @@ class WelcomeSystem(commands.Cog):
         return text.replace("{count}", str(count))
 
     async def get_welcome_settings(self, guild_id):
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS welcome_settings (
-                    guild_id INTEGER PRIMARY KEY,
-                    channel_id INTEGER,
-                    header TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    image TEXT,
-                    footer TEXT,
-                    color TEXT
-                )
-            """)
-            await db.commit()
-            cursor = await db.execute("SELECT * FROM welcome_settings WHERE guild_id = ?", (guild_id,))
-            return await cursor.fetchone()
+        await self.bot.db.execute(DATABASE, """
+            CREATE TABLE IF NOT EXISTS welcome_settings (
+                guild_id INTEGER PRIMARY KEY,
+                channel_id INTEGER,
+                header TEXT NOT NULL,
+                content TEXT NOT NULL,
+                image TEXT,
+                footer TEXT,
+                color TEXT
+            )
+        """)
+        return await self.bot.db.fetchone(DATABASE, "SELECT * FROM welcome_settings WHERE guild_id = ?", (guild_id,))
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -67,12 +65,10 @@ class WelcomeSystem(commands.Cog):
         footer: Option(str, "Footer-Text", required=False),
         color: Option(str, "Hex-Farbe z.B. #00ABFF", required=False)
     ):
-        async with aiosqlite.connect("server_settings.db") as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO welcome_settings (guild_id, channel_id, header, content, image, footer, color)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (ctx.guild.id, channel.id, header, content, image, footer, color))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, """
+            INSERT OR REPLACE INTO welcome_settings (guild_id, channel_id, header, content, image, footer, color)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (ctx.guild.id, channel.id, header, content, image, footer, color))
 
         await ctx.respond("✅ Willkommensnachricht wurde gespeichert!", ephemeral=True)
 
@@ -1,62 +1,154 @@
+import asyncio
+
+import aiohttp
 import discord
 from discord.ext import commands
 from discord.commands import slash_command, Option
-import aiohttp
 import difflib
 
-WIKI_API_URL = "https://naruto-unknown-times.fandom.com/de/api.php"
-WIKI_BASE_URL = "https://naruto-unknown-times.fandom.com/de/wiki/"
+from wiki_api import WikiUnavailable
+
+WIKI = "Unknown Times"
+MAX_REVISION_BYTES = 300_000  # Größere Revisionen (laut `size`) werden gar nicht erst geladen, nur verlinkt
+MAX_DIFF_LINES = 50_000  # Obergrenze für die Zeilen, die nach dem Kürzen noch verglichen werden
+
+
+def line_diff(old_text, new_text):
+    """Gibt `(entfernte Zeilen, hinzugefügte Zeilen)` zwischen zwei Texten zurück.
+
+    Jede Zeile wird auf eine Zahl abgebildet, gleiche Zeilen am Anfang und Ende werden
+    vorab abgeschnitten; verglichen werden danach nur noch die Zahlenfolgen des
+    geänderten Mittelteils. Anders als `ndiff` gibt es keinen zeichenweisen Vergleich
+    ähnlicher Zeilen, der bei großen Seiten quadratisch teuer wird.
+    """
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+
+    start = 0
+    while start < len(old_lines) and start < len(new_lines) and old_lines[start] == new_lines[start]:
+        start += 1
+    end_old, end_new = len(old_lines), len(new_lines)
+    while end_old > start and end_new > start and old_lines[end_old - 1] == new_lines[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    old_lines, new_lines = old_lines[start:end_old], new_lines[start:end_new]
+
+    if len(old_lines) + len(new_lines) > MAX_DIFF_LINES:
+        return None
+
+    ids = {}
+    old_ids = [ids.setdefault(line, len(ids)) for line in old_lines]
+    new_ids = [ids.setdefault(line, len(ids)) for line in new_lines]
+
+    removed, added = [], []
+    matcher = difflib.SequenceMatcher(None, old_ids, new_ids, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            removed.extend(old_lines[i1:i2])
+        if tag in ("replace", "insert"):
+            added.extend(new_lines[j1:j2])
+    return removed, added
+
+
+def revision_text(revision):
+    return revision.get("slots", {}).get("main", {}).get("content", "")
+
 
 class WikiDiff(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    async def fetch_revisions(self, seitenname, alt_id, neu_id):
+        """Lädt zwei Revisionen (älter, neuer) samt Seitentitel – per ID oder die letzten beiden einer Seite.
+
+        Nur die Metadaten inkl. Größe; der Quelltext kommt erst über `fetch_texts`.
+        """
+        params = {
+            "action": "query",
+            "prop": "revisions",
+            "rvprop": "ids|user|comment|size",
+        }
+        if alt_id and neu_id:
+            params["revids"] = f"{alt_id}|{neu_id}"
+        else:
+            params.update(titles=seitenname, rvlimit=2)
+
+        data = await self.bot.wiki_api.request(WIKI, **params)
+        if data is None:
+            raise WikiUnavailable(WIKI)
+
+        pages = [page for page in data.get("query", {}).get("pages", []) if page.get("revisions")]
+        if len(pages) != 1:
+            return None  # Seite fehlt oder die IDs gehören zu verschiedenen Seiten
+
+        revisions = sorted(pages[0]["revisions"], key=lambda revision: revision["revid"])
+        if len(revisions) < 2:
+            return None
+        return pages[0]["title"], revisions[0], revisions[-1]
+
+    async def fetch_texts(self, alt_id, neu_id):
+        """Lädt den Quelltext zweier Revisionen; gibt `(alter Text, neuer Text)` zurück."""
+        data = await self.bot.wiki_api.request(
+            WIKI,
+            action="query",
+            prop="revisions",
+            revids=f"{alt_id}|{neu_id}",
+            rvprop="ids|content",
+            rvslots="main",
+        )
+        if data is None:
+            raise WikiUnavailable(WIKI)
+
+        texts = {
+            revision["revid"]: revision_text(revision)
+            for page in data.get("query", {}).get("pages", [])
+            for revision in page.get("revisions", [])
+        }
+        return texts.get(alt_id, ""), texts.get(neu_id, "")
+
     @slash_command(name="show_diff", description="Zeigt übersichtliche Änderungen einer Wiki-Seite (Admin only)")
     @commands.has_permissions(administrator=True)
     async def show_diff(
         self,
         ctx,
-        seitenname: Option(str, "Name der Wiki-Seite")
+        seitenname: Option(str, "Name der Wiki-Seite", required=False, default=None),
+        alt_id: Option(int, "Ältere Revisions-ID (optional)", required=False, default=None),
+        neu_id: Option(int, "Neuere Revisions-ID (optional)", required=False, default=None)
     ):
-        await ctx.defer()
+        if bool(alt_id) != bool(neu_id):
+            return await ctx.respond("❌ Gib entweder beide Revisions-IDs an oder keine.", ephemeral=True)
+        if not seitenname and not alt_id:
+            return await ctx.respond("❌ Gib einen Seitennamen oder zwei Revisions-IDs an.", ephemeral=True)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(WIKI_API_URL, params={
-                "action": "query",
-                "prop": "revisions",
-                "titles": seitenname,
-                "rvlimit": 2,
-                "rvprop": "ids|user|comment|content",
-                "format": "json"
-            }) as resp:
-                if resp.status != 200:
-                    return await ctx.respond("❌ Fehler beim Abrufen der Revisionen.")
-                data = await resp.json()
-
-        pages = data.get("query", {}).get("pages", {})
-        if not pages:
-            return await ctx.respond("❌ Seite nicht gefunden.")
-
-        page = next(iter(pages.values()))
-        revisions = page.get("revisions", [])
-        if len(revisions) < 2:
-            return await ctx.respond("❌ Nicht genügend Revisionen zum Vergleich.")
-
-        newer = revisions[0]
-        older = revisions[1]
-        title = page.get("title", seitenname)
-
-        old_text = older.get("*") or older.get("slots", {}).get("main", {}).get("*", "")
-        new_text = newer.get("*") or newer.get("slots", {}).get("main", {}).get("*", "")
-
-        if not old_text or not new_text:
-            return await ctx.respond("❌ Quelltext konnte nicht geladen werden.")
-
-        # Vergleich durchführen
-        diff = list(difflib.ndiff(old_text.splitlines(), new_text.splitlines()))
-        removed = [line[2:] for line in diff if line.startswith("- ")]
-        added = [line[2:] for line in diff if line.startswith("+ ")]
+        await ctx.defer()
 
+        try:
+            result = await self.fetch_revisions(seitenname, alt_id, neu_id)
+            if result is None:
+                return await ctx.respond("❌ Keine zwei vergleichbaren Revisionen gefunden.")
+
+            title, older, newer = result
+            # Sehr große Seiten nur verlinken, ohne den Quelltext herunterzuladen
+            texts = None
+            if older.get("size", 0) <= MAX_REVISION_BYTES and newer.get("size", 0) <= MAX_REVISION_BYTES:
+                texts = await self.fetch_texts(older["revid"], newer["revid"])
+        except (aiohttp.ClientError, asyncio.TimeoutError, WikiUnavailable) as e:
+            print(f"❌ Fehler beim Abrufen der Revisionen: {e}")
+            return await ctx.followup.send("❌ Das Wiki ist gerade nicht erreichbar. Versuch es später noch einmal.")
+
+        diff_url = f"{self.bot.wiki_api.page_url(WIKI, title)}?diff={newer['revid']}&oldid={older['revid']}"
+
+        # Vergleich außerhalb des Event-Loops
+        diff = None
+        if texts is not None:
+            old_text, new_text = texts
+            if not old_text or not new_text:
+                return await ctx.respond("❌ Quelltext konnte nicht geladen werden.")
+            diff = await asyncio.to_thread(line_diff, old_text, new_text)
+        if diff is None:
+            return await ctx.respond(f"⚠ Die Änderung ist zu groß für eine Vorschau: [Diff im Wiki öffnen]({diff_url})")
+
+        removed, added = diff
         before_text = "\n".join(removed).strip() or "–"
         after_text = "\n".join(added).strip() or "–"
 
@@ -67,10 +159,10 @@ class WikiDiff(commands.Cog):
 
         embed = discord.Embed(
             title=f"📄 Änderungen in: {title}",
-            url=f"{WIKI_BASE_URL}{title.replace(' ', '_')}?diff={newer['revid']}&oldid={older['revid']}",
+            url=diff_url,
             description=(
                 f"**Bearbeiter:** `{newer.get('user', 'Unbekannt')}`\n"
-                f"**Kommentar:** _{newer.get('comment', '–')}_"
+                f"**Kommentar:** _{newer.get('comment') or '–'}_"
             ),
             color=discord.Color.blue()
         )
@@ -78,7 +170,7 @@ class WikiDiff(commands.Cog):
         embed.add_field(name="❌ Vorher", value=f"```diff\n- {before_text}\n```", inline=False)
         embed.add_field(name="✅ Nachher", value=f"```diff\n+ {after_text}\n```", inline=False)
 
-        embed.set_footer(text="Quelltextvergleich – automatisch generiert")
+        embed.set_footer(text=f"Quelltextvergleich – Revision {older['revid']} → {newer['revid']}")
 
         await ctx.respond(embed=embed)
 
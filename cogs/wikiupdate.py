@@ -1,10 +1,24 @@
+import asyncio
+import time
+from collections import OrderedDict
+
 import discord
 from discord.ext import commands, tasks
 from discord.commands import slash_command, Option
-import aiosqlite
 import aiohttp
 import feedparser
-from bs4 import BeautifulSoup
+
+from title_index import TitleIndex
+from ttl_cache import TTLCache, MISSING
+from wiki_api import WIKIS, WikiUnavailable
+
+DATABASE = "channels.db"
+MAX_SEEN_PER_FEED = 500  # So viele Eintrags-IDs werden pro Feed gemerkt
+SEND_DELAY = 1.5  # Sekunden zwischen mehreren Nachrichten desselben Schubs
+PAGE_CACHE_TTL = 3600  # Sekunden, die ein /wiki-Ergebnis gültig bleibt
+MISSING_PAGE_TTL = 300  # Nicht gefundene Seiten kürzer merken
+MAX_TITLES = 5  # So viele Titel darf /wiki auf einmal nachschlagen
+TITLE_INDEX_REFRESH_HOURS = 6  # So oft wird die Liste aller Seitentitel neu geladen
 
 FEED_URLS = {
     "Unknown Times": "https://naruto-unknown-times.fandom.com/de/wiki/Spezial:Neue_Seiten?feed=rss",
@@ -12,34 +26,78 @@ FEED_URLS = {
 }
 
 
+async def autocomplete_titles(ctx: discord.AutocompleteContext):
+    """Schlägt Seitentitel aus dem lokalen Index vor – ganz ohne Anfrage ans Wiki."""
+    index = ctx.cog.title_indexes.get(ctx.options.get("wiki") or "Unknown Times")
+    if index is None:
+        return []
+
+    # Bei mehreren Titeln wird nur der letzte (gerade getippte) vervollständigt
+    *done, current = (ctx.value or "").split(";")
+    prefix = "".join(f"{title.strip()}; " for title in done if title.strip())
+    suggestions = (prefix + title for title in index.search(current, limit=25))
+    return [suggestion for suggestion in suggestions if len(suggestion) <= 100]
+
 
 class WikiUpdates(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.last_posted = None
+        self.seen = {}  # feed_url -> OrderedDict(entry_id -> seen_at), älteste zuerst
+        self.feed_state = {}  # feed_url -> {"etag": ..., "modified": ...} für bedingte Abrufe
+        self.page_cache = TTLCache(maxsize=512, ttl=PAGE_CACHE_TTL)  # (wiki, titel) -> Seite oder None
+        self.title_indexes = {}  # wiki -> TitleIndex für die Autovervollständigung
         self.check_feed.start()
+        self.refresh_title_indexes.start()
+
+    def cog_unload(self):
+        self.check_feed.cancel()
+        self.refresh_title_indexes.cancel()
+
+    async def fetch_feed(self, feed_url):
+        """Lädt einen Feed nur, wenn er sich geändert hat; geparst wird außerhalb des Event-Loops.
+
+        Gibt `None` zurück, wenn der Server `304 Not Modified` meldet oder der Abruf fehlschlägt.
+        """
+        state = self.feed_state.setdefault(feed_url, {})
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("modified"):
+            headers["If-Modified-Since"] = state["modified"]
+
+        try:
+            async with self.bot.web_client.get(feed_url, headers=headers) as response:
+                if response.status == 304:
+                    return None
+                if response.status != 200:
+                    print(f"⚠ Feed {feed_url} antwortet mit Status {response.status}.")
+                    return None
+                body = await response.read()
+                state["etag"] = response.headers.get("ETag")
+                state["modified"] = response.headers.get("Last-Modified")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"⚠ Feed {feed_url} konnte nicht geladen werden: {e}")
+            return None
+
+        return await asyncio.to_thread(feedparser.parse, body)
 
     @slash_command(name="disablewiki", description="Deaktiviert die Wiki-Benachrichtigungen für diesen Server.")
     @discord.default_permissions(administrator=True)
     async def disablewiki(self, ctx: discord.ApplicationContext):
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute("DELETE FROM text_channels WHERE guild_id = ?", (ctx.guild.id,))
-            await db.commit()
+        await self.bot.db.execute(DATABASE, "DELETE FROM text_channels WHERE guild_id = ?", (ctx.guild.id,))
 
         await ctx.respond("Wiki-Benachrichtigungen wurden deaktiviert.", ephemeral=True)
 
     @slash_command(name="wikistatus", description="Zeigt den aktuellen Status der Wiki-Integration.")
     async def wikistatus(self, ctx: discord.ApplicationContext):
-        async with aiosqlite.connect("channels.db") as db:
-            # Channel abfragen
-            async with db.execute("SELECT channel_id FROM text_channels WHERE guild_id = ?", (ctx.guild.id,)) as cursor:
-                row = await cursor.fetchone()
-                channel = self.bot.get_channel(row[0]) if row else None
+        # Channel und Wiki abfragen
+        row = await self.bot.db.fetchone(DATABASE, "SELECT channel_id, wiki_type FROM text_channels WHERE guild_id = ?",
+                                         (ctx.guild.id,))
+        channel = self.bot.get_channel(row[0]) if row else None
 
-            # Letzter Eintrag
-            async with db.execute("SELECT value FROM metadata WHERE key = 'last_posted'") as cursor:
-                row = await cursor.fetchone()
-                last_posted = row[0] if row else "Keine Daten"
+        # Letzter Eintrag des abonnierten Feeds
+        seen = self.seen.get(FEED_URLS.get(row[1] if row else None, FEED_URLS["Unknown Times"]))
+        last_posted = next(reversed(seen)) if seen else "Keine Daten"
 
         embed = discord.Embed(
             title="📊 Wiki-Bot Status",
@@ -58,12 +116,11 @@ class WikiUpdates(commands.Cog):
             channel: discord.TextChannel,
             wiki: Option(str, "Welches Wiki?", choices=["Unknown Times", "Echo of War"])
     ):
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute(
-                "INSERT OR REPLACE INTO text_channels (guild_id, channel_id, wiki_type) VALUES (?, ?, ?)",
-                (ctx.guild.id, channel.id, wiki)
-            )
-            await db.commit()
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT OR REPLACE INTO text_channels (guild_id, channel_id, wiki_type) VALUES (?, ?, ?)",
+            (ctx.guild.id, channel.id, wiki)
+        )
 
         await ctx.respond(f"✅ Wiki-Update-Channel wurde auf {channel.mention} mit Wiki `{wiki}` gesetzt.",
                           ephemeral=True)
@@ -72,150 +129,231 @@ class WikiUpdates(commands.Cog):
     async def check_feed(self):
         print("Feed wird überprüft...")
 
-        async with aiosqlite.connect("channels.db") as db:
-            async with db.execute("SELECT guild_id, channel_id, wiki_type FROM text_channels") as cursor:
-                async for guild_id, channel_id, wiki_type in cursor:
-                    feed_url = FEED_URLS.get(wiki_type, FEED_URLS["Unknown Times"])
-                    feed = feedparser.parse(feed_url)
-
-                    if not feed.entries:
-                        print(f"[{wiki_type}] Keine Einträge.")
-                        continue
-
-                    latest = feed.entries[0]
-
-                    async with db.execute("SELECT value FROM metadata WHERE key = ?",
-                                          (f"last_posted_{guild_id}",)) as row_cursor:
-                        row = await row_cursor.fetchone()
-                        last_posted = row[0] if row else None
-
-                    if last_posted == latest.id:
-                        print(f"[{guild_id}] Eintrag schon gepostet.")
-                        continue
-
-                    await db.execute(
-                        "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
-                        (f"last_posted_{guild_id}", latest.id)
-                    )
-                    await db.commit()
-
-                    guild = self.bot.get_guild(guild_id)
-                    if not guild:
-                        print(f"Guild {guild_id} nicht gefunden.")
-                        continue
-
-                    channel = guild.get_channel(channel_id)
-                    if not channel:
-                        print(f"Channel {channel_id} nicht gefunden.")
-                        continue
-
-                    try:
-                        await channel.send(f"# 「📌」・NEUHEIT - [[{latest.title}]]({latest.link})")
-                        print(f"✅ Gesendet an {channel.name} ({guild.name})")
-                    except Exception as e:
-                        print(f"Fehler beim Senden: {e}")
+        # Abonnenten pro Feed sammeln: jeder Feed wird pro Durchlauf nur einmal geladen
+        subscribers = {}
+        subscriptions = await self.bot.db.fetchall(DATABASE, "SELECT guild_id, channel_id, wiki_type FROM text_channels")
+        for guild_id, channel_id, wiki_type in subscriptions:
+            feed_url = FEED_URLS.get(wiki_type, FEED_URLS["Unknown Times"])
+            subscribers.setdefault(feed_url, []).append((guild_id, channel_id))
+
+        for feed_url, feed_subscribers in subscribers.items():
+            feed = await self.fetch_feed(feed_url)
+            if feed is None:
+                continue  # Unverändert oder nicht erreichbar
+
+            if not feed.entries:
+                print(f"[{feed_url}] Keine Einträge.")
+                continue
+
+            new_entries = self.unseen_entries(feed_url, feed.entries)
+            if not new_entries:
+                continue
+
+            first_run = not self.seen.get(feed_url)
+            await self.mark_seen(feed_url, new_entries)
+            if first_run:
+                # Beim allerersten Abruf nur merken – sonst würde der komplette Feed gepostet
+                print(f"[{feed_url}] {len(new_entries)} Einträge als gelesen markiert.")
+                continue
+
+            await self.deliver(new_entries, feed_subscribers)
+
+    def unseen_entries(self, feed_url, entries):
+        """Alle noch nicht geposteten Einträge, älteste zuerst."""
+        seen = self.seen.get(feed_url, {})
+        new_entries = []
+        for entry in entries:
+            entry_id = entry.get("id") or entry.get("link")
+            if entry_id and entry_id not in seen and entry_id not in (e[0] for e in new_entries):
+                new_entries.append((entry_id, entry))
+        new_entries.reverse()  # Feeds liefern die neuesten Einträge zuerst
+        return new_entries
+
+    async def mark_seen(self, feed_url, new_entries):
+        """Speichert die IDs als gesehen und behält pro Feed nur die letzten `MAX_SEEN_PER_FEED`."""
+        seen = self.seen.setdefault(feed_url, OrderedDict())
+        now = time.time()
+        rows = []
+        for index, (entry_id, _) in enumerate(new_entries):
+            seen[entry_id] = now + index / 1000  # Reihenfolge innerhalb eines Abrufs erhalten
+            rows.append((feed_url, entry_id, seen[entry_id]))
+        while len(seen) > MAX_SEEN_PER_FEED:
+            seen.popitem(last=False)
+
+        async with self.bot.db.transaction(DATABASE) as db:
+            await db.executemany("INSERT OR REPLACE INTO feed_seen (feed_url, entry_id, seen_at) VALUES (?, ?, ?)",
+                                 rows)
+            await db.execute("""
+                DELETE FROM feed_seen WHERE feed_url = ? AND entry_id NOT IN (
+                    SELECT entry_id FROM feed_seen WHERE feed_url = ? ORDER BY seen_at DESC LIMIT ?
+                )
+            """, (feed_url, feed_url, MAX_SEEN_PER_FEED))
+
+    def build_messages(self, new_entries):
+        """Fasst neue Einträge zu möglichst wenigen Nachrichten (max. 2000 Zeichen) zusammen."""
+        if len(new_entries) == 1:
+            entry = new_entries[0][1]
+            return [f"# 「📌」・NEUHEIT - [[{entry.title}]]({entry.link})"]
+
+        messages = []
+        current = f"# 「📌」・NEUHEITEN ({len(new_entries)})"
+        for _, entry in new_entries:
+            line = f"\n- [[{entry.title}]](<{entry.link}>)"
+            if len(current) + len(line) > 2000:
+                messages.append(current)
+                current = "# 「📌」・NEUHEITEN (Fortsetzung)"
+            current += line
+        messages.append(current)
+        return messages
+
+    async def deliver(self, new_entries, feed_subscribers):
+        """Verteilt neue Einträge eines Feeds gebündelt an alle abonnierten Server."""
+        messages = self.build_messages(new_entries)
+        for guild_id, channel_id in feed_subscribers:
+            guild = self.bot.get_guild(guild_id)
+            if not guild:
+                print(f"Guild {guild_id} nicht gefunden.")
+                continue
+
+            channel = guild.get_channel(channel_id)
+            if not channel:
+                print(f"Channel {channel_id} nicht gefunden.")
+                continue
+
+            try:
+                for index, content in enumerate(messages):
+                    if index:
+                        await asyncio.sleep(SEND_DELAY)  # Große Nachholschübe nicht auf einmal senden
+                    await channel.send(content)
+                print(f"✅ {len(new_entries)} Einträge gesendet an {channel.name} ({guild.name})")
+            except Exception as e:
+                print(f"Fehler beim Senden: {e}")
 
     @check_feed.before_loop
     async def before_check_feed(self):
         await self.bot.wait_until_ready()
-        # Datenbank-Setup für 'metadata'-Tabelle (falls nicht vorhanden)
-        async with aiosqlite.connect("channels.db") as db:
-            await db.execute(
-                "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
-            )
-            await db.commit()
+        # Datenbank-Setup für bereits gepostete Feed-Einträge (falls nicht vorhanden)
+        async with self.bot.db.transaction(DATABASE) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS feed_seen (
+                    feed_url TEXT,
+                    entry_id TEXT,
+                    seen_at REAL,
+                    PRIMARY KEY (feed_url, entry_id)
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_feed_seen_time ON feed_seen (feed_url, seen_at)")
+
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT feed_url, entry_id, seen_at FROM feed_seen ORDER BY seen_at")
+        for feed_url, entry_id, seen_at in rows:
+            self.seen.setdefault(feed_url, OrderedDict())[entry_id] = seen_at
+
+    @tasks.loop(hours=TITLE_INDEX_REFRESH_HOURS)
+    async def refresh_title_indexes(self):
+        """Lädt alle Seitentitel jedes Wikis und baut den Suchindex außerhalb des Event-Loops."""
+        for wiki in WIKIS:
+            try:
+                titles = await self.bot.wiki_api.all_titles(wiki)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                titles = None
+                print(f"⚠ Seitentitel von {wiki} konnten nicht geladen werden: {e}")
+            if titles is None:
+                continue  # Alten Index behalten
+
+            self.title_indexes[wiki] = await asyncio.to_thread(TitleIndex, titles)
+            print(f"📚 {len(titles)} Seitentitel für {wiki} indiziert.")
+
+    @refresh_title_indexes.before_loop
+    async def before_refresh_title_indexes(self):
+        await self.bot.wait_until_ready()
+
+    async def lookup_pages(self, wiki, titles):
+        """Löst Titel über die API auf; bekannte Seiten kommen aus dem Cache."""
+        pages = {}
+        missing = []
+        for title in titles:
+            page = self.page_cache.get((wiki, title))
+            if page is MISSING:
+                missing.append(title)
+            else:
+                pages[title] = page
+
+        if missing:
+            # Alle unbekannten Titel in einer einzigen API-Anfrage
+            found = await self.bot.wiki_api.query_pages(wiki, missing)
+
+            # Unscharfe Suche für nicht gefundene Titel, danach alle Vorschläge gesammelt auflösen
+            not_found = [title for title in missing if title in found and found[title] is None]
+            suggestions = await self.suggest_titles(wiki, not_found)
+            if suggestions:
+                resolved = await self.bot.wiki_api.query_pages(wiki, list(suggestions.values()))
+                for title, suggestion in suggestions.items():
+                    found[title] = resolved.get(suggestion)
+
+            for title, page in found.items():
+                self.page_cache.set((wiki, title), page, ttl=None if page else MISSING_PAGE_TTL)
+                pages[title] = page
+
+        return pages
+
+    async def suggest_titles(self, wiki, titles):
+        """Bester Vorschlag je Titel: aus dem lokalen Titelindex, sonst per `opensearch` (parallel)."""
+        index = self.title_indexes.get(wiki)
+        if index is not None:
+            matches = {title: index.search(title, limit=1) for title in titles}
+        else:
+            results = await asyncio.gather(*(self.bot.wiki_api.opensearch(wiki, title, limit=1) for title in titles))
+            matches = dict(zip(titles, results))
+        return {title: match[0] for title, match in matches.items() if match}
 
     @slash_command(name="wiki", description="Suche eine Seite im Wiki.")
     async def wiki(
             self,
             ctx: discord.ApplicationContext,
             *,
-            titel: Option(str, "Seitentitel"),
-            wiki: Option(str, "Welches Wiki?", choices=["Unknown Times", "Narutopedia", "Echo of War"])
+            titel: Option(str, "Seitentitel (mehrere mit ; trennen)", autocomplete=autocomplete_titles),
+            wiki: Option(str, "Welches Wiki?", choices=list(WIKIS))
 
     ):
         await ctx.defer()
 
-        slug = titel.strip().replace(" ", "_")
-        if wiki == "Unknown Times":
-            base_url = "https://naruto-unknown-times.fandom.com/de/wiki/"
-            file_path_base = "https://naruto-unknown-times.fandom.com/de/wiki/Special:FilePath/"
-            logo = "https://naruto-unknown-times.fandom.com/de/wiki/Special:FilePath/NarutoUT_Logo.png"
-        elif wiki == "Echo of War":
-            base_url = "https://naruto-rp.fandom.com/de/wiki/"
-            file_path_base = "https://naruto-rp.fandom.com/de/wiki/Special:FilePath/"
-            logo = "https://naruto-rp.fandom.com/de/wiki/Special:FilePath/Echo_Logo.png"  # ggf. durch richtiges Logo ersetzen
-
-        elif wiki == "Naruto":
-            base_url = "https://naruto.fandom.com/wiki/"
-            file_path_base = "https://naruto.fandom.com/wiki/Special:FilePath/"
-            logo = "https://static.wikia.nocookie.net/naruto/images/6/60/Narutopedia_Wikia_Icon.png"
-
-        wiki_url = f"{base_url}{slug}"
-        image_url = None
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get(wiki_url) as response:
-                if response.status != 200:
-                    embed = discord.Embed(
-                        title="❌ Seite nicht gefunden",
-                        description=f"Die Seite [{titel}]({wiki_url}) scheint im {wiki} Wiki nicht zu existieren.",
-                        color=discord.Color.red()
-                    )
-                    return await ctx.respond(embed=embed)
-
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Unknown Times – portable infobox
-                if wiki == "Unknown Times":
-                    infobox = soup.find('aside', class_='portable-infobox')
-                    if infobox:
-                        img_tag = infobox.find('img')
-                        if img_tag and img_tag.has_attr('src'):
-                            image_url = img_tag['src']
-                            if image_url.startswith('//'):
-                                image_url = 'https:' + image_url
-                                
-                                
-                elif wiki == "Echo of War":
-                    infobox = soup.find('aside', class_='portable-infobox')
-                    if infobox:
-                        img_tag = infobox.find('img')
-                        if img_tag and img_tag.has_attr('src'):
-                            image_url = img_tag['src']
-                            if image_url.startswith('//'):
-                                image_url = 'https:' + image_url
-                                
-                          
-                                
-                         
-
-                # Narutopedia – suche image name Feld
-                elif wiki == "Narutopedia":
-                    table = soup.find("table", class_="infobox")
-                    if table:
-                        rows = table.find_all("tr")
-                        for row in rows:
-                            if row.th and "image name" in row.th.text.lower():
-                                if row.td:
-                                    raw = row.td.text.strip().split(";")[0]
-                                    filename = raw.replace(" ", "_")
-                                    image_url = file_path_base + filename
-                                    break
-
-        # Embed erzeugen
-        embed = discord.Embed(
-            title=f"🔍 Wiki-Ergebnis: {titel}",
-            url=wiki_url,
-            description=f"Hier findest du die Seite im {wiki} Wiki.",
-            color=discord.Color.orange()
-        )
-        if image_url:
-            embed.set_image(url=image_url)
+        titles = [title.strip() for title in titel.split(";") if title.strip()][:MAX_TITLES]
+        if not titles:
+            return await ctx.respond("❌ Bitte gib einen Seitentitel an.", ephemeral=True)
+
+        try:
+            pages = await self.lookup_pages(wiki, titles)
+        except (aiohttp.ClientError, asyncio.TimeoutError, WikiUnavailable) as e:
+            print(f"❌ Fehler bei der Wiki-Suche ({wiki}): {e}")
+            return await ctx.respond("❌ Das Wiki ist gerade nicht erreichbar. Versuch es später noch einmal.")
+        logo = WIKIS[wiki]["logo"]
+
+        embeds = []
+        for title in titles:
+            page = pages.get(title)
+            if page is None:
+                wiki_url = self.bot.wiki_api.page_url(wiki, title)
+                embeds.append(discord.Embed(
+                    title="❌ Seite nicht gefunden",
+                    description=f"Die Seite [{title}]({wiki_url}) scheint im {wiki} Wiki nicht zu existieren.",
+                    color=discord.Color.red()
+                ))
+                continue
+
+            # Embed erzeugen
+            embed = discord.Embed(
+                title=f"🔍 Wiki-Ergebnis: {page['title']}",
+                url=page["url"],
+                description=f"Hier findest du die Seite im {wiki} Wiki.",
+                color=discord.Color.orange()
+            )
+            if page["image"]:
+                embed.set_image(url=page["image"])
+
+            embed.set_footer(text=f"Powered by {wiki}", icon_url=logo)
+            embeds.append(embed)
 
-        embed.set_footer(text=f"Powered by {wiki}", icon_url=logo)
-        await ctx.respond(embed=embed)
+        await ctx.respond(embeds=embeds)
 
 
 def setup(bot):
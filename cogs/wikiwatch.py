@@ -0,0 +1,328 @@
+import asyncio
+import datetime
+
+import aiohttp
+import discord
+from discord.ext import commands, tasks
+from discord.commands import slash_command, Option
+
+from wiki_api import WIKIS
+
+DATABASE = "channels.db"
+CHANGES_PER_REQUEST = 50  # Geänderte Seiten pro Abruf und Wiki
+CATEGORIES_PER_REQUEST = 50  # Limit der MediaWiki-API für `clcategories`
+SEND_DELAY = 1.5  # Sekunden zwischen mehreren Nachrichten an denselben Channel
+
+
+def normalize_title(title):
+    """Schreibweise wie im Wiki: Leerzeichen statt `_`, erster Buchstabe groß."""
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def strip_namespace(title):
+    """'Kategorie:Clans' -> 'Clans' (der Namensraum heißt je nach Sprache anders)."""
+    return title.split(":", 1)[1] if ":" in title else title
+
+
+class WikiWatch(commands.Cog):
+    """Meldet Bearbeitungen an einzelnen Seiten oder ganzen Kategorien.
+
+    Pro Wiki und Durchlauf gibt es genau eine Anfrage an `generator=recentchanges`,
+    egal wie viele Server etwas beobachten (plus je eine pro weiteren 50 beobachteten
+    Kategorien, falls es mehr sind). Der Abruf setzt dort an, wo der letzte
+    aufgehört hat (`grccontinue` bzw. Zeitstempel + letzte Revisions-ID), es kommen
+    also nur neue Änderungen.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.watches = {}  # wiki -> {"page"/"category": {titel: {(guild_id, channel_id), ...}}}
+        self.cursors = {}  # wiki -> {"rcstart": ..., "last_revid": ..., "rccontinue": ...}
+        self.poll_changes.start()
+
+    def cog_unload(self):
+        self.poll_changes.cancel()
+
+    def add_watch(self, guild_id, channel_id, wiki, target_type, target):
+        targets = self.watches.setdefault(wiki, {"page": {}, "category": {}})[target_type]
+        targets.setdefault(target, set()).add((guild_id, channel_id))
+
+    def has_watches(self, wiki):
+        watches = self.watches.get(wiki)
+        return bool(watches and (watches["page"] or watches["category"]))
+
+    def reset_cursor(self, wiki):
+        """Setzt den Cursor auf jetzt – es werden keine älteren Änderungen nachgeholt."""
+        cursor = self.cursors.setdefault(wiki, {"last_revid": 0})
+        cursor.update(rcstart=utc_now(), rccontinue=None)
+        cursor.pop("pending_revid", None)
+
+    def remove_watch(self, guild_id, wiki, target_type, target):
+        targets = self.watches.get(wiki, {}).get(target_type, {})
+        subscribers = {entry for entry in targets.get(target, set()) if entry[0] != guild_id}
+        if subscribers:
+            targets[target] = subscribers
+        else:
+            targets.pop(target, None)
+
+    @slash_command(name="wikiwatch", description="Meldet Bearbeitungen einer Wiki-Seite oder Kategorie in einem Channel.")
+    @discord.default_permissions(administrator=True)
+    async def wikiwatch(
+            self,
+            ctx: discord.ApplicationContext,
+            channel: discord.TextChannel,
+            wiki: Option(str, "Welches Wiki?", choices=list(WIKIS)),
+            seite: Option(str, "Seitentitel", required=False, default=None),
+            kategorie: Option(str, "Kategorie (ohne 'Kategorie:')", required=False, default=None)
+    ):
+        if bool(seite) == bool(kategorie):
+            return await ctx.respond("❌ Gib entweder eine Seite oder eine Kategorie an.", ephemeral=True)
+
+        target_type = "page" if seite else "category"
+        target = normalize_title(seite or strip_namespace(kategorie))
+
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT OR REPLACE INTO wiki_watch (guild_id, channel_id, wiki, target_type, target) VALUES (?, ?, ?, ?, ?)",
+            (ctx.guild.id, channel.id, wiki, target_type, target)
+        )
+        first_watch = not self.has_watches(wiki)
+        self.remove_watch(ctx.guild.id, wiki, target_type, target)  # Evtl. alten Channel ersetzen
+        self.add_watch(ctx.guild.id, channel.id, wiki, target_type, target)
+        if first_watch:
+            # Bisher hat niemand dieses Wiki beobachtet: ab jetzt starten statt ab dem Bot-Start
+            self.reset_cursor(wiki)
+            await self.save_cursor(wiki)
+
+        label = "Seite" if seite else "Kategorie"
+        await ctx.respond(f"✅ Änderungen an {label} `{target}` ({wiki}) werden in {channel.mention} gemeldet.",
+                          ephemeral=True)
+
+    @slash_command(name="wikiunwatch", description="Beendet die Beobachtung einer Wiki-Seite oder Kategorie.")
+    @discord.default_permissions(administrator=True)
+    async def wikiunwatch(
+            self,
+            ctx: discord.ApplicationContext,
+            wiki: Option(str, "Welches Wiki?", choices=list(WIKIS)),
+            seite: Option(str, "Seitentitel", required=False, default=None),
+            kategorie: Option(str, "Kategorie (ohne 'Kategorie:')", required=False, default=None)
+    ):
+        if bool(seite) == bool(kategorie):
+            return await ctx.respond("❌ Gib entweder eine Seite oder eine Kategorie an.", ephemeral=True)
+
+        target_type = "page" if seite else "category"
+        target = normalize_title(seite or strip_namespace(kategorie))
+
+        await self.bot.db.execute(
+            DATABASE,
+            "DELETE FROM wiki_watch WHERE guild_id = ? AND wiki = ? AND target_type = ? AND target = ?",
+            (ctx.guild.id, wiki, target_type, target)
+        )
+        self.remove_watch(ctx.guild.id, wiki, target_type, target)
+
+        await ctx.respond(f"✅ `{target}` ({wiki}) wird nicht mehr beobachtet.", ephemeral=True)
+
+    @slash_command(name="wikiwatchlist", description="Zeigt alle beobachteten Wiki-Seiten und Kategorien.")
+    async def wikiwatchlist(self, ctx: discord.ApplicationContext):
+        rows = await self.bot.db.fetchall(
+            DATABASE,
+            "SELECT channel_id, wiki, target_type, target FROM wiki_watch WHERE guild_id = ? ORDER BY wiki, target",
+            (ctx.guild.id,)
+        )
+        if not rows:
+            return await ctx.respond("ℹ Auf diesem Server werden keine Wiki-Seiten beobachtet.", ephemeral=True)
+
+        lines = [
+            f"- {'📄' if target_type == 'page' else '🗂️'} `{target}` ({wiki}) → <#{channel_id}>"
+            for channel_id, wiki, target_type, target in rows
+        ]
+        embed = discord.Embed(title="👀 Beobachtete Wiki-Seiten", description="\n".join(lines)[:4000],
+                              color=discord.Color.orange())
+        await ctx.respond(embed=embed, ephemeral=True)
+
+    async def fetch_changes(self, wiki):
+        """Eine Anfrage pro Wiki: geänderte Seiten seit dem Cursor, inkl. beobachteter Kategorien."""
+        cursor = self.cursors[wiki]
+        params = {
+            "action": "query",
+            "generator": "recentchanges",
+            "grcdir": "newer",
+            "grcnamespace": 0,
+            "grctype": "edit|new",
+            "grclimit": CHANGES_PER_REQUEST,
+            "prop": "revisions",
+            "rvprop": "ids|user|comment|timestamp",
+        }
+        if cursor.get("rccontinue"):
+            params["grccontinue"] = cursor["rccontinue"]
+        else:
+            params["grcstart"] = cursor["rcstart"]
+
+        categories = list(self.watches.get(wiki, {}).get("category", {}))
+        chunks = [categories[start:start + CATEGORIES_PER_REQUEST]
+                  for start in range(0, len(categories), CATEGORIES_PER_REQUEST)]
+        if chunks:
+            # Nur die beobachteten Kategorien abfragen statt aller Kategorien jeder Seite
+            params["prop"] += "|categories"
+            params["clcategories"] = "|".join(f"Category:{category}" for category in chunks[0])
+            params["cllimit"] = "max"
+
+        data = await self.bot.wiki_api.request(wiki, **params)
+        if data is None:
+            return None
+
+        changes = []
+        for page in data.get("query", {}).get("pages", []):
+            revisions = page.get("revisions")
+            if not revisions or revisions[0]["revid"] <= cursor["last_revid"]:
+                continue  # Schon beim letzten Abruf gemeldet
+            changes.append((page, revisions[0]))
+        changes.sort(key=lambda change: change[1]["revid"])
+
+        # Mehr als 50 beobachtete Kategorien: restliche Blöcke nur für die geänderten Seiten nachfragen
+        if changes and len(chunks) > 1:
+            await self.add_categories(wiki, [page for page, _ in changes], chunks[1:])
+
+        # Cursor weiterschieben: entweder an der Fortsetzung der API oder ab der neuesten Änderung
+        # `last_revid` erst am Ende einer Fortsetzungskette anheben: spätere Teile enthalten
+        # ältere Änderungen, deren Revisions-ID kleiner sein kann als die bereits gemeldeten
+        cursor["rccontinue"] = data.get("continue", {}).get("grccontinue")
+        if changes:
+            cursor["pending_revid"] = max(cursor.get("pending_revid", 0), changes[-1][1]["revid"])
+            cursor["rcstart"] = max(cursor["rcstart"], *(revision["timestamp"] for _, revision in changes))
+        if not cursor["rccontinue"]:
+            cursor["last_revid"] = max(cursor["last_revid"], cursor.pop("pending_revid", 0))
+        return changes
+
+    async def add_categories(self, wiki, pages, chunks):
+        """Ergänzt bei den Seiten die Treffer aus weiteren Kategorie-Blöcken (je Block eine Anfrage)."""
+        by_title = {page["title"]: page for page in pages}
+        for chunk in chunks:
+            data = await self.bot.wiki_api.request(
+                wiki,
+                action="query",
+                titles="|".join(by_title),
+                prop="categories",
+                clcategories="|".join(f"Category:{category}" for category in chunk),
+                cllimit="max",
+            )
+            if data is None:
+                continue
+            for result in data.get("query", {}).get("pages", []):
+                page = by_title.get(result["title"])
+                if page is not None:
+                    page.setdefault("categories", []).extend(result.get("categories", []))
+
+    def match_subscribers(self, wiki, page):
+        watches = self.watches.get(wiki, {})
+        subscribers = set(watches.get("page", {}).get(page["title"], set()))
+        for category in page.get("categories", []):
+            subscribers |= watches.get("category", {}).get(strip_namespace(category["title"]), set())
+        return subscribers
+
+    def format_change(self, wiki, page, revision):
+        url = f"{self.bot.wiki_api.page_url(wiki, page['title'])}?diff={revision['revid']}"
+        line = f"- [[{page['title']}]](<{url}>) von `{revision.get('user', 'Unbekannt')}`"
+        if revision.get("comment"):
+            line += f": _{revision['comment'][:150]}_"
+        return line
+
+    async def deliver(self, channel_lines):
+        """Sendet jedem Channel seine Änderungen gebündelt (max. 2000 Zeichen pro Nachricht)."""
+        for channel_id, lines in channel_lines.items():
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                print(f"Channel {channel_id} nicht gefunden.")
+                continue
+
+            messages = []
+            current = f"# 「✏️」・WIKI-ÄNDERUNGEN ({len(lines)})"
+            for line in lines:
+                if len(current) + len(line) + 1 > 2000:
+                    messages.append(current)
+                    current = "# 「✏️」・WIKI-ÄNDERUNGEN (Fortsetzung)"
+                current += "\n" + line
+            messages.append(current)
+
+            try:
+                for index, content in enumerate(messages):
+                    if index:
+                        await asyncio.sleep(SEND_DELAY)
+                    await channel.send(content)
+            except Exception as e:
+                print(f"Fehler beim Senden: {e}")
+
+    async def save_cursor(self, wiki):
+        cursor = self.cursors[wiki]
+        await self.bot.db.execute(
+            DATABASE,
+            "INSERT OR REPLACE INTO wiki_rc_cursor (wiki, rcstart, last_revid, rccontinue) VALUES (?, ?, ?, ?)",
+            (wiki, cursor["rcstart"], cursor["last_revid"], cursor["rccontinue"])
+        )
+
+    @tasks.loop(minutes=1)
+    async def poll_changes(self):
+        for wiki in list(self.watches):
+            if not self.has_watches(wiki):
+                continue
+
+            try:
+                changes = await self.fetch_changes(wiki)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠ Letzte Änderungen von {wiki} konnten nicht geladen werden: {e}")
+                continue
+            if changes is None:
+                continue
+            await self.save_cursor(wiki)
+
+            channel_lines = {}
+            for page, revision in changes:
+                for guild_id, channel_id in self.match_subscribers(wiki, page):
+                    channel_lines.setdefault(channel_id, []).append(self.format_change(wiki, page, revision))
+            if channel_lines:
+                await self.deliver(channel_lines)
+
+    @poll_changes.before_loop
+    async def before_poll_changes(self):
+        await self.bot.wait_until_ready()
+        async with self.bot.db.transaction(DATABASE) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS wiki_watch (
+                    guild_id INTEGER,
+                    channel_id INTEGER,
+                    wiki TEXT,
+                    target_type TEXT,
+                    target TEXT,
+                    PRIMARY KEY (guild_id, wiki, target_type, target)
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS wiki_rc_cursor (
+                    wiki TEXT PRIMARY KEY,
+                    rcstart TEXT,
+                    last_revid INTEGER,
+                    rccontinue TEXT
+                )
+            """)
+
+        for guild_id, channel_id, wiki, target_type, target in await self.bot.db.fetchall(
+                DATABASE, "SELECT guild_id, channel_id, wiki, target_type, target FROM wiki_watch"):
+            self.add_watch(guild_id, channel_id, wiki, target_type, target)
+
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT wiki, rcstart, last_revid, rccontinue FROM wiki_rc_cursor")
+        self.cursors = {wiki: {"rcstart": rcstart, "last_revid": last_revid, "rccontinue": rccontinue}
+                        for wiki, rcstart, last_revid, rccontinue in rows}
+
+        # Ohne gespeicherten Cursor ab jetzt beobachten – keine alten Änderungen nachholen
+        for wiki in set(WIKIS) | set(self.watches):
+            if wiki not in self.cursors:
+                self.reset_cursor(wiki)
+
+
+def setup(bot):
+    bot.add_cog(WikiWatch(bot))
@@ -1,42 +1,141 @@
-import aiosqlite
+import asyncio
 import time
 from discord.ext import commands
 
-async def check_cooldown(ctx):
-    """Überprüft, ob der User für einen Befehl einen Cooldown hat"""
-    async with aiosqlite.connect("server_settings.db") as db:
-        async with db.execute("SELECT seconds FROM cooldowns WHERE guild_id = ? AND command = ?",
-                              (ctx.guild.id, ctx.command.name)) as cursor:
-            result = await cursor.fetchone()
-            cooldown_time = result[0] if result else None
-
-    if cooldown_time is None:
-        return True  # Kein Cooldown gesetzt
-
-    async with aiosqlite.connect("server_settings.db") as db:
-        async with db.execute("SELECT last_used FROM cooldown_tracker WHERE user_id = ? AND command = ?",
-                              (ctx.author.id, ctx.command.name)) as cursor:
-            last_used = await cursor.fetchone()
-
-    if last_used:
-        last_used_time = last_used[0]
-        time_since_last_use = time.time() - last_used_time  # Zeitdifferenz berechnen
-
-        if time_since_last_use < cooldown_time:
-            remaining_time = cooldown_time - time_since_last_use
+DATABASE = "server_settings.db"
+PERSIST_INTERVAL = 60  # Sekunden zwischen zwei Sicherungen der Cooldown-Zustände
+
+
+class CooldownEngine:
+    """Cooldowns komplett im Speicher (als Token-Bucket).
+
+    Die Cooldown-Einstellungen werden pro Server einmal geladen und erst nach einer
+    Änderung (`invalidate`) neu gelesen. Die Nutzung pro User und Befehl liegt in einem
+    Dict; abgelaufene Einträge verschwinden beim nächsten Zugriff oder beim Sichern.
+    Der Zustand wird regelmäßig in `cooldown_tracker` gesichert, damit er einen
+    Neustart übersteht.
+
+    `rate` Nutzungen sind pro `seconds` Sekunden erlaubt (Burst). Mit `rate = 1`
+    entspricht das dem klassischen Cooldown.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._config = {}  # guild_id -> {command: (rate, seconds)}
+        self._buckets = {}  # (user_id, command) -> [tokens, last_update, rate, seconds]
+        self._dirty = set()  # Geänderte Buckets, die noch gesichert werden müssen
+        self._expired = set()  # Abgelaufene Buckets, deren Zeile gelöscht werden kann
+        self.bot.db.add_close_hook(self.persist)
+        self.bot.loop.create_task(self._persist_loop())
+
+    def invalidate(self, guild_id):
+        """Verwirft die gecachten Cooldown-Einstellungen eines Servers."""
+        self._config.pop(guild_id, None)
+
+    async def get_config(self, guild_id):
+        config = self._config.get(guild_id)
+        if config is None:
+            rows = await self.bot.db.fetchall(DATABASE, "SELECT command, seconds, rate FROM cooldowns WHERE guild_id = ?",
+                                              (guild_id,))
+            config = {command: (max(rate or 1, 1), seconds) for command, seconds, rate in rows if seconds}
+            self._config[guild_id] = config
+        return config
+
+    def _refill(self, bucket, now):
+        """Füllt den Bucket entsprechend der vergangenen Zeit wieder auf."""
+        tokens, last_update, rate, seconds = bucket
+        return min(rate, tokens + (now - last_update) * rate / seconds)
+
+    def consume(self, user_id, command, rate, seconds):
+        """Verbraucht eine Nutzung; gibt die Wartezeit zurück (0, wenn erlaubt)."""
+        now = time.time()
+        key = (user_id, command)
+        bucket = self._buckets.get(key)
+
+        tokens = rate
+        if bucket is not None:
+            bucket[2], bucket[3] = rate, seconds  # Aktuelle Einstellung gilt
+            tokens = self._refill(bucket, now)
+
+        if tokens < 1:
+            return (1 - tokens) * seconds / rate
+
+        self._buckets[key] = [tokens - 1, now, rate, seconds]
+        self._dirty.add(key)
+        self._expired.discard(key)
+        return 0
+
+    async def check(self, ctx):
+        if ctx.guild is None:
+            return True
+
+        config = await self.get_config(ctx.guild.id)
+        setting = config.get(ctx.command.name)
+        if setting is None:
+            return True  # Kein Cooldown gesetzt
+
+        rate, seconds = setting
+        retry_after = self.consume(ctx.author.id, ctx.command.name, rate, seconds)
+        if retry_after:
             raise commands.CommandOnCooldown(
-                commands.Cooldown(rate=1, per=cooldown_time),
-                retry_after=remaining_time,
+                commands.Cooldown(rate=rate, per=seconds),
+                retry_after=retry_after,
                 type=commands.BucketType.user
             )
+        return True  # Kein aktiver Cooldown
+
+    async def load(self):
+        """Lädt die gesicherten Cooldown-Zustände nach einem Neustart.
+
+        Die Buckets kennen ihren Server nicht; bis zur nächsten Nutzung gilt deshalb die
+        längste für den Befehl eingestellte Zeitspanne, damit sie beim Sichern korrekt
+        (eher zu spät als zu früh) ablaufen. Buckets für Befehle ohne Cooldown fallen weg.
+        """
+        limits = {command: (max(rate or 1, 1), seconds) for command, rate, seconds in await self.bot.db.fetchall(
+            DATABASE, "SELECT command, MIN(rate), MAX(seconds) FROM cooldowns WHERE seconds > 0 GROUP BY command")}
+        rows = await self.bot.db.fetchall(DATABASE, "SELECT user_id, command, last_used, tokens FROM cooldown_tracker")
+        for user_id, command, last_used, tokens in rows:
+            key = (user_id, command)
+            if command not in limits:
+                self._expired.add(key)
+                continue
+            rate, seconds = limits[command]
+            # Alte Zeilen ohne `tokens`: Befehl wurde zu `last_used` genau einmal benutzt
+            self._buckets.setdefault(key, [min(tokens or 0, rate), last_used, rate, seconds])
 
-    # Speichere den aktuellen Zeitstempel für den Befehl
-    async with aiosqlite.connect("server_settings.db") as db:
-        await db.execute("""
-            INSERT INTO cooldown_tracker (user_id, command, last_used) 
-            VALUES (?, ?, ?) 
-            ON CONFLICT(user_id, command) DO UPDATE SET last_used = ?
-        """, (ctx.author.id, ctx.command.name, time.time(), time.time()))
-        await db.commit()
+    async def persist(self):
+        """Sichert geänderte Buckets und räumt abgelaufene aus Speicher und Datenbank."""
+        now = time.time()
+        for key, bucket in list(self._buckets.items()):
+            if self._refill(bucket, now) >= bucket[2]:
+                del self._buckets[key]  # Wieder voll – Eintrag wird nicht mehr gebraucht
+                self._dirty.discard(key)
+                self._expired.add(key)
 
-    return True  # Kein aktiver Cooldown
+        dirty, self._dirty = self._dirty, set()
+        expired, self._expired = self._expired, set()
+        rows = [(user_id, command, self._buckets[(user_id, command)][1], self._buckets[(user_id, command)][0])
+                for user_id, command in dirty if (user_id, command) in self._buckets]
+
+        async with self.bot.db.transaction(DATABASE) as db:
+            await db.executemany("""
+                INSERT INTO cooldown_tracker (user_id, command, last_used, tokens)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, command) DO UPDATE SET last_used = excluded.last_used, tokens = excluded.tokens
+            """, rows)
+            await db.executemany("DELETE FROM cooldown_tracker WHERE user_id = ? AND command = ?", list(expired))
+
+    async def _persist_loop(self):
+        await self.bot.wait_until_ready()
+        await self.load()
+        while not self.bot.is_closed():
+            await asyncio.sleep(PERSIST_INTERVAL)
+            try:
+                await self.persist()
+            except Exception as e:
+                print(f"❌ Fehler beim Sichern der Cooldowns: {e}")
+
+
+async def check_cooldown(ctx):
+    """Überprüft, ob der User für einen Befehl einen Cooldown hat"""
+    return await ctx.bot.cooldowns.check(ctx)
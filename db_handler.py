@@ -0,0 +1,119 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+
+class Database:
+    """Bot-weiter Datenbank-Dienst mit einer dauerhaften Verbindung pro Datenbankdatei.
+
+    Statt bei jedem Aufruf `aiosqlite.connect()` zu öffnen (neuer Thread + Datei öffnen),
+    wird pro Datei genau eine Verbindung aufgebaut und wiederverwendet. Ein Lock pro
+    Datei sorgt dafür, dass sich Transaktionen verschiedener Cogs nicht vermischen.
+
+    Der Lock ist nicht reentrant: Innerhalb von `transaction(database)` darf dieselbe
+    Datei nur über die übergebene Verbindung angesprochen werden, nicht erneut über
+    `execute`/`fetchone`/... – das würde sich selbst blockieren und löst deshalb einen
+    `RuntimeError` aus.
+
+    Ergebniszeilen sind normale Tupel; wer per Spaltenname zugreifen will, übergibt
+    `row_factory=aiosqlite.Row` an `fetchone`/`fetchall`.
+    """
+
+    def __init__(self):
+        self._connections = {}
+        self._locks = {}
+        self._owners = {}  # database -> Task, die den Lock gerade hält
+        self._close_hooks = []
+
+    @asynccontextmanager
+    async def _lock(self, database):
+        task = asyncio.current_task()
+        if self._owners.get(database) is task:
+            raise RuntimeError(f"Verschachtelter Zugriff auf {database} innerhalb einer Transaktion "
+                               "– die Verbindung aus `transaction()` verwenden")
+        if database not in self._locks:
+            self._locks[database] = asyncio.Lock()
+        async with self._locks[database]:
+            self._owners[database] = task
+            try:
+                yield
+            finally:
+                self._owners.pop(database, None)
+
+    async def _connect(self, database):
+        """Öffnet die Verbindung beim ersten Zugriff und hält sie danach offen."""
+        conn = self._connections.get(database)
+        if conn is None:
+            conn = await aiosqlite.connect(database)
+            await conn.execute("PRAGMA journal_mode=WAL")  # Leser blockieren Schreiber nicht mehr
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            self._connections[database] = conn
+        return conn
+
+    async def execute(self, database, sql, params=()):
+        """Führt einen einzelnen Schreibbefehl aus und speichert ihn sofort."""
+        async with self._lock(database):
+            conn = await self._connect(database)
+            cursor = await conn.execute(sql, params)
+            await conn.commit()
+            return cursor
+
+    async def executemany(self, database, sql, rows):
+        """Führt denselben Befehl für viele Zeilen in einer einzigen Transaktion aus."""
+        async with self._lock(database):
+            conn = await self._connect(database)
+            cursor = await conn.executemany(sql, rows)
+            await conn.commit()
+            return cursor
+
+    async def fetchone(self, database, sql, params=(), row_factory=None):
+        """Gibt die erste Ergebniszeile zurück (oder `None`)."""
+        async with self._lock(database):
+            conn = await self._connect(database)
+            async with conn.execute(sql, params) as cursor:
+                cursor.row_factory = row_factory
+                return await cursor.fetchone()
+
+    async def fetchall(self, database, sql, params=(), row_factory=None):
+        """Gibt alle Ergebniszeilen als Liste zurück."""
+        async with self._lock(database):
+            conn = await self._connect(database)
+            async with conn.execute(sql, params) as cursor:
+                cursor.row_factory = row_factory
+                return await cursor.fetchall()
+
+    @asynccontextmanager
+    async def transaction(self, database):
+        """Stellt die Verbindung exklusiv bereit; am Ende wird gespeichert oder zurückgerollt."""
+        async with self._lock(database):
+            conn = await self._connect(database)
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    def add_close_hook(self, hook):
+        """Registriert eine Coroutine-Funktion, die vor dem Schließen noch schreiben darf."""
+        if hook not in self._close_hooks:
+            self._close_hooks.append(hook)
+
+    def remove_close_hook(self, hook):
+        if hook in self._close_hooks:
+            self._close_hooks.remove(hook)
+
+    async def close(self):
+        """Führt die Close-Hooks aus (z. B. Puffer leeren) und schließt dann alle Verbindungen."""
+        for hook in list(self._close_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                print(f"⚠ Fehler beim Ausführen eines Close-Hooks: {e}")
+
+        for database, conn in list(self._connections.items()):
+            async with self._lock(database):
+                await conn.close()
+        self._connections.clear()
@@ -0,0 +1,74 @@
+import asyncio
+import heapq
+import time
+
+
+class DeadlineScheduler:
+    """Führt `callback(key)` zu einem festen Zeitpunkt aus – mit nur einem Timer-Task.
+
+    Termine liegen in einem Heap (O(log n) pro Eintrag). `cancel` entfernt einen Termin
+    nur aus dem Dict; der veraltete Heap-Eintrag wird beim Erreichen übersprungen.
+    Ein bereits geplanter Schlüssel wird nicht erneut geplant, seine Frist bleibt.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback  # async def callback(key)
+        self._heap = []  # (fällig_um, key)
+        self._deadlines = {}  # key -> fällig_um (nur aktive Termine)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, delay: float):
+        if key in self._deadlines:
+            return
+
+        deadline = time.monotonic() + delay
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if self._heap[0][1] == key:
+            self._wakeup.set()  # Neuer frühester Termin: Timer neu stellen
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._heap.clear()
+        self._deadlines.clear()
+
+    async def _run(self):
+        while True:
+            # Abgesagte oder neu geplante Einträge verwerfen
+            while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            deadline, key = self._heap[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue  # Heap neu prüfen (früherer Termin oder Absage möglich)
+
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            try:
+                await self.callback(key)
+            except Exception as e:
+                print(f"❌ Fehler im geplanten Auftrag für {key}: {e}")
@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """Bot-weiter HTTP-Client mit einer gemeinsamen `aiohttp.ClientSession`.
+
+    Verbindungen (inkl. TLS) werden per Keep-Alive wiederverwendet, statt pro Befehl
+    eine neue Session zu öffnen. Dazu kommen feste Timeouts, Wiederholungen mit
+    exponentiellem Backoff bei Netzwerkfehlern/5xx und ein Limit gleichzeitiger
+    Anfragen pro Host.
+    """
+
+    def __init__(self, timeout: float = 20, retries: int = 3, backoff: float = 0.5, per_host_limit: int = 4):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host_limit = per_host_limit
+        self._session = None
+        self._semaphores = {}
+
+    @property
+    def session(self):
+        """Erstellt die Session beim ersten Zugriff (innerhalb des laufenden Event-Loops)."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.per_host_limit, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    def _semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._semaphores[host]
+
+    @asynccontextmanager
+    async def get(self, url, **kwargs):
+        """Wie `session.get`, aber mit Wiederholungen und Host-Limit.
+
+        Gibt nach dem letzten Versuch auch fehlerhafte Antworten zurück; der Aufrufer
+        prüft wie gewohnt `response.status`.
+        """
+        async with self._semaphore(url):
+            for attempt in range(self.retries + 1):
+                last_attempt = attempt == self.retries
+                try:
+                    response = await self.session.get(url, **kwargs)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if last_attempt:
+                        raise
+                else:
+                    if response.status not in RETRY_STATUSES or last_attempt:
+                        try:
+                            yield response
+                        finally:
+                            response.release()
+                        return
+                    response.release()
+
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def get_json(self, url, **kwargs):
+        """Gibt `(status, json)` zurück; bei Status != 200 oder ungültigem JSON ist `json` gleich `None`."""
+        async with self.get(url, **kwargs) as response:
+            if response.status != 200:
+                return response.status, None
+            try:
+                return response.status, await response.json(content_type=None)
+            except (aiohttp.ContentTypeError, ValueError):
+                return response.status, None  # z. B. eine HTML-Fehlerseite statt JSON
+
+    async def get_text(self, url, **kwargs):
+        """Gibt `(status, text)` zurück; bei Status != 200 ist `text` gleich `None`."""
+        async with self.get(url, **kwargs) as response:
+            if response.status != 200:
+                return response.status, None
+            return response.status, await response.text()
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,55 @@
+import asyncio
+import datetime
+import time
+
+
+class LeaderboardCache:
+    """Vorberechnete Top-N-Listen pro Bereich (z. B. "global" oder eine guild_id).
+
+    Ein Leaderboard wird nur neu berechnet, wenn der Schnappschuss älter als `ttl`
+    Sekunden ist oder seit dem letzten Aufbau mindestens `dirty_threshold` Änderungen
+    gemeldet wurden. Alle anderen Aufrufe kommen direkt aus dem Speicher.
+    """
+
+    def __init__(self, loader, ttl: float = 300, dirty_threshold: int = 100):
+        self.loader = loader  # async def loader(scope) -> Liste der Zeilen
+        self.ttl = ttl
+        self.dirty_threshold = dirty_threshold
+        self._snapshots = {}  # scope -> (Zeilen, erstellt (monotonic), erstellt (datetime))
+        self._dirty = {}  # scope -> Anzahl Änderungen seit dem letzten Aufbau
+        self._locks = {}
+
+    def mark_dirty(self, *scopes, amount: int = 1):
+        """Meldet Änderungen für die angegebenen Bereiche."""
+        for scope in scopes:
+            self._dirty[scope] = self._dirty.get(scope, 0) + amount
+
+    def invalidate(self, scope=None):
+        """Verwirft einen (oder ohne Angabe alle) Schnappschüsse."""
+        if scope is None:
+            self._snapshots.clear()
+            self._dirty.clear()
+        else:
+            self._snapshots.pop(scope, None)
+            self._dirty.pop(scope, None)
+
+    def _is_fresh(self, scope):
+        snapshot = self._snapshots.get(scope)
+        if snapshot is None:
+            return False
+        return (time.monotonic() - snapshot[1] < self.ttl
+                and self._dirty.get(scope, 0) < self.dirty_threshold)
+
+    async def get(self, scope):
+        """Gibt `(zeilen, zuletzt_aktualisiert)` zurück und baut den Schnappschuss bei Bedarf neu."""
+        if not self._is_fresh(scope):
+            lock = self._locks.setdefault(scope, asyncio.Lock())
+            async with lock:
+                # Mehrere gleichzeitige Aufrufe bauen den Schnappschuss nur einmal
+                if not self._is_fresh(scope):
+                    self._dirty[scope] = 0
+                    rows = await self.loader(scope)
+                    self._snapshots[scope] = (rows, time.monotonic(), datetime.datetime.now(datetime.timezone.utc))
+
+        rows, _, updated_at = self._snapshots[scope]
+        return rows, updated_at
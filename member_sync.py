@@ -0,0 +1,61 @@
+import hashlib
+
+
+def member_hash(guild, names=False):
+    """Fingerabdruck der (menschlichen) Mitglieder eines Servers: nur IDs, mit `names` auch Namen."""
+    if names:
+        members = sorted((member.id, member.name) for member in guild.members if not member.bot)
+    else:
+        members = sorted(member.id for member in guild.members if not member.bot)
+    return hashlib.sha1(repr(members).encode()).hexdigest()
+
+
+class MemberSync:
+    """Gemeinsamer Schritt, um beim Start Mitglieder gesammelt in eine Datenbank zu schreiben.
+
+    Pro Datenbank läuft alles in einer Transaktion mit `executemany`. In der Tabelle
+    `member_sync` wird pro Schritt und Server ein Hash der Mitglieder gespeichert;
+    Server, deren Mitglieder sich seit dem letzten Start nicht geändert haben, werden
+    übersprungen.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    async def sync(self, database, step, guilds, statements, names=False):
+        """Schreibt die Zeilen aller geänderten Server.
+
+        `statements` ist eine Liste aus `(sql, rows)`, wobei `rows(guild)` die Parameter
+        für `executemany` liefert. `names=True` nur, wenn die Zeilen Benutzernamen
+        enthalten – sonst löst eine Namensänderung keinen Abgleich aus. Gibt die Anzahl
+        der abgeglichenen Server zurück.
+        """
+        async with self.db.transaction(database) as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS member_sync (
+                    step TEXT,
+                    guild_id INTEGER,
+                    member_hash TEXT,
+                    PRIMARY KEY (step, guild_id)
+                )
+            """)
+            async with db.execute("SELECT guild_id, member_hash FROM member_sync WHERE step = ?", (step,)) as cursor:
+                stored = dict(await cursor.fetchall())
+
+            changed = []
+            for guild in guilds:
+                current = member_hash(guild, names)
+                if stored.get(guild.id) != current:
+                    changed.append((guild, current))
+            if not changed:
+                return 0
+
+            for sql, rows in statements:
+                await db.executemany(sql, [row for guild, _ in changed for row in rows(guild)])
+            await db.executemany("INSERT OR REPLACE INTO member_sync (step, guild_id, member_hash) VALUES (?, ?, ?)",
+                                 [(step, guild.id, current) for guild, current in changed])
+        return len(changed)
+
+    async def forget(self, database, step, guild_id):
+        """Verwirft den gespeicherten Hash, z. B. wenn die Zeilen eines Servers gelöscht wurden."""
+        await self.db.execute(database, "DELETE FROM member_sync WHERE step = ? AND guild_id = ?", (step, guild_id))
@@ -0,0 +1,54 @@
+import traceback
+
+
+class MessageContext:
+    """Gemeinsamer Zustand einer Nachricht, der durch alle Stufen gereicht wird."""
+
+    def __init__(self, message, settings=None):
+        self.message = message
+        self.settings = settings  # Server-Einstellungen, einmal pro Nachricht geladen
+        self.deleted = False  # ✅ Wird gesetzt, sobald eine Stufe die Nachricht gelöscht hat
+
+
+class MessagePipeline:
+    """Zentraler `on_message`-Dispatcher für alle Cogs.
+
+    Statt dass jeder Cog einen eigenen Listener registriert und für dieselbe Nachricht
+    selbst die Datenbank abfragt, melden die Cogs Stufen an. Die Pipeline lädt die
+    Server-Einstellungen einmal und ruft die Stufen nach ihrer Reihenfolge auf.
+    Hat eine Stufe die Nachricht gelöscht, werden die folgenden übersprungen.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._stages = []  # (order, name, callback)
+        self._settings_loader = None
+
+    def add_stage(self, name, order, callback):
+        """Registriert eine Stufe; kleinere `order`-Werte laufen zuerst."""
+        self.remove_stage(name)
+        self._stages.append((order, name, callback))
+        self._stages.sort(key=lambda stage: stage[0])
+
+    def remove_stage(self, name):
+        """Entfernt eine Stufe wieder (z. B. beim Entladen eines Cogs)."""
+        self._stages = [stage for stage in self._stages if stage[1] != name]
+
+    def set_settings_loader(self, loader):
+        """Legt fest, womit die Server-Einstellungen für eine Nachricht geladen werden."""
+        self._settings_loader = loader
+
+    async def on_message(self, message):
+        settings = None
+        if message.guild and not message.author.bot and self._settings_loader:
+            settings = await self._settings_loader(message.guild.id)
+
+        ctx = MessageContext(message, settings)
+        for _, name, callback in list(self._stages):
+            if ctx.deleted:
+                break
+            try:
+                await callback(ctx)
+            except Exception:
+                print(f"❌ Fehler in der Nachrichten-Stufe '{name}':")
+                traceback.print_exc()
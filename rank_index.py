@@ -0,0 +1,82 @@
+class RankIndex:
+    """Rangliste im Speicher als Fenwick-Baum über ganzzahlige Punktestände.
+
+    Jeder Schlüssel (z. B. `(level, xp)`) wird über `score` auf eine nicht-negative
+    Ganzzahl abgebildet, die dieselbe Reihenfolge hat. Der Baum zählt, wie viele
+    Benutzer welchen Punktestand haben; Ändern und Rang abfragen kosten damit jeweils
+    O(log M) (M = höchster Punktestand), unabhängig von der Anzahl der Benutzer.
+    Gespeichert werden nur belegte Knoten, der Baum wächst bei Bedarf durch Verdoppeln.
+    """
+
+    def __init__(self, entries=(), score=lambda key: key):
+        self.score = score
+        self._keys = {}  # user_id -> Schlüssel
+        self._tree = {}  # Fenwick-Knoten (1-basiert) -> Anzahl
+        self._size = 1  # Zweierpotenz, abgedeckt sind die Punktestände 0 .. _size - 1
+        for user_id, key in entries:
+            self.update(user_id, key)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._keys
+
+    def get(self, user_id):
+        return self._keys.get(user_id)
+
+    def update(self, user_id, key):
+        """Setzt oder ändert den Schlüssel eines Benutzers."""
+        old = self._keys.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            self._add(self.score(old), -1)
+        self._keys[user_id] = key
+        self._add(self.score(key), 1)
+
+    def remove(self, user_id):
+        old = self._keys.pop(user_id, None)
+        if old is not None:
+            self._add(self.score(old), -1)
+
+    def clear(self):
+        self._keys.clear()
+        self._tree.clear()
+        self._size = 1
+
+    def _add(self, score, delta):
+        if score < 0:
+            raise ValueError("Punktestände müssen nicht-negativ sein")
+        while score >= self._size:
+            # Verdoppeln: bestehende Knoten bleiben gültig, der neue Wurzelknoten zählt alle Einträge
+            total = self._tree.get(self._size, 0)
+            self._size *= 2
+            if total:
+                self._tree[self._size] = total
+
+        i = score + 1
+        while i <= self._size:
+            count = self._tree.get(i, 0) + delta
+            if count:
+                self._tree[i] = count
+            else:
+                self._tree.pop(i, None)
+            i += i & -i
+
+    def _prefix(self, i):
+        """Anzahl der Einträge mit Punktestand < i."""
+        i = min(i, self._size)
+        count = 0
+        while i > 0:
+            count += self._tree.get(i, 0)
+            i -= i & -i
+        return count
+
+    def rank(self, key):
+        """Rang für einen Schlüssel: Anzahl echt besserer Einträge + 1."""
+        return len(self._keys) - self._prefix(self.score(key) + 1) + 1
+
+    def rank_of(self, user_id):
+        key = self._keys.get(user_id)
+        return self.rank(key) if key is not None else None
@@ -0,0 +1,32 @@
+import asyncio
+
+RECONCILE_CONCURRENCY = 5  # Gleichzeitige REST-Anfragen beim Abgleich nach einem Neustart
+
+
+async def run_bounded(items, worker, limit: int = RECONCILE_CONCURRENCY):
+    """Führt `worker(item)` für alle Einträge parallel aus, aber höchstens `limit` gleichzeitig.
+
+    So wächst die Startzeit nicht linear mit der Anzahl der Server, ohne Discord mit
+    Anfragen zu fluten: py-cord hält die Rate-Limit-Buckets ein und wartet bei 429
+    selbst, das Limit sorgt nur dafür, dass nicht hunderte Anfragen gleichzeitig warten.
+    Fehler einzelner Einträge werden zurückgegeben statt den Abgleich abzubrechen.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+
+async def delete_missing_channels(bot, database, table, channel_ids):
+    """Löscht alle Zeilen, deren Kanal nicht mehr im Cache ist – in einer Transaktion.
+
+    Gibt die entfernten Kanal-IDs zurück.
+    """
+    missing = [channel_id for channel_id in channel_ids if bot.get_channel(channel_id) is None]
+    if missing:
+        await bot.db.executemany(database, f"DELETE FROM {table} WHERE channel_id = ?",
+                                 [(channel_id,) for channel_id in missing])
+    return missing
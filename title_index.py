@@ -0,0 +1,81 @@
+import bisect
+import unicodedata
+from array import array
+
+
+def _key(title):
+    """Vergleichsschlüssel: Kleinschreibung, ohne Akzente, Sonderzeichen als Leerzeichen."""
+    text = unicodedata.normalize("NFKD", title.lower())
+    text = "".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Durchsuchbarer Index aller Seitentitel eines Wikis.
+
+    Die Titel liegen sortiert nach ihrem Vergleichsschlüssel vor, so dass eine
+    Präfixsuche per `bisect` auskommt. Für Treffer mitten im Titel oder mit
+    Tippfehlern gibt es zusätzlich einen Trigramm-Index, dessen Trefferlisten als
+    kompakte `array`s gespeichert werden.
+    """
+
+    def __init__(self, titles=()):
+        pairs = sorted({(_key(title), title) for title in titles})
+        self._keys = [key for key, _ in pairs]
+        self._titles = [title for _, title in pairs]
+
+        postings = {}
+        for position, key in enumerate(self._keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(position)
+        self._postings = {gram: array("I", positions) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self._titles)
+
+    def prefix(self, text, limit=25):
+        """Titel, die mit `text` beginnen (alphabetisch)."""
+        key = _key(text)
+        start = bisect.bisect_left(self._keys, key)
+        results = []
+        for position in range(start, min(start + limit, len(self._keys))):
+            if not self._keys[position].startswith(key):
+                break
+            results.append(self._titles[position])
+        return results
+
+    def search(self, text, limit=25):
+        """Präfix-Treffer zuerst, danach die Titel mit den meisten gemeinsamen Trigrammen."""
+        key = _key(text).strip()
+        if not key:
+            return self._titles[:limit]
+
+        results = self.prefix(key, limit)
+        if len(results) >= limit or len(key) < 3:
+            return results
+
+        grams = _trigrams(key)
+        scores = {}
+        for gram in grams:
+            for position in self._postings.get(gram, ()):
+                scores[position] = scores.get(position, 0) + 1
+
+        # Mindestens die Hälfte der Trigramme muss passen, sonst ist es nur Rauschen
+        minimum = max(1, len(grams) // 2)
+        seen = set(results)
+        ranked = sorted(
+            (position for position, score in scores.items() if score >= minimum),
+            key=lambda position: (-scores[position], len(self._keys[position]), self._keys[position])
+        )
+        for position in ranked:
+            title = self._titles[position]
+            if title not in seen:
+                results.append(title)
+                if len(results) >= limit:
+                    break
+        return results
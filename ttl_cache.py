@@ -0,0 +1,46 @@
+import time
+from collections import OrderedDict
+
+MISSING = object()  # Unterscheidet "nicht im Cache" von einem gecachten `None`
+
+
+class TTLCache:
+    """Kleiner LRU-Cache mit Ablaufzeit pro Eintrag.
+
+    Ist `maxsize` erreicht, fliegt der am längsten nicht benutzte Eintrag raus.
+    Abgelaufene Einträge werden beim Zugriff entfernt.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (Ablaufzeitpunkt, Wert)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=MISSING):
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)  # Zuletzt benutzt
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
@@ -0,0 +1,109 @@
+WIKIS = {
+    "Unknown Times": {
+        "base_url": "https://naruto-unknown-times.fandom.com/de/wiki/",
+        "api_url": "https://naruto-unknown-times.fandom.com/de/api.php",
+        "logo": "https://naruto-unknown-times.fandom.com/de/wiki/Special:FilePath/NarutoUT_Logo.png",
+    },
+    "Echo of War": {
+        "base_url": "https://naruto-rp.fandom.com/de/wiki/",
+        "api_url": "https://naruto-rp.fandom.com/de/api.php",
+        "logo": "https://naruto-rp.fandom.com/de/wiki/Special:FilePath/Echo_Logo.png",  # ggf. durch richtiges Logo ersetzen
+    },
+    "Narutopedia": {
+        "base_url": "https://naruto.fandom.com/wiki/",
+        "api_url": "https://naruto.fandom.com/api.php",
+        "logo": "https://static.wikia.nocookie.net/naruto/images/6/60/Narutopedia_Wikia_Icon.png",
+    },
+}
+
+MAX_TITLES_PER_QUERY = 50  # Limit der MediaWiki-API für `titles=`
+
+
+class WikiUnavailable(Exception):
+    """Das Wiki hat nicht (oder nicht mit gültigem JSON) geantwortet."""
+
+
+class WikiApi:
+    """Schlanker Zugriff auf die MediaWiki-API (`api.php`) der Fandom-Wikis.
+
+    Statt ganze Artikel als HTML zu laden, wird nur das kleine JSON abgefragt,
+    das für Titel, Link und Vorschaubild nötig ist.
+    """
+
+    def __init__(self, http):
+        self.http = http  # HttpClient des Bots
+
+    async def request(self, wiki, **params):
+        """Führt eine API-Anfrage aus; gibt das JSON oder `None` bei einem Fehler zurück."""
+        params.setdefault("format", "json")
+        params.setdefault("formatversion", 2)
+        _, data = await self.http.get_json(WIKIS[wiki]["api_url"], params=params)
+        return data
+
+    def page_url(self, wiki, title):
+        return WIKIS[wiki]["base_url"] + title.replace(" ", "_")
+
+    async def query_pages(self, wiki, titles):
+        """Löst mehrere Titel gesammelt auf (inkl. Weiterleitungen und Vorschaubild).
+
+        Gibt ein Dict `{angefragter Titel: {"title", "url", "image"} oder None}` zurück.
+        `None` heißt, die Seite existiert nicht; schlägt eine Anfrage fehl, wird
+        `WikiUnavailable` ausgelöst.
+        """
+        results = {}
+        titles = list(dict.fromkeys(titles))
+        for start in range(0, len(titles), MAX_TITLES_PER_QUERY):
+            batch = titles[start:start + MAX_TITLES_PER_QUERY]
+            data = await self.request(
+                wiki,
+                action="query",
+                titles="|".join(batch),
+                redirects=1,
+                prop="pageimages",
+                piprop="original",
+            )
+            if data is None:
+                raise WikiUnavailable(wiki)
+
+            query = data.get("query", {})
+            # Angefragten Titel über Normalisierung und Weiterleitungen bis zur Zielseite verfolgen
+            renamed = {item["from"]: item["to"] for item in query.get("normalized", [])}
+            redirects = {item["from"]: item["to"] for item in query.get("redirects", [])}
+            pages = {page["title"]: page for page in query.get("pages", [])}
+
+            for title in batch:
+                resolved = renamed.get(title, title)
+                resolved = redirects.get(resolved, resolved)
+                page = pages.get(resolved)
+                if page is None or page.get("missing") or page.get("invalid"):
+                    results[title] = None
+                    continue
+                results[title] = {
+                    "title": page["title"],
+                    "url": self.page_url(wiki, page["title"]),
+                    "image": page.get("original", {}).get("source"),
+                }
+        return results
+
+    async def opensearch(self, wiki, text, limit=5):
+        """Unscharfe Titelsuche (z. B. bei Tippfehlern); gibt passende Titel zurück."""
+        data = await self.request(wiki, action="opensearch", search=text, limit=limit, namespace=0)
+        if not data or len(data) < 2:
+            return []
+        return data[1]
+
+    async def all_titles(self, wiki):
+        """Alle Artikeltitel (Namensraum 0) über `list=allpages`, seitenweise per `apcontinue`.
+
+        Gibt `None` zurück, wenn eine Anfrage fehlschlägt, damit kein halber Index entsteht.
+        """
+        titles = []
+        params = {"action": "query", "list": "allpages", "apnamespace": 0, "aplimit": "max"}
+        while True:
+            data = await self.request(wiki, **params)
+            if data is None:
+                return None
+            titles.extend(page["title"] for page in data.get("query", {}).get("allpages", []))
+            if "continue" not in data:
+                return titles
+            params.update(data["continue"])